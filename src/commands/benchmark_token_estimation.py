@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import click
+from sqlalchemy import func, select
+
+import logging
+from src.database import ConcurrencyClass, get_session
+from src.database.models import Article
+from src.util.translator.helpers import count_tokens, sample_tokens
+
+logger = logging.getLogger('app')
+
+
+@click.command('benchmark_token_estimation')
+@click.option('--model', 'model_name', default='gpt-4o', show_default=True)
+@click.option('--limit', default=20, show_default=True)
+@click.option(
+    '--repeat',
+    default=1,
+    show_default=True,
+    help='Concatenate every article this many times to get bigger texts',
+)
+def benchmark_token_estimation(model_name: str, limit: int, repeat: int):
+    """Compares sampling token estimation with exact counting on the
+    longest articles."""
+
+    async def async_function() -> list[str]:
+        async with get_session(ConcurrencyClass.background) as db_session:
+            result = await db_session.scalars(
+                select(Article.text)
+                .where(Article.deleted_at.is_(None))
+                .order_by(func.length(Article.text).desc())
+                .limit(limit)
+            )
+            return list(result.all())
+
+    texts = asyncio.run(async_function())
+    count_tokens('', model_name)  # Load encoding outside of measurements
+    errors = []
+    covered = 0
+    exact_total_sec = sample_total_sec = 0.0
+    for text in texts:
+        text = '\n\n'.join([text] * repeat)
+
+        started_at = time.perf_counter()
+        exact = count_tokens(text, model_name)
+        exact_sec = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        estimate = sample_tokens(text, model_name)
+        sample_sec = time.perf_counter() - started_at
+
+        exact_total_sec += exact_sec
+        sample_total_sec += sample_sec
+        error = (estimate.tokens - exact) / exact if exact else 0.0
+        errors.append(abs(error))
+        covered += estimate.upper_bound >= exact
+        logger.info(
+            '%s chars: exact %s (%.3fs), sampled %s..%s (%.3fs, %s/%s '
+            'units), error %.2f%%',
+            len(text),
+            exact,
+            exact_sec,
+            estimate.tokens,
+            estimate.upper_bound,
+            sample_sec,
+            estimate.sampled_units,
+            estimate.total_units,
+            error * 100,
+        )
+
+    if not texts:
+        logger.info('No articles to benchmark')
+        return
+    logger.info(
+        'Mean absolute error %.2f%%, max %.2f%%, upper bound covers exact '
+        'count in %s/%s texts. Exact counting took %.3fs, sampling %.3fs',
+        sum(errors) / len(errors) * 100,
+        max(errors) * 100,
+        covered,
+        len(texts),
+        exact_total_sec,
+        sample_total_sec,
+    )
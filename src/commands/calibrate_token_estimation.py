@@ -0,0 +1,25 @@
+import asyncio
+
+import click
+
+import logging
+from src.util.token_ratios.classes import token_ratio_table
+from src.util.token_ratios.helpers import calibrate_token_ratios
+
+logger = logging.getLogger('app')
+
+
+@click.command('calibrate_token_estimation')
+def calibrate_token_estimation():
+    """Fits task costs per source token and per chunk per model and
+    language pair from the latest completed tasks. Translator consumers also do it
+    every `calibration_interval_sec`."""
+
+    async def async_function():
+        ratios = await calibrate_token_ratios()
+        for key, ratio in sorted(
+            ratios.items(), key=lambda item: token_ratio_table.dump_key(item[0])
+        ):
+            logger.info('%s: %s', token_ratio_table.dump_key(key), ratio)
+
+    asyncio.run(async_function())
@@ -4,7 +4,7 @@ from typing import Optional
 
 import click
 
-from src.database import get_session
+from src.database import ConcurrencyClass, get_session
 
 from src.util.auth.helpers import get_password_hash
 from src.util.time.helpers import get_utc_now
@@ -28,7 +28,7 @@ def create_admin(
         """
         Asynchronous function that handles the creation or update of an admin
         """
-        async with get_session() as db_session:
+        async with get_session(ConcurrencyClass.background) as db_session:
             user = (
                 (
                     await db_session.execute(
@@ -4,7 +4,7 @@ import sys
 
 import click
 
-from src.database import get_session
+from src.database import ConcurrencyClass, get_session
 from src.database.models import Language
 
 import logging
@@ -21,7 +21,7 @@ def insert_languages() -> None:
         languages = json.load(file)
 
     async def async_function() -> None:
-        async with get_session() as db_session:
+        async with get_session(ConcurrencyClass.background) as db_session:
             db_query = await db_session.execute(select(Language))
             db_languages = db_query.scalars().all()
 
@@ -4,7 +4,7 @@ import sys
 
 import click
 
-from src.database import get_session
+from src.database import ConcurrencyClass, get_session
 from src.database.models import AIModel
 import logging
 
@@ -19,7 +19,7 @@ def insert_models() -> None:
         models = json.load(file)
 
     async def async_function() -> None:
-        async with get_session() as db_session:
+        async with get_session(ConcurrencyClass.background) as db_session:
             db_query = await db_session.execute(select(AIModel))
             db_models = db_query.scalars().all()
 
@@ -4,7 +4,7 @@ import sys
 
 import click
 
-from src.database import get_session
+from src.database import ConcurrencyClass, get_session
 from src.database.models import StylePrompt
 import logging
 from src.settings import LOGGER_PREFIX
@@ -20,7 +20,7 @@ def insert_prompts() -> None:
         prompts = json.load(file)
 
     async def async_function() -> None:
-        async with get_session() as db_session:
+        async with get_session(ConcurrencyClass.background) as db_session:
             db_query = await db_session.execute(select(StylePrompt))
             db_models = db_query.scalars().all()
 
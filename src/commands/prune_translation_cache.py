@@ -0,0 +1,27 @@
+import asyncio
+import datetime
+
+import click
+
+import logging
+from src.database import ConcurrencyClass, get_session
+from src.database.repos.translation_cache import TranslationCacheRepo
+from src.settings import translation_cache_config
+
+logger = logging.getLogger('app')
+
+
+@click.command('prune_translation_cache')
+def prune_translation_cache():
+    async def async_function() -> int:
+        async with get_session(ConcurrencyClass.background) as db_session:
+            return await TranslationCacheRepo.prune(
+                max_age=datetime.timedelta(
+                    seconds=translation_cache_config.ttl_sec
+                ),
+                max_entries=translation_cache_config.db_max_entries,
+                db_session=db_session,
+            )
+
+    deleted = asyncio.run(async_function())
+    logger.info('Deleted %s translation cache entries', deleted)
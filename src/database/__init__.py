@@ -1,12 +1,16 @@
 import asyncio
+import enum
+import time
 from contextlib import asynccontextmanager, contextmanager
-from typing import AsyncGenerator
+from contextvars import ContextVar
+from typing import AsyncGenerator, Generator
 
 from fastapi import HTTPException
 
 from src.settings import database_config, LOGGER_PREFIX
 import logging
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_sessionmaker,
@@ -16,13 +20,143 @@ from sqlalchemy.orm import DeclarativeBase
 
 async_engine = create_async_engine(
     database_config.url,
+    pool_size=database_config.pool_size,
+    max_overflow=database_config.max_overflow,
+    pool_timeout=database_config.pool_timeout,
+    pool_recycle=database_config.pool_recycle,
+    pool_pre_ping=database_config.pool_pre_ping,
     # echo=True,
 )
 AsyncDBSession = async_sessionmaker(async_engine)
 
 
 logger = logging.getLogger('app')
-semaphore = asyncio.Semaphore(5)
+statements_count: ContextVar[list[int] | None] = ContextVar(
+    'statements_count', default=None
+)
+
+
+class ConcurrencyClass(enum.StrEnum):
+    # Requests of users, e.g. logins and articles
+    interactive = 'interactive'
+    # Consumers, commands and translation helpers
+    background = 'background'
+    # Admin panel including analytics, whose queries may be slow
+    admin = 'admin'
+    # Translation cache of user requests, which is queried while the request
+    # already holds an interactive session. A limit of its own keeps such
+    # requests from waiting for a second interactive permit
+    translation_cache = 'translation_cache'
+
+
+class SessionLimiter:
+    """Limits sessions of one concurrency class open at once and records
+    how long sessions wait for a permit and for a pool connection."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_use = 0
+        self.waiting = 0
+        self.sessions = 0
+        self.permit_wait_sec = 0.0
+        self.checkout_wait_sec = 0.0
+        self.max_checkout_wait_sec = 0.0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[None, None]:
+        started_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+        self.sessions += 1
+        self.permit_wait_sec += time.monotonic() - started_at
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self.semaphore.release()
+
+    def record_checkout(self, wait_sec: float) -> None:
+        self.checkout_wait_sec += wait_sec
+        self.max_checkout_wait_sec = max(self.max_checkout_wait_sec, wait_sec)
+
+    def get_stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'in_use': self.in_use,
+            'waiting': self.waiting,
+            'saturation': round(self.in_use / self.limit, 3),
+            'sessions': self.sessions,
+            'avg_permit_wait_ms': round(
+                self.permit_wait_sec / max(1, self.sessions) * 1000, 3
+            ),
+            'avg_checkout_wait_ms': round(
+                self.checkout_wait_sec / max(1, self.sessions) * 1000, 3
+            ),
+            'max_checkout_wait_ms': round(
+                self.max_checkout_wait_sec * 1000, 3
+            ),
+        }
+
+
+session_limiters = {
+    ConcurrencyClass.interactive: SessionLimiter(
+        database_config.interactive_concurrency
+    ),
+    ConcurrencyClass.background: SessionLimiter(
+        database_config.background_concurrency
+    ),
+    ConcurrencyClass.admin: SessionLimiter(
+        database_config.admin_concurrency
+    ),
+    ConcurrencyClass.translation_cache: SessionLimiter(
+        database_config.translation_cache_concurrency
+    ),
+}
+
+
+def get_pool_stats() -> dict:
+    """Returns usage of the connection pool and of every concurrency
+    class."""
+    pool = async_engine.pool
+    checked_out = pool.checkedout()
+    capacity = database_config.pool_size + database_config.max_overflow
+    return {
+        'pool': {
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': checked_out,
+            'overflow': pool.overflow(),
+            'saturation': round(checked_out / capacity, 3),
+        },
+        'classes': {
+            concurrency_class: limiter.get_stats()
+            for concurrency_class, limiter in session_limiters.items()
+        },
+    }
+
+
+@event.listens_for(async_engine.sync_engine, 'before_cursor_execute')
+def _count_statement(*args) -> None:
+    counter = statements_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+@contextmanager
+def count_statements() -> Generator[list[int], None, None]:
+    """Counts SQL statements sent to the database by the current task,
+    the amount is in the first item of the yielded list."""
+    counter = [0]
+    token = statements_count.set(counter)
+    try:
+        yield counter
+    finally:
+        statements_count.reset(token)
 
 
 class Base(DeclarativeBase):
@@ -30,10 +164,23 @@ class Base(DeclarativeBase):
 
 
 @asynccontextmanager
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async with semaphore:
+async def get_session(
+    concurrency_class: ConcurrencyClass = ConcurrencyClass.interactive,
+) -> AsyncGenerator[AsyncSession, None]:
+    """Opens a session committed on exit.
+
+    Every concurrency class has its own limit of sessions open at once, so
+    e.g. slow analytics queries can not take all connections from user
+    requests.
+    """
+    limiter = session_limiters[concurrency_class]
+    async with limiter.acquire():
         async with AsyncDBSession() as session:
             try:
+                # Checking out the connection right away to measure the wait
+                started_at = time.monotonic()
+                await session.connection()
+                limiter.record_checkout(time.monotonic() - started_at)
                 yield session
             except HTTPException as e:
                 await session.rollback()
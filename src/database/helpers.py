@@ -1,6 +1,7 @@
 from typing import Type
 
 from sqlalchemy import and_
+from sqlalchemy.orm import Load, load_only
 
 from src.database import Base
 from src.responses import Scheme
@@ -40,3 +41,28 @@ def update_model_by_scheme(
     for field_name, value in scheme.model_dump(exclude_unset=True).items():
         setattr(model, field_name, value)
     return model
+
+
+def load_scheme_columns(model: Type[Base], scheme: Type[Scheme]) -> Load:
+    """
+    Builds a loader option selecting only the columns of the model that
+    are fields of the scheme. Other columns raise on access instead of
+    being loaded silently
+
+    Example:
+        >>> from sqlalchemy import select
+        >>> from src.database.models import Article
+        >>> from src.routers.articles.schemes import ArticleListItemScheme
+        >>> query = select(Article).options(
+        >>>     load_scheme_columns(Article, ArticleListItemScheme)
+        >>> )
+    """
+    columns = model.__table__.columns
+    return load_only(
+        *(
+            getattr(model, field_name)
+            for field_name in scheme.model_fields
+            if field_name in columns
+        ),
+        raiseload=True,
+    )
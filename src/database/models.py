@@ -91,7 +91,7 @@ class User(Base):
         'Article',
         back_populates='user',
         uselist=True,
-        lazy='selectin',
+        lazy='raise',
     )
 
 
@@ -168,28 +168,30 @@ class Article(Base):
         DateTime, nullable=True
     )
 
+    # Relationships of users and articles are never loaded implicitly,
+    # queries that need them use loader options
     report: Mapped['Report'] = relationship(
         'Report',
         back_populates='article',
         cascade='all, delete-orphan',
         uselist=False,
-        lazy='selectin',
+        lazy='raise',
     )
     language: Mapped[Language] = relationship(
         'Language',
         uselist=False,
-        lazy='selectin',
+        lazy='raise',
     )
     original_article: Mapped['Article'] = relationship(
         'Article',
         uselist=False,
-        lazy='selectin',
+        lazy='raise',
     )
     user: Mapped['User'] = relationship(
         'User',
         back_populates='articles',
         uselist=False,
-        lazy='selectin',
+        lazy='raise',
     )
 
 
@@ -282,6 +284,16 @@ class AIModel(Base):
         nullable=False,
         default=1,
     )
+    context_size: Mapped[int | None] = mapped_column(
+        Integer,
+        nullable=True,
+        comment='Context window of the model in tokens',
+    )
+    max_output_tokens: Mapped[int | None] = mapped_column(
+        Integer,
+        nullable=True,
+        comment='Maximum amount of tokens the model can generate at once',
+    )
     created_at: Mapped[datetime.datetime] = mapped_column(
         DateTime,
         default=get_utc_now,
@@ -433,3 +445,45 @@ class TransactionLog(Base):
     created_at: Mapped[datetime.datetime] = mapped_column(
         DateTime, nullable=False, default=get_utc_now
     )
+
+
+class TranslationCacheEntry(Base):
+    __tablename__ = f'{database_config.prefix}translation_cache'
+
+    key: Mapped[str] = mapped_column(
+        String(64),
+        primary_key=True,
+        comment='SHA-256 of normalised chunk, model, provider, prompt '
+        'and target language',
+    )
+    model_name: Mapped[str] = mapped_column(String, nullable=False)
+    provider: Mapped[str] = mapped_column(String, nullable=False)
+    translation: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, nullable=False, default=get_utc_now
+    )
+    last_used_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, nullable=False, default=get_utc_now, index=True
+    )
+
+
+class TranslationCheckpoint(Base):
+    __tablename__ = f'{database_config.prefix}translation_checkpoints'
+
+    task_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey(
+            f'{TranslationTask.__tablename__}.id',
+            ondelete='CASCADE',
+        ),
+        primary_key=True,
+    )
+    chunk_key: Mapped[str] = mapped_column(
+        String(64),
+        primary_key=True,
+        comment='Translation cache key of the chunk',
+    )
+    translation: Mapped[str] = mapped_column(Text, nullable=False)
+    tokens: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, nullable=False, default=get_utc_now
+    )
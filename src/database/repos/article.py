@@ -3,7 +3,10 @@ from typing import List, Tuple
 
 from fastapi import HTTPException, status
 
-from src.database.helpers import update_model_by_scheme
+from src.database.helpers import (
+    load_scheme_columns,
+    update_model_by_scheme,
+)
 
 from src.database.models import Article
 from src.pagination import PaginationParams, paginate
@@ -15,6 +18,7 @@ from src.routers.articles.schemes import (
 
 from sqlalchemy import exists, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from src.util.time.helpers import get_utc_now
 
@@ -30,6 +34,7 @@ class ArticleRepo:
         # TODO: add filters and sorting
         query = (
             select(Article)
+            .options(load_scheme_columns(Article, ArticleListItemScheme))
             .where(Article.user_id == user_id, Article.deleted_at.is_(None))
             .order_by(Article.created_at)
         )
@@ -52,7 +57,9 @@ class ArticleRepo:
         original_article_id: uuid.UUID, db_session: AsyncSession
     ) -> list[ArticleListItemScheme]:
         result = await db_session.execute(
-            select(Article).where(
+            select(Article)
+            .options(load_scheme_columns(Article, ArticleListItemScheme))
+            .where(
                 Article.deleted_at.is_(None),
                 Article.original_article_id == original_article_id,
             )
@@ -76,13 +83,15 @@ class ArticleRepo:
     async def get_by_id(
         article_id: uuid.UUID,
         db_session: AsyncSession,
+        with_language: bool = False,
     ) -> Article:
-        result = await db_session.execute(
-            select(Article).where(
-                Article.id == article_id,
-                Article.deleted_at.is_(None),
-            )
+        query = select(Article).where(
+            Article.id == article_id,
+            Article.deleted_at.is_(None),
         )
+        if with_language:
+            query = query.options(joinedload(Article.language))
+        result = await db_session.execute(query)
         obj = result.scalar_one_or_none()
         if obj is None:
             raise HTTPException(
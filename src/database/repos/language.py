@@ -13,6 +13,15 @@ class LanguageRepo:
         )
         return bool(result.scalar())
 
+    @staticmethod
+    async def get_existing_ids(
+        language_ids: list[int], db_session: AsyncSession
+    ) -> set[int]:
+        result = await db_session.execute(
+            select(Language.id).where(Language.id.in_(language_ids))
+        )
+        return set(result.scalars().all())
+
     @staticmethod
     async def get_list(db_session: AsyncSession) -> list[LanguageOutScheme]:
         result = await db_session.execute(select(Language))
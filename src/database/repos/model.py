@@ -67,6 +67,22 @@ class ModelRepo:
             )
         return obj
 
+    @staticmethod
+    async def get_fallbacks(
+        model: AIModel, db_session: AsyncSession
+    ) -> list[AIModel]:
+        """Returns the same model served by other providers."""
+        result = await db_session.execute(
+            select(AIModel)
+            .where(
+                AIModel.name == model.name,
+                AIModel.provider != model.provider,
+                AIModel.deleted_at.is_(None),
+            )
+            .order_by(AIModel.created_at)
+        )
+        return list(result.scalars().all())
+
     @staticmethod
     async def create(
         model_data: ModelCreateScheme, db_session: AsyncSession
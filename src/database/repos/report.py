@@ -26,9 +26,26 @@ from src.routers.reports.schemes import (
 
 from sqlalchemy import select, exists, join, or_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 
 from src.util.time.helpers import get_utc_now
 
+# Report schemes show the author of the article, notifications show its
+# language
+report_load_options = (
+    selectinload(Report.article).options(
+        joinedload(Article.user), joinedload(Article.language)
+    ),
+)
+# The list shows titles and author names only, texts of articles are not
+# loaded
+report_list_load_options = (
+    selectinload(Report.article)
+    .load_only(Article.title, Article.user_id, raiseload=True)
+    .options(joinedload(Article.user).load_only(User.name, raiseload=True)),
+    selectinload(Report.closed_by_user).load_only(User.name, raiseload=True),
+)
+
 
 class ReportRepo:
     @staticmethod
@@ -45,7 +62,11 @@ class ReportRepo:
         pagination_params: PaginationParams,
         db_session: AsyncSession,
     ) -> tuple[list[ReportListItemScheme], int]:
-        query = select(Report).join(Article, Article.id == Report.article_id)
+        query = (
+            select(Report)
+            .join(Article, Article.id == Report.article_id)
+            .options(*report_list_load_options)
+        )
         print('Sorting params:', sorting_params)
         query = get_sorted_query(query, Report, sorting_params)
         user_id = filter_params.user_id
@@ -93,7 +114,7 @@ class ReportRepo:
         return bool(result.scalar_one_or_none())
 
     @staticmethod
-    async def _report_exists(
+    async def exists(
         article_id: uuid.UUID, db_session: AsyncSession
     ) -> bool:
         result = await db_session.execute(
@@ -106,7 +127,11 @@ class ReportRepo:
         article_id: uuid.UUID, db_session: AsyncSession
     ) -> Report | None:
         report = await db_session.execute(
-            select(Report).filter_by(article_id=article_id)
+            select(Report)
+            .filter_by(article_id=article_id)
+            .options(*report_load_options)
+            # The article may be in the session already, without its author
+            .execution_options(populate_existing=True)
         )
         return report.scalar_one_or_none()
 
@@ -117,7 +142,7 @@ class ReportRepo:
         report_data: CreateReportScheme,
         db_session: AsyncSession,
     ) -> Report:
-        if await cls._report_exists(article_id, db_session):
+        if await cls.exists(article_id, db_session):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail='Жалоба на эту статью уже существует',
@@ -138,11 +163,13 @@ class ReportRepo:
         db_session.add(report)
         await db_session.flush()
 
-        await db_session.refresh(report)
-        return report
+        return await cls.get_by_article_id(
+            article_id=report.article_id, db_session=db_session
+        )
 
-    @staticmethod
+    @classmethod
     async def update(
+        cls,
         report: Report,
         report_data: EditReportScheme,
         db_session: AsyncSession,
@@ -152,11 +179,13 @@ class ReportRepo:
         db_session.add(report)
         await db_session.flush()
 
-        await db_session.refresh(report)
-        return report
+        return await cls.get_by_article_id(
+            article_id=report.article_id, db_session=db_session
+        )
 
-    @staticmethod
+    @classmethod
     async def update_status(
+        cls,
         report: Report,
         new_status: ReportStatus,
         user_id: uuid.UUID,
@@ -168,8 +197,9 @@ class ReportRepo:
         db_session.add(report)
         await db_session.flush()
 
-        await db_session.refresh(report)
-        return report
+        return await cls.get_by_article_id(
+            article_id=report.article_id, db_session=db_session
+        )
 
     @staticmethod
     async def create_comment(
@@ -1,6 +1,7 @@
 import uuid
 from typing import List, Tuple
 
+from src.database.helpers import load_scheme_columns
 from src.database.models import Session
 
 from sqlalchemy import Sequence, select, update
@@ -37,6 +38,7 @@ class SessionRepo:
     ) -> Tuple[List[SessionOutScheme], int]:
         query = (
             select(Session)
+            .options(load_scheme_columns(Session, SessionOutScheme))
             .where(Session.user_id == user_id, Session.closed_at.is_(None))
             .order_by(Session.created_at)
         )
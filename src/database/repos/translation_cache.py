@@ -0,0 +1,88 @@
+import datetime
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import TranslationCacheEntry
+from src.util.time.helpers import get_utc_now
+
+
+class TranslationCacheRepo:
+    @staticmethod
+    async def get_many(
+        keys: list[str], db_session: AsyncSession
+    ) -> dict[str, str]:
+        if not keys:
+            return {}
+        result = await db_session.execute(
+            select(
+                TranslationCacheEntry.key,
+                TranslationCacheEntry.translation,
+            ).where(TranslationCacheEntry.key.in_(keys))
+        )
+        found = dict(result.tuples().all())
+        if found:
+            await db_session.execute(
+                update(TranslationCacheEntry)
+                .where(TranslationCacheEntry.key.in_(found.keys()))
+                .values(last_used_at=get_utc_now())
+            )
+        return found
+
+    @staticmethod
+    async def save_many(
+        entries: dict[str, str],
+        model_name: str,
+        provider: str,
+        db_session: AsyncSession,
+    ) -> None:
+        if not entries:
+            return
+        now = get_utc_now()
+        query = insert(TranslationCacheEntry).values(
+            [
+                {
+                    'key': key,
+                    'model_name': model_name,
+                    'provider': provider,
+                    'translation': translation,
+                    'created_at': now,
+                    'last_used_at': now,
+                }
+                for key, translation in entries.items()
+            ]
+        )
+        await db_session.execute(
+            query.on_conflict_do_update(
+                index_elements=[TranslationCacheEntry.key],
+                set_={'last_used_at': now},
+            )
+        )
+        await db_session.flush()
+
+    @staticmethod
+    async def prune(
+        max_age: datetime.timedelta,
+        max_entries: int,
+        db_session: AsyncSession,
+    ) -> int:
+        """Deletes expired entries and trims the table to `max_entries`
+        least recently used ones. Returns amount of deleted rows."""
+        expired = await db_session.execute(
+            delete(TranslationCacheEntry).where(
+                TranslationCacheEntry.last_used_at < get_utc_now() - max_age
+            )
+        )
+        keep = (
+            select(TranslationCacheEntry.key)
+            .order_by(TranslationCacheEntry.last_used_at.desc())
+            .limit(max_entries)
+        )
+        overflow = await db_session.execute(
+            delete(TranslationCacheEntry).where(
+                TranslationCacheEntry.key.not_in(keep)
+            )
+        )
+        await db_session.flush()
+        return expired.rowcount + overflow.rowcount
@@ -0,0 +1,61 @@
+import uuid
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import TranslationCheckpoint
+
+
+class CheckpointRepo:
+    @staticmethod
+    async def get_for_task(
+        task_id: uuid.UUID, db_session: AsyncSession
+    ) -> dict[str, tuple[str, int]]:
+        result = await db_session.execute(
+            select(
+                TranslationCheckpoint.chunk_key,
+                TranslationCheckpoint.translation,
+                TranslationCheckpoint.tokens,
+            ).where(TranslationCheckpoint.task_id == task_id)
+        )
+        return {
+            chunk_key: (translation, tokens)
+            for chunk_key, translation, tokens in result.tuples()
+        }
+
+    @staticmethod
+    async def save_many(
+        task_id: uuid.UUID,
+        entries: dict[str, tuple[str, int]],
+        db_session: AsyncSession,
+    ) -> None:
+        if not entries:
+            return
+        await db_session.execute(
+            insert(TranslationCheckpoint)
+            .values(
+                [
+                    {
+                        'task_id': task_id,
+                        'chunk_key': chunk_key,
+                        'translation': translation,
+                        'tokens': tokens,
+                    }
+                    for chunk_key, (translation, tokens) in entries.items()
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        await db_session.flush()
+
+    @staticmethod
+    async def delete_for_task(
+        task_id: uuid.UUID, db_session: AsyncSession
+    ) -> None:
+        await db_session.execute(
+            delete(TranslationCheckpoint).where(
+                TranslationCheckpoint.task_id == task_id
+            )
+        )
+        await db_session.flush()
@@ -1,9 +1,18 @@
 import uuid
 
-from sqlalchemy import select
+from sqlalchemy import Row, and_, cast, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from src.database.models import TranslationTask
+from src.database.models import (
+    AIModel,
+    Article,
+    Language,
+    StylePrompt,
+    TranslationTask,
+    TranslationTaskStatus,
+)
 from src.routers.translation.schemes import CreateTaskScheme
 
 
@@ -33,6 +42,129 @@ class TaskRepo:
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_context(
+        task_id: uuid.UUID, db_session: AsyncSession
+    ) -> Row | None:
+        """Loads everything needed to run the task with one query.
+
+        Returns:
+            Row | None: None if the task is not found, otherwise a row with
+                `article_id`, `user_id`, `title`, `text`,
+                `source_language`, `target_language`, `model` and `prompt`,
+                where missing or deleted objects are None
+        """
+        # Named aliases give the entities their names in the row
+        source_language = aliased(Language, name='source_language')
+        target_language = aliased(Language, name='target_language')
+        model = aliased(AIModel, name='model')
+        prompt = aliased(StylePrompt, name='prompt')
+        result = await db_session.execute(
+            select(
+                Article.id.label('article_id'),
+                Article.user_id,
+                Article.title,
+                Article.text,
+                source_language,
+                target_language,
+                model,
+                prompt,
+            )
+            .select_from(TranslationTask)
+            .outerjoin(
+                Article,
+                and_(
+                    Article.id == TranslationTask.article_id,
+                    Article.deleted_at.is_(None),
+                ),
+            )
+            .outerjoin(
+                source_language, source_language.id == Article.language_id
+            )
+            .outerjoin(
+                target_language,
+                target_language.id == TranslationTask.target_language_id,
+            )
+            .outerjoin(
+                model,
+                and_(
+                    model.id == TranslationTask.model_id,
+                    model.deleted_at.is_(None),
+                ),
+            )
+            .outerjoin(
+                prompt,
+                and_(
+                    prompt.id == TranslationTask.prompt_id,
+                    prompt.deleted_at.is_(None),
+                ),
+            )
+            .where(
+                TranslationTask.id == task_id,
+                TranslationTask.deleted_at.is_(None),
+            )
+        )
+        return result.one_or_none()
+
+    @staticmethod
+    async def start(
+        task_id: uuid.UUID, message_id: str, db_session: AsyncSession
+    ) -> bool:
+        """Marks the task started by the message, if it is created or was
+        started by the same message, which is delivered again after a
+        consumer stopped.
+
+        Returns:
+            bool: False if the task is completed, failed or run by another
+                message, so it must not be run
+        """
+        result = await db_session.execute(
+            update(TranslationTask)
+            .where(
+                TranslationTask.id == task_id,
+                TranslationTask.deleted_at.is_(None),
+                or_(
+                    TranslationTask.status == TranslationTaskStatus.created,
+                    and_(
+                        TranslationTask.status
+                        == TranslationTaskStatus.started,
+                        TranslationTask.data['message_id'].astext
+                        == message_id,
+                    ),
+                ),
+            )
+            .values(
+                status=TranslationTaskStatus.started,
+                data=func.coalesce(TranslationTask.data, cast({}, JSONB)).op(
+                    '||'
+                )(cast({'message_id': message_id}, JSONB)),
+            )
+            .returning(TranslationTask.id)
+        )
+        return result.scalar_one_or_none() is not None
+
+    @staticmethod
+    async def update(
+        task_id: uuid.UUID,
+        values: dict,
+        db_session: AsyncSession,
+        data: dict | None = None,
+    ) -> None:
+        """Updates the task without loading it. `data` is merged into the
+        stored one."""
+        if data:
+            values = {
+                **values,
+                'data': func.coalesce(
+                    TranslationTask.data, cast({}, JSONB)
+                ).op('||')(cast(data, JSONB)),
+            }
+        await db_session.execute(
+            update(TranslationTask)
+            .where(TranslationTask.id == task_id)
+            .values(values)
+        )
+
     @staticmethod
     async def create(
         task_data: CreateTaskScheme, db_session: AsyncSession
@@ -47,3 +179,54 @@ class TaskRepo:
         await db_session.flush()
         await db_session.refresh(task)
         return task
+
+    @staticmethod
+    async def create_many(
+        tasks_data: list[CreateTaskScheme], db_session: AsyncSession
+    ) -> list[uuid.UUID]:
+        """Inserts all tasks with one multi-row INSERT ... RETURNING."""
+        if not tasks_data:
+            return []
+        result = await db_session.scalars(
+            insert(TranslationTask).returning(TranslationTask.id),
+            [task_data.model_dump() for task_data in tasks_data],
+        )
+        return list(result.all())
+
+    @staticmethod
+    async def get_cost_samples(
+        limit: int, db_session: AsyncSession
+    ) -> list[tuple[int, int | None, int, int, int, int]]:
+        """Returns the latest completed tasks as (model id, source language
+        id, target language id, cost, source tokens, chunks) tuples.
+
+        Cost is what the task would have cost without deduplication, and
+        tasks with chunks from the translation cache are skipped, as their
+        cost is unknown. So are tasks completed before these were recorded.
+        """
+        deduplication = TranslationTask.data['deduplication']
+        source_tokens = TranslationTask.data['source_tokens'].as_integer()
+        chunks = deduplication['chunks'].as_integer()
+        result = await db_session.execute(
+            select(
+                TranslationTask.model_id,
+                Article.language_id,
+                TranslationTask.target_language_id,
+                TranslationTask.cost
+                + deduplication['saved_tokens'].as_integer(),
+                source_tokens,
+                chunks,
+            )
+            .join(Article, Article.id == TranslationTask.article_id)
+            .where(
+                TranslationTask.status == TranslationTaskStatus.completed,
+                TranslationTask.cost > 0,
+                TranslationTask.deleted_at.is_(None),
+                deduplication['cached_chunks'].as_integer() == 0,
+                source_tokens > 0,
+                chunks > 0,
+            )
+            .order_by(TranslationTask.created_at.desc())
+            .limit(limit)
+        )
+        return list(result.tuples().all())
@@ -3,6 +3,7 @@ from typing import Tuple, List
 
 from fastapi import HTTPException, status
 
+from src.database.helpers import load_scheme_columns
 from src.database.repos.token_transaction_log import TransactionRepo
 from src.database.models import BalanceChangeCause, User
 from src.pagination import PaginationParams, paginate
@@ -67,7 +68,11 @@ class UserRepo:
         db_session: AsyncSession,
     ) -> Tuple[List[UserOutScheme], int]:
         # TODO: implement proper sorting
-        query = select(User).where(User.deleted_at.is_(None))
+        query = (
+            select(User)
+            .options(load_scheme_columns(User, UserOutScheme))
+            .where(User.deleted_at.is_(None))
+        )
         if filter_params.role is not None:
             query = query.where(User.role == filter_params.role)
         if filter_params.email_verified is not None:
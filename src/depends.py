@@ -2,7 +2,7 @@ from typing import AsyncGenerator
 
 from fastapi import Cookie, HTTPException, status
 
-from src.database import get_session as get_db_session
+from src.database import ConcurrencyClass, get_session as get_db_session
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -17,6 +17,11 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_admin_session() -> AsyncGenerator[AsyncSession, None]:
+    async with get_db_session(ConcurrencyClass.admin) as session:
+        yield session
+
+
 async def validate_token_for_ws(
         access_token: str | None = Cookie()
 ) -> UserInfo:
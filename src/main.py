@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.sessions import SessionMiddleware
 
@@ -24,10 +26,23 @@ from src.routers.sessions.views import router as sessions_router
 from src.routers.translation.views import router as translation_router
 from src.routers.users.views import router as users_router
 
+from src.util.brokers.producer.rabbitmq import publisher
+from src.util.http.classes import SharedHTTPClient
+from src.util.notifications.classes import notification_hub
+
 from starlette.middleware.cors import CORSMiddleware
 
 
-app = FastAPI(title='GPTRanslate', root_path='/api')
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    SharedHTTPClient.get_client()
+    yield
+    await SharedHTTPClient.close()
+    await publisher.close()
+    await notification_hub.close()
+
+
+app = FastAPI(title='GPTRanslate', root_path='/api', lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
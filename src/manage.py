@@ -1,10 +1,17 @@
 import click
 
+from src.commands.benchmark_token_estimation import (
+    benchmark_token_estimation,
+)
+from src.commands.calibrate_token_estimation import (
+    calibrate_token_estimation,
+)
 from src.commands.create_admin import create_admin
 from src.commands.insert_languages import insert_languages
 from src.commands.insert_models import insert_models
 from src.commands.insert_prompts import insert_prompts
 from src.commands.insert_report_reasons import insert_report_reasons
+from src.commands.prune_translation_cache import prune_translation_cache
 from src.commands.start_translator_consumer import start_translator_consumer
 from src.commands.start_mail_consumer import start_mail_consumer
 
@@ -14,11 +21,14 @@ def cli():
     pass
 
 
+cli.add_command(benchmark_token_estimation)
+cli.add_command(calibrate_token_estimation)
 cli.add_command(create_admin)
 cli.add_command(insert_languages)
 cli.add_command(insert_models)
 cli.add_command(insert_prompts)
 cli.add_command(insert_report_reasons)
+cli.add_command(prune_translation_cache)
 cli.add_command(start_translator_consumer)
 cli.add_command(start_mail_consumer)
 
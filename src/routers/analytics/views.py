@@ -6,11 +6,17 @@ from fastapi import (
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.database import get_pool_stats
 from src.database.repos.analytics import AnalyticsRepo
-from src.depends import get_session
+from src.depends import get_admin_session
 from src.settings import Role
 from src.util.auth.classes import JWTCookie
 from src.util.auth.schemes import UserInfo
+from src.util.circuit_breaker.classes import circuit_breaker
+from src.util.hedging.classes import latency_tracker
+from src.util.http.classes import SharedHTTPClient
+from src.util.scheduler.classes import chunk_scheduler
+from src.util.translation_cache.classes import translation_cache
 
 router = APIRouter(
     prefix='/analytics',
@@ -23,7 +29,7 @@ router = APIRouter(
 )
 async def get_models_stats(
         user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
-        db_session: AsyncSession = Depends(get_session)
+        db_session: AsyncSession = Depends(get_admin_session)
 ):
     return await AnalyticsRepo.get_models_stats(db_session)
 
@@ -33,6 +39,60 @@ async def get_models_stats(
 )
 async def get_prompts_stats(
         user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
-        db_session: AsyncSession = Depends(get_session)
+        db_session: AsyncSession = Depends(get_admin_session)
 ):
     return await AnalyticsRepo.get_prompts_stats(db_session)
+
+
+@router.get(
+    '/http-pool-stats/'
+)
+async def get_http_pool_stats(
+        user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
+):
+    return SharedHTTPClient.get_stats()
+
+
+@router.get(
+    '/db-pool-stats/'
+)
+async def get_db_pool_stats(
+        user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
+):
+    return get_pool_stats()
+
+
+@router.get(
+    '/chunk-scheduler-stats/'
+)
+async def get_chunk_scheduler_stats(
+        user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
+):
+    return chunk_scheduler.get_stats()
+
+
+@router.get(
+    '/translation-cache-stats/'
+)
+async def get_translation_cache_stats(
+        user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
+):
+    return await translation_cache.get_stats()
+
+
+@router.get(
+    '/circuit-breaker-stats/'
+)
+async def get_circuit_breaker_stats(
+        user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
+):
+    return await circuit_breaker.get_stats()
+
+
+@router.get(
+    '/latency-stats/'
+)
+async def get_latency_stats(
+        user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
+):
+    return latency_tracker.get_stats()
@@ -78,10 +78,8 @@ async def get_article(
     )
     if article.user_id != user_info.id:
         raise article_not_found_error
-    report_exists = bool(
-        await ReportRepo.get_by_article_id(
-            article_id=article_id, db_session=db_session
-        )
+    report_exists = await ReportRepo.exists(
+        article_id=article_id, db_session=db_session
     )
     article_scheme = ArticleOutScheme.create(article, report_exists)
     return DataResponse(data={'article': article_scheme})
@@ -96,6 +94,7 @@ async def download_article(
     article = await ArticleRepo.get_by_id(
         article_id=article_id,
         db_session=db_session,
+        with_language=True,
     )
     if article.user_id != user_info.id:
         raise article_not_found_error
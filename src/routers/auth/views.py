@@ -201,7 +201,7 @@ async def request_password_restoration_code(
         template_id=unisender_config.password_recovery_template_id,
         params={'link': link},
     )
-    publish_message(
+    await publish_message(
         rabbitmq_config.mail_topic, message.model_dump(mode='json')
     )
     return BaseResponse(message='Сообщение отправляется на почту')
@@ -9,12 +9,16 @@ class ModelCreateScheme(Scheme):
     show_name: str = Field(min_length=0, max_length=50)
     name: str = Field(min_length=0)
     provider: str = Field(min_length=0)
+    context_size: int | None = Field(default=None, gt=0)
+    max_output_tokens: int | None = Field(default=None, gt=0)
 
 
 class ModelUpdateScheme(Scheme):
     show_name: str | None = Field(min_length=0, max_length=50)
     name: str | None = Field(min_length=0)
     provider: str | None = Field(min_length=0)
+    context_size: int | None = Field(default=None, gt=0)
+    max_output_tokens: int | None = Field(default=None, gt=0)
 
 
 class ModelOutScheme(Scheme):
@@ -7,7 +7,7 @@ from fastapi import (
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.depends import get_session
+from src.depends import get_admin_session, get_session
 from src.http_responses import get_responses
 from src.responses import DataResponse, BaseResponse, SimpleListResponse
 from src.routers.models.helpers import check_model_conflicts
@@ -40,7 +40,7 @@ async def get_models(db_session: AsyncSession = Depends(get_session)):
 
 @router.get('/admin/', response_model=SimpleListResponse[ModelAdminOutScheme])
 async def get_admin_models(
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
 ):
     return SimpleListResponse[ModelAdminOutScheme].from_list(
@@ -58,7 +58,7 @@ async def get_admin_models(
 )
 async def create_model(
     model_data: ModelCreateScheme,
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
 ):
     await check_model_conflicts(
@@ -78,7 +78,7 @@ async def create_model(
 async def update_model(
     model_data: ModelUpdateScheme,
     model_id: int = Path(),
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
 ):
     model = await ModelRepo.get_by_id(model_id=model_id, db_session=db_session)
@@ -100,7 +100,7 @@ async def update_model(
 )
 async def delete_model(
     model_id: int = Path(),
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
 ):
     result = await ModelRepo.delete(model_id=model_id, db_session=db_session)
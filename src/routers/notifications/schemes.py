@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+from typing import Literal
 
 from src.database.models import NotificationType
 from src.responses import Scheme
@@ -19,3 +20,11 @@ class NotificationOutScheme(NotificationBase):
     id: uuid.UUID
     created_at: datetime
     read_at: datetime | None
+
+
+class TranslationProgressScheme(Scheme):
+    event: Literal['translation_progress'] = 'translation_progress'
+    task_id: uuid.UUID
+    chunks_done: int
+    chunks_total: int
+    eta_sec: int | None = None
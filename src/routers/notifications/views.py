@@ -7,22 +7,27 @@ from fastapi import (
     WebSocket,
 )
 
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.websockets import WebSocketDisconnect
 
 from src.depends import get_session, validate_token_for_ws
 import logging
 from src.responses import BaseResponse, SimpleListResponse
-from src.routers.notifications.schemes import NotificationOutScheme
+from src.routers.notifications.schemes import (
+    NotificationOutScheme,
+    TranslationProgressScheme,
+)
 from src.database.repos.notification import NotificationRepo
 from src.settings import notification_config
 from src.util.auth.classes import JWTCookie
 from src.util.auth.schemes import UserInfo
-from src.util.storage.classes import RedisHandler
+from src.util.notifications.classes import notification_hub
 from src.util.time.helpers import get_utc_now
 
 router = APIRouter(prefix='/notifications', tags=['Notifications'])
 logger = logging.getLogger('app')
+event_adapter = TypeAdapter(TranslationProgressScheme | NotificationOutScheme)
 
 
 @router.get('/', response_model=SimpleListResponse[NotificationOutScheme])
@@ -42,44 +47,35 @@ async def get_notifications_list(
 async def get_notifications(
     websocket: WebSocket,
     user_info: UserInfo = Depends(validate_token_for_ws),
-    # db_session: AsyncSession = Depends(get_session),
 ):
+    queue = notification_hub.subscribe(user_info.id)
     try:
         await websocket.accept()
-
-        pubsub = RedisHandler().get_pubsub()
-        await pubsub.subscribe(
-            notification_config.topic_name.format(user_info.id)
-        )
         while True:
             try:
-                message = await pubsub.get_message(timeout=0.5)
-                if message:
-                    logger.info(f'Got message {message} from redis')
-                if message and message['type'] == 'message':
-                    notification_data = message['data'].decode('utf-8')
-                    try:
-                        notification = (
-                            NotificationOutScheme.model_validate_json(
-                                notification_data
-                            )
-                        )
-                        await websocket.send_text(
-                            notification.model_dump_json(exclude_unset=True)
-                        )
-                    except Exception as e:
-                        logger.exception(e)
-                await asyncio.sleep(0)
-
-            except Exception as e:
+                notification_data = await asyncio.wait_for(
+                    queue.get(),
+                    timeout=notification_config.heartbeat_interval_sec,
+                )
+            except asyncio.TimeoutError:
+                await websocket.send_text(json.dumps({'event': 'ping'}))
+                continue
+            try:
+                notification = event_adapter.validate_json(notification_data)
+            except ValidationError as e:
                 logger.exception(e)
-                break
+                continue
+            await websocket.send_text(
+                notification.model_dump_json(exclude_unset=True)
+            )
 
     except WebSocketDisconnect:
-        logger.error(f'WebSocket connection closed')
+        logger.info('WebSocket connection closed')
     except Exception as e:
         logger.exception(e)
         await websocket.close()
+    finally:
+        notification_hub.unsubscribe(user_info.id, queue)
 
 
 @router.put('/', response_model=BaseResponse)
@@ -5,7 +5,7 @@ from fastapi import (
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import StylePrompt
-from src.depends import get_session
+from src.depends import get_admin_session, get_session
 from src.responses import SimpleListResponse, DataResponse, BaseResponse
 from src.routers.prompts.helpers import get_prompt
 from src.routers.prompts.schemes import PromptOutScheme, CreatePromptScheme, \
@@ -26,7 +26,7 @@ router = APIRouter(
     response_model=SimpleListResponse[PromptOutAdminScheme],
 )
 async def get_admin_prompts(
-        db_session: AsyncSession = Depends(get_session),
+        db_session: AsyncSession = Depends(get_admin_session),
         user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin]))
 ):
     prompts = await PromptRepo.get_list(
@@ -61,7 +61,7 @@ async def get_prompts(
 )
 async def create_prompt(
         prompt_data: CreatePromptScheme,
-        db_session: AsyncSession = Depends(get_session),
+        db_session: AsyncSession = Depends(get_admin_session),
         user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin]))
 ):
     prompt = await PromptRepo.create(
@@ -85,7 +85,7 @@ async def create_prompt(
 async def update_prompt(
         prompt_data: EditPromptScheme,
         prompt: StylePrompt = Depends(get_prompt),
-        db_session: AsyncSession = Depends(get_session),
+        db_session: AsyncSession = Depends(get_admin_session),
         user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin]))
 ):
     prompt = await PromptRepo.update(
@@ -106,7 +106,7 @@ async def update_prompt(
 )
 async def delete_prompt(
         prompt: StylePrompt = Depends(get_prompt),
-        db_session: AsyncSession = Depends(get_session),
+        db_session: AsyncSession = Depends(get_admin_session),
         user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin]))
 ):
     await PromptRepo.delete(
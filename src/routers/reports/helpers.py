@@ -11,6 +11,7 @@ from fastapi import (
 from src.depends import get_session
 from src.database.models import Report
 from src.database.repos.article import ArticleRepo
+from src.database.repos.report import ReportRepo
 from src.settings import Role
 from src.util.auth.classes import JWTCookie
 from src.util.auth.schemes import UserInfo
@@ -41,6 +42,8 @@ def get_report(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail='Статья не найдена',
             )
-        return article.report
+        return await ReportRepo.get_by_article_id(
+            article_id=article.id, db_session=db_session
+        )
 
     return async_function
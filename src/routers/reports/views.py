@@ -99,7 +99,6 @@ async def get_article_report(
 ):
     if not report:
         raise report_not_found_error
-    await db_session.refresh(report)
 
     translated_article = await ArticleRepo.get_by_id(
         article_id=report.article_id,
@@ -0,0 +1,134 @@
+import json
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import AIModel, Language, StylePrompt
+from src.database.repos.language import LanguageRepo
+from src.database.repos.model import ModelRepo
+from src.database.repos.prompt import PromptRepo
+from src.database.repos.user import UserRepo
+import logging
+from src.routers.translation.schemes import SimpleTranslationRequestScheme
+from src.settings import simple_translation_config
+from src.util.auth.schemes import UserInfo
+from src.util.common.helpers import get_ip
+from src.util.storage.classes import RedisHandler
+from src.util.time.helpers import get_utc_now
+from src.util.translator.helpers import estimate_translation_tokens
+
+logger = logging.getLogger('app')
+
+
+@dataclass
+class SimpleTranslationData:
+    source_language: Language | None
+    target_language: Language
+    model: AIModel
+    prompt: StylePrompt
+    redis_key: str
+    used_attempts: int
+    fallback_models: list[AIModel]
+
+
+async def prepare_simple_translation(
+    translation_data: SimpleTranslationRequestScheme,
+    request: Request,
+    user_info: UserInfo | None,
+    db_session: AsyncSession,
+) -> SimpleTranslationData:
+    """Loads translation parameters and checks usage limits and balance."""
+    if not simple_translation_config.is_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    redis_key = simple_translation_config.redis_cache_template.format(
+        get_ip(request),
+        get_utc_now().replace(minute=0, second=0, microsecond=0),
+    )
+    logger.info('Key to check: %s', redis_key)
+    used_attempts = int(await RedisHandler().get(redis_key) or 0)
+
+    source_language = await LanguageRepo.get_by_id(
+        language_id=translation_data.source_language_id,
+        db_session=db_session,
+    )
+    target_language = await LanguageRepo.get_by_id(
+        language_id=translation_data.target_language_id,
+        db_session=db_session,
+    )
+    if target_language is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Конечный язык не найден',
+        )
+    model = await ModelRepo.get_by_id(
+        model_id=translation_data.model_id,
+        db_session=db_session,
+    )
+    prompt = await PromptRepo.get_by_id(
+        prompt_id=translation_data.prompt_id,
+        db_session=db_session,
+    )
+
+    logger.warning('Prompt: %s', prompt.text)
+    if (
+        user_info is None
+        and used_attempts > simple_translation_config.max_usages_per_hour
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='Превышен лимит. Попробуйте позже',
+        )
+    elif user_info is not None:
+        try:
+            user = await UserRepo.get_by_id(
+                user_id=user_info.id,
+                db_session=db_session,
+            )
+        except HTTPException as e:
+            if e.status_code == status.HTTP_404_NOT_FOUND:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail='Пользователь исчез, залогиньтесь заново',
+                )
+            else:
+                raise e
+        estimated_cost = (
+            await estimate_translation_tokens(
+                input_text=translation_data.text,
+                model=model,
+                prompt=prompt,
+                source_language_id=translation_data.source_language_id,
+                target_language_id=translation_data.target_language_id,
+            )
+            * model.token_multiplier
+        )
+        if (
+            used_attempts > simple_translation_config.max_usages_per_hour
+            and user.balance < estimated_cost
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Недостаточно токенов',
+            )
+
+    return SimpleTranslationData(
+        source_language=source_language,
+        target_language=target_language,
+        model=model,
+        prompt=prompt,
+        redis_key=redis_key,
+        used_attempts=used_attempts,
+        fallback_models=await ModelRepo.get_fallbacks(
+            model=model, db_session=db_session
+        ),
+    )
+
+
+def format_sse(data: dict, event: str | None = None) -> str:
+    """Formats a server-sent event with JSON data."""
+    message = f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+    if event is not None:
+        message = f'event: {event}\n' + message
+    return message
@@ -1,4 +1,6 @@
-from operator import mod
+import asyncio
+import uuid
+
 from fastapi import (
     APIRouter,
     Body,
@@ -7,9 +9,10 @@ from fastapi import (
     Request,
     status,
 )
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import BalanceChangeCause
+from src.database.models import BalanceChangeCause, TranslationTaskStatus
 from src.util.brokers.consumer.schemes import TranslationMessage
 from src.database.repos.article import ArticleRepo
 from src.database.repos.language import LanguageRepo
@@ -17,10 +20,15 @@ from src.database.repos.model import ModelRepo
 from src.database.repos.prompt import PromptRepo
 from src.database.repos.translation_task import TaskRepo
 from src.database.repos.user import UserRepo
+from src.database import get_session as get_db_session
 from src.depends import get_session
 import logging
 from src.http_responses import get_responses
 from src.responses import BaseResponse
+from src.routers.translation.helpers import (
+    format_sse,
+    prepare_simple_translation,
+)
 from src.routers.translation.schemes import (
     CreateTaskScheme,
     CreateTranslationScheme,
@@ -29,18 +37,27 @@ from src.routers.translation.schemes import (
     SimpleTranslationOutScheme,
     SimpleTranslationRequestScheme,
 )
-from src.settings import rabbitmq_config, simple_translation_config, Role
+from src.settings import hedging_config, rabbitmq_config, Role
 from src.util.auth.classes import JWTCookie
 from src.util.auth.schemes import UserInfo
-from src.util.common.helpers import get_ip
 from src.util.storage.classes import RedisHandler
-from src.util.time.helpers import get_utc_now
 from src.util.translator.classes import Gpt4freeTranslator
-from src.util.translator.helpers import estimate_translation_tokens
-from src.util.brokers.producer.rabbitmq import publish_message
+from src.util.translator.exceptions import (
+    TranslatorAPITimeoutError,
+    TranslatorError,
+)
+from src.util.translator.helpers import (
+    EstimationMode,
+    estimate_translation_tokens,
+    estimate_translation_tokens_many,
+)
+from src.util.brokers.producer.rabbitmq import publisher
 
 router = APIRouter(prefix='/translation', tags=['Translation'])
 logger = logging.getLogger('app')
+# Tasks that must finish even if the request is cancelled. The event loop
+# keeps only weak references to tasks
+_detached_tasks: set[asyncio.Task] = set()
 
 
 @router.post('/simple/')
@@ -52,88 +69,24 @@ async def get_simple_translation(
         JWTCookie(auto_error=False, roles=[Role.user])
     ),
 ):
-    if not simple_translation_config.is_enabled:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-
-    redis_key = simple_translation_config.redis_cache_template.format(
-        get_ip(request),
-        get_utc_now().replace(minute=0, second=0, microsecond=0),
-    )
-    logger.info('Key to check: %s', redis_key)
-    redis_handler = RedisHandler()
-    used_attempts = int(await redis_handler.get(redis_key) or 0)
-
-    source_language = await LanguageRepo.get_by_id(
-        language_id=translation_data.source_language_id,
-        db_session=db_session,
-    )
-    target_language = await LanguageRepo.get_by_id(
-        language_id=translation_data.target_language_id,
-        db_session=db_session,
-    )
-    if target_language is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail='Конечный язык не найден',
-        )
-    model = await ModelRepo.get_by_id(
-        model_id=translation_data.model_id,
-        db_session=db_session,
-    )
-    prompt = await PromptRepo.get_by_id(
-        prompt_id=translation_data.prompt_id,
+    data = await prepare_simple_translation(
+        translation_data=translation_data,
+        request=request,
+        user_info=user_info,
         db_session=db_session,
     )
 
-    logger.warning('Prompt: %s', prompt.text)
-    if (
-        user_info is None
-        and used_attempts > simple_translation_config.max_usages_per_hour
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail='Превышен лимит. Попробуйте позже',
-        )
-    elif user_info is not None:
-        try:
-            user = await UserRepo.get_by_id(
-                user_id=user_info.id,
-                db_session=db_session,
-            )
-        except HTTPException as e:
-            if e.status_code == status.HTTP_404_NOT_FOUND:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail='Пользователь исчез, залогиньтесь заново',
-                )
-            else:
-                raise e
-        estimated_cost = (
-            estimate_translation_tokens(
-                input_text=translation_data.text,
-                model=model,
-                prompt=prompt,
-            )
-            * model.token_multiplier
-        )
-        if (
-            used_attempts > simple_translation_config.max_usages_per_hour
-            and user.balance < estimated_cost
-        ):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail='Недостаточно токенов',
-            )
-
     translated_text, tokens_used = await Gpt4freeTranslator().translate(
         text=translation_data.text,
-        source_language=source_language,
-        target_language=target_language,
-        model=model,
-        prompt_object=prompt,
+        source_language=data.source_language,
+        target_language=data.target_language,
+        model=data.model,
+        prompt_object=data.prompt,
+        fallback_models=data.fallback_models,
+        hedge=hedging_config.is_enabled,
     )
 
-    await redis_handler.set(redis_key, used_attempts + 1, 3600)
+    await RedisHandler().set(data.redis_key, data.used_attempts + 1, 3600)
 
     if user_info is not None:
         await UserRepo.update_balance(
@@ -145,6 +98,80 @@ async def get_simple_translation(
     return SimpleTranslationOutScheme(text=translated_text)
 
 
+@router.post('/simple/stream/')
+async def stream_simple_translation(
+    translation_data: SimpleTranslationRequestScheme,
+    request: Request,
+    user_info: UserInfo | None = Depends(
+        JWTCookie(auto_error=False, roles=[Role.user])
+    ),
+):
+    """Streams translation as server-sent events.
+
+    Every `message` event carries a piece of translated text (`text`) in
+    order. The stream ends with an `end` event containing the amount of
+    used tokens, or an `error` event with `detail`.
+    """
+    # Dependencies are closed only after the response is sent, so the
+    # session is opened here to not hold a connection during the stream.
+    # Loaded objects are detached to keep their attributes from expiring
+    async with get_db_session() as db_session:
+        data = await prepare_simple_translation(
+            translation_data=translation_data,
+            request=request,
+            user_info=user_info,
+            db_session=db_session,
+        )
+        db_session.expunge_all()
+
+    async def finalize(tokens_used: int):
+        await RedisHandler().set(data.redis_key, data.used_attempts + 1, 3600)
+        if user_info is None or not tokens_used:
+            return
+        async with get_db_session() as session:
+            await UserRepo.update_balance(
+                user_id=user_info.id,
+                delta=-1 * tokens_used,
+                reason=BalanceChangeCause.translation,
+                db_session=session,
+            )
+
+    async def event_stream():
+        tokens_used = 0
+        try:
+            async for piece, tokens in Gpt4freeTranslator().translate_stream(
+                text=translation_data.text,
+                source_language=data.source_language,
+                target_language=data.target_language,
+                model=data.model,
+                prompt_object=data.prompt,
+                fallback_models=data.fallback_models,
+            ):
+                tokens_used += tokens
+                if piece:
+                    yield format_sse({'text': piece})
+        except TranslatorAPITimeoutError:
+            yield format_sse(
+                {'detail': 'Сервис перевода не отвечает. Попробуйте позже'},
+                event='error',
+            )
+        except TranslatorError:
+            yield format_sse({'detail': 'Ошибка сервера'}, event='error')
+        finally:
+            # Charge for the tokens used even if the client disconnected
+            finalizing = asyncio.create_task(finalize(tokens_used))
+            _detached_tasks.add(finalizing)
+            finalizing.add_done_callback(_detached_tasks.discard)
+            await asyncio.shield(finalizing)
+        yield format_sse({'tokens': tokens_used}, event='end')
+
+    return StreamingResponse(
+        event_stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @router.post(
     '/',
     response_model=BaseResponse,
@@ -179,12 +206,18 @@ async def create_translation(
         db_session=db_session,
     )
     estimated_tokens = (
-        estimate_translation_tokens(
-            input_text=article.text,
-            model=model,
-            prompt=prompt,
+        sum(
+            await estimate_translation_tokens_many(
+                input_text=article.text,
+                model=model,
+                prompt=prompt,
+                target_language_ids=translation_data.target_language_ids,
+                # Only a balance gate: the exact amount is charged on
+                # completion
+                mode=EstimationMode.sample,
+                source_language_id=article.language_id,
+            )
         )
-        * len(translation_data.target_language_ids)
         * model.token_multiplier
     )
     logger.info('Estimated tokens amount: %s', estimated_tokens)
@@ -194,28 +227,37 @@ async def create_translation(
             detail='Недостаточно токенов',
         )
 
-    failed_languages = []
-    for target_language_id in translation_data.target_language_ids:
-        if not await LanguageRepo.exists(
-            language_id=target_language_id, db_session=db_session
-        ):
-            failed_languages.append(target_language_id)
-            continue
-        task = await TaskRepo.create(
-            task_data=CreateTaskScheme(
+    existing_language_ids = await LanguageRepo.get_existing_ids(
+        language_ids=translation_data.target_language_ids,
+        db_session=db_session,
+    )
+    failed_languages = [
+        language_id
+        for language_id in translation_data.target_language_ids
+        if language_id not in existing_language_ids
+    ]
+    task_ids = await TaskRepo.create_many(
+        tasks_data=[
+            CreateTaskScheme(
                 article_id=translation_data.article_id,
                 model_id=translation_data.model_id,
                 prompt_id=translation_data.prompt_id,
                 target_language_id=target_language_id,
-            ),
-            db_session=db_session,
-        )
-        message = TranslationMessage(task_id=task.id)
-
-        await db_session.flush()
-        publish_message(
-            rabbitmq_config.translation_topic, message.model_dump(mode='json')
-        )
+            )
+            for target_language_id in translation_data.target_language_ids
+            if target_language_id in existing_language_ids
+        ],
+        db_session=db_session,
+    )
+    # Tasks must be visible to consumers before their messages arrive
+    await db_session.commit()
+    await publisher.publish_many(
+        rabbitmq_config.translation_topic,
+        [
+            TranslationMessage(task_id=task_id).model_dump(mode='json')
+            for task_id in task_ids
+        ],
+    )
     if not failed_languages:
         return BaseResponse(message='Перевод запущен. Ожидайте')
     if len(failed_languages) == len(translation_data.target_language_ids):
@@ -231,11 +273,57 @@ async def create_translation(
     )
 
 
+@router.post(
+    '/{task_id}/retry/',
+    response_model=BaseResponse,
+    responses=get_responses(400, 401, 403, 404),
+)
+async def retry_translation(
+    task_id: uuid.UUID,
+    db_session: AsyncSession = Depends(get_session),
+    user_info: UserInfo = Depends(JWTCookie(roles=[Role.user])),
+):
+    """Restarts a failed task. Chunks translated before the failure are
+    taken from its checkpoint and are not paid for again."""
+    task_not_found_error = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail='Задача не найдена'
+    )
+    task = await TaskRepo.get_by_id(task_id=task_id, db_session=db_session)
+    if task is None:
+        raise task_not_found_error
+    article = await ArticleRepo.get_by_id(
+        article_id=task.article_id, db_session=db_session
+    )
+    if article.user_id != user_info.id:
+        raise task_not_found_error
+    if task.status != TranslationTaskStatus.failed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Перезапустить можно только задачу с ошибкой',
+        )
+    task.status = TranslationTaskStatus.created
+    task.data = {
+        key: value
+        for key, value in (task.data or {}).items()
+        if key != 'error'
+    }
+    # The task must be visible to consumers before its message arrives
+    await db_session.commit()
+    await publisher.publish(
+        rabbitmq_config.translation_topic,
+        TranslationMessage(task_id=task_id).model_dump(mode='json'),
+    )
+    return BaseResponse(message='Перевод перезапущен. Ожидайте')
+
+
 @router.get('/estimate/')
 async def get_text_estimation(
     request_data: EstimationRequestScheme,
     model_id: int,
     prompt_id: int,
+    mode: EstimationMode = EstimationMode.exact,
+    source_language_id: int | None = None,
+    target_language_id: int | None = None,
     db_session: AsyncSession = Depends(get_session),
 ):
     model = await ModelRepo.get_by_id(
@@ -246,9 +334,12 @@ async def get_text_estimation(
         prompt_id=prompt_id,
         db_session=db_session,
     )
-    estimated_tokens = estimate_translation_tokens(
+    estimated_tokens = await estimate_translation_tokens(
         input_text=request_data.text,
         model=model,
         prompt=prompt,
+        mode=mode,
+        source_language_id=source_language_id,
+        target_language_id=target_language_id,
     )
     return EstimationResponseScheme(tokens=estimated_tokens)
@@ -7,13 +7,13 @@ from fastapi import (
 
 from src.database.models import User
 from src.database.repos.user import UserRepo
-from src.depends import get_session
+from src.depends import get_admin_session
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 async def get_user(
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
     user_id: uuid.UUID = Path(),
 ) -> User:
     return await UserRepo.get_by_id(user_id, db_session)
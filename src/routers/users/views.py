@@ -9,7 +9,7 @@ from fastapi import (
     Path,
 )
 
-from src.depends import get_session
+from src.depends import get_admin_session, get_session
 from src.database.models import User
 from src.http_responses import get_responses
 from src.pagination import PaginationParams, get_pagination_params
@@ -59,7 +59,7 @@ async def get_list(
     filter_role: Role | None = None,
     pagination: PaginationParams = Depends(get_pagination_params),
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
 ):
     users, count = await UserRepo.get_list(
         pagination_params=pagination,
@@ -112,7 +112,7 @@ async def change_name(
 async def create_user(
     new_user_data: CreateUserScheme,
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
 ):
     user = await UserRepo.create(
         user_data=new_user_data, db_session=db_session
@@ -129,7 +129,7 @@ async def update_user(
     new_user_info: EditUserScheme,
     user: User = Depends(get_user),
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
 ):
     user = await UserRepo.update(
         user=user, new_data=new_user_info, db_session=db_session,
@@ -141,7 +141,7 @@ async def update_user(
 async def delete_user(
     user: User = Depends(get_user),
     user_info: UserInfo = Depends(JWTCookie(roles=[Role.admin])),
-    db_session: AsyncSession = Depends(get_session),
+    db_session: AsyncSession = Depends(get_admin_session),
 ):
     await UserRepo.soft_delete(user=user, db_session=db_session)
     return BaseResponse(message='Пользователь удалён')
@@ -35,8 +35,16 @@ class Database(BaseSettings):
     prefix: str = ''
     url: str
     pool_size: int = 5
+    max_overflow: int = 12
+    pool_timeout: int = 30
     pool_recycle: int = 600
     pool_pre_ping: bool = False
+    # Sessions open at once per workload, see `ConcurrencyClass`. The sum
+    # should not exceed pool_size + max_overflow
+    interactive_concurrency: int = 8
+    background_concurrency: int = 4
+    admin_concurrency: int = 3
+    translation_cache_concurrency: int = 2
 
 
 @settings_class('JWT_')
@@ -67,11 +75,109 @@ class AppEvent(enum.Enum):
 class TextTranslationConfig(BaseSettings):
     max_text_length: int = 10000000
     max_words_in_text: int = 1000000
-    max_words_in_chunk: int = 400
+    max_tokens_in_chunk: int = 2000
+    default_context_size: int = 8192
+    default_max_output_tokens: int = 4096
+    # Expected ratio of output to input tokens of a chunk. Keeps room for
+    # translations into languages that take more tokens than the source
+    output_tokens_ratio: float = 2.0
+    # Tokens taken by chat messages markup around prompt and chunk
+    message_overhead_tokens: int = 16
+    checkpoint_interval_sec: float = 5.0
+    # Paragraphs repeated within a job are translated once if they are at
+    # least this long (in characters)
+    deduplication_min_length: int = 30
     special_characters: ClassVar = ['\\n', '\\t']
     to_charge_payment: bool = True
 
 
+@settings_class('TOKEN_ESTIMATION_')
+class TokenEstimationConfig(BaseSettings):
+    # Texts at least this long (in characters) have their token counts
+    # memoised in Redis and are encoded outside of the event loop
+    memo_min_length: int = 10000
+    offload_min_length: int = 100000
+    memo_ttl_sec: int = 60 * 60 * 24
+    redis_key_template: ClassVar = 'token_count:{}'
+    # Sampling estimation is used only for texts at least this long
+    sample_min_length: int = 200000
+    sample_strata: int = 20
+    sample_units_per_stratum: int = 5
+    # Characters in a sampling unit when text has too few paragraphs
+    sample_unit_length: int = 2000
+    # z-score of the upper confidence bound, 2.33 is one-sided 99%
+    sample_z_score: float = 2.33
+    # Task costs per source token and per chunk fitted from completed tasks
+    # by translator consumers every `calibration_interval_sec` (0 disables
+    # it) or by the `calibrate_token_estimation` command
+    calibration_interval_sec: int = 60 * 60 * 6
+    calibration_max_tasks: int = 5000
+    calibration_min_samples: int = 20
+    calibration_quantile: float = 0.95
+    calibration_refresh_sec: int = 60 * 10
+    redis_ratios_key: ClassVar = 'token_ratios'
+    redis_calibration_lock_key: ClassVar = 'token_ratios:calibration_lock'
+
+
+@settings_class('CHUNK_SCHEDULER_')
+class ChunkSchedulerConfig(BaseSettings):
+    global_concurrency: int = 32
+    model_concurrency: int = 8
+
+
+@settings_class('TRANSLATION_CACHE_')
+class TranslationCacheConfig(BaseSettings):
+    is_enabled: bool = True
+    ttl_sec: int = 60 * 60 * 24 * 30
+    max_entries: int = 100000
+    db_max_entries: int = 1000000
+    max_chunk_length: int = 20000
+    redis_key_template: ClassVar = 'translation_cache:{}'
+    redis_index_key: ClassVar = 'translation_cache:index'
+    redis_stats_key: ClassVar = 'translation_cache:stats'
+
+
+@settings_class('CIRCUIT_BREAKER_')
+class CircuitBreakerConfig(BaseSettings):
+    # Failures of a model/provider pair within the window that open circuit
+    failure_threshold: int = 5
+    failure_window_sec: int = 60
+    # How long requests are not sent to the pair after circuit is opened
+    open_sec: int = 30
+    # Attempts of a request to one provider before failing over to another
+    provider_attempts: int = 2
+    retry_max_wait_sec: float = 2.0
+    redis_state_key_template: ClassVar = 'circuit_breaker:state:{}'
+    redis_failures_key_template: ClassVar = 'circuit_breaker:failures:{}'
+    redis_probe_key_template: ClassVar = 'circuit_breaker:probe:{}'
+
+
+@settings_class('RATE_LIMITER_')
+class RateLimiterConfig(BaseSettings):
+    is_enabled: bool = True
+    default_requests_per_minute: int = 60
+    default_tokens_per_minute: int = 100000
+    # Limits of specific providers, e.g. '{"OpenRouter": 20}'
+    provider_requests_per_minute: dict[str, int] = {}
+    provider_tokens_per_minute: dict[str, int] = {}
+    # Waiting for a provider longer than this fails over to another one
+    max_wait_sec: float = 30.0
+    redis_key_template: ClassVar = 'rate_limiter:{}'
+
+
+@settings_class('HEDGING_')
+class HedgingConfig(BaseSettings):
+    is_enabled: bool = True
+    # A duplicate request is sent when the first one is slower than this
+    # percentile of recent latencies of the model
+    percentile: float = 0.9
+    min_samples: int = 20
+    window_size: int = 200
+    # Estimated tokens all processes may spend on duplicate requests
+    token_budget_per_minute: int = 20000
+    redis_budget_key_template: ClassVar = 'hedging:budget:{}'
+
+
 @settings_class('SIMPLE_TRANSLATION_')
 class SimpleTranslationConfig(BaseSettings):
     is_enabled: bool = False
@@ -85,6 +191,15 @@ class G4FConfig(BaseSettings):
     address: str
 
 
+@settings_class('HTTP_CLIENT_')
+class HTTPClientConfig(BaseSettings):
+    timeout_sec: float = 120.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_sec: float = 30.0
+    http2: bool = False
+
+
 @settings_class('OPENROUTER_')
 class OpenRouterConfig(BaseSettings):
     api_key: str
@@ -97,6 +212,18 @@ class RabbitMQConfig(BaseSettings):
     password: str
     translation_topic: str
     mail_topic: str
+    publisher_channel_pool_size: int = 10
+
+
+@settings_class('CONSUMER_')
+class ConsumerConfig(BaseSettings):
+    prefetch_count: int = 8
+    workers: int = 8
+    drain_timeout_sec: int = 60
+    # A message delivered more times than this (e.g. it crashes the
+    # consumer) is rejected to the dead letter exchange of the queue, if any
+    max_deliveries: int = 5
+    redis_deliveries_key_template: ClassVar = 'consumer:deliveries:{}'
 
 
 @settings_class('REDIS_CONFIG_')
@@ -143,6 +270,9 @@ class NotificationConfig(BaseSettings):
 
     time_to_live_in_redis: int = 10
     topic_name: str = 'notifications_{}'
+    progress_min_interval_sec: float = 1.0
+    heartbeat_interval_sec: int = 30
+    socket_queue_size: int = 100
     translation_success_message: str = (
         'Статья {article_name} успешно переведена на {target_lang} язык'
     )
@@ -193,9 +323,17 @@ database_config = Database()
 jwt_config = JWTConfig()
 text_translation_config = TextTranslationConfig()
 simple_translation_config = SimpleTranslationConfig()
+token_estimation_config = TokenEstimationConfig()
+chunk_scheduler_config = ChunkSchedulerConfig()
+translation_cache_config = TranslationCacheConfig()
+circuit_breaker_config = CircuitBreakerConfig()
+hedging_config = HedgingConfig()
+rate_limiter_config = RateLimiterConfig()
 g4f_config = G4FConfig()
+http_client_config = HTTPClientConfig()
 openrouter_config = OpenRouterConfig()
 rabbitmq_config = RabbitMQConfig()
+consumer_config = ConsumerConfig()
 redis_config = RedisConfig()
 translation_task_config = TranslationTaskConfig()
 unisender_config = UnisenderConfig()
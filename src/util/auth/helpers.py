@@ -114,7 +114,7 @@ async def send_email_confirmation_message(
         template_id=unisender_config.email_confirmation_template_id,
         params={'link': link},
     )
-    publish_message(
+    await publish_message(
         rabbitmq_config.mail_topic, message.model_dump(mode='json')
     )
 
@@ -1,7 +1,11 @@
 import asyncio
+import functools
+import hashlib
 import json
+import signal
+import uuid
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import logging
 from src.util.brokers.consumer.exceptions import IntegrityException
 from src.util.mail.classes import UnisenderMailSender
@@ -9,29 +13,38 @@ from src.util.mail.schemes import SendEmailScheme
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.util.brokers.consumer.schemes import TranslationMessage
-from src.database import get_session
+from src.util.http.classes import SharedHTTPClient
+from src.database import ConcurrencyClass, count_statements, get_session
 from src.database.models import (
     AIModel,
-    Article,
     BalanceChangeCause,
     Language,
     NotificationType,
     StylePrompt,
-    TranslationTask,
     TranslationTaskStatus,
 )
 from src.database.repos.article import ArticleRepo
-from src.database.repos.language import LanguageRepo
 from src.database.repos.model import ModelRepo
-from src.database.repos.prompt import PromptRepo
+from src.database.repos.translation_checkpoint import CheckpointRepo
 from src.database.repos.translation_task import TaskRepo
 from src.database.repos.user import UserRepo
 from src.routers.articles.schemes import CreateArticleScheme
 from src.routers.notifications.schemes import NotificationCreateScheme
-from src.settings import notification_config, rabbitmq_config
+from src.settings import (
+    consumer_config,
+    notification_config,
+    rabbitmq_config,
+    token_estimation_config,
+)
+from src.util.checkpoints.classes import TranslationCheckpoint
+from src.util.notifications.classes import ProgressReporter
 from src.util.notifications.helpers import send_notification
+from src.util.storage.classes import RedisHandler
+from src.util.token_ratios.helpers import run_periodic_calibration
+from src.util.translator.abstract import DeduplicationStats
 from src.util.translator.classes import Gpt4freeTranslator
 from src.util.translator.exceptions import TranslatorAPITimeoutError
+from src.util.translator.helpers import count_tokens_async
 
 from aio_pika import connect, logger as pika_logger
 from aio_pika.abc import AbstractIncomingMessage
@@ -40,31 +53,130 @@ logger = logging.getLogger('app')
 pika_logger.setLevel(logging.WARNING)
 
 
-@dataclass
+@dataclass(frozen=True)
 class TranslationData:
-    task: TranslationTask
-    source_article: Article
+    task_id: uuid.UUID
+    article_id: uuid.UUID
+    user_id: uuid.UUID
+    title: str
+    text: str
     source_language: Language | None
     target_language: Language
     prompt: StylePrompt
     model: AIModel
+    fallback_models: list[AIModel]
+
+
+@functools.cache
+def _get_redis_handler() -> RedisHandler:
+    return RedisHandler()
 
 
 class AbstractAsyncConsumer(ABC):
+    """Base RabbitMQ consumer with an in-process worker pool.
+
+    Up to `prefetch_count` unacknowledged messages are delivered to the
+    process and handled by `workers` concurrent tasks. On SIGTERM/SIGINT
+    the consumer stops receiving new messages, waits up to
+    `drain_timeout_sec` for the delivered ones to finish and returns the
+    rest to the queue.
+
+    Returned messages are delivered again, also after being returned by a
+    shutdown. Deliveries are counted in Redis, and a message delivered more
+    than `max_deliveries` times is rejected without requeueing.
+    """
+
     async def run(self, queue_name: str):
         logger.info('Starting consumer for queue <%s>', queue_name)
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stopping.set)
+
         connection = await connect(
             f'amqp://{rabbitmq_config.login}:{rabbitmq_config.password}@{rabbitmq_config.host}/'
         )
+        messages: asyncio.Queue[AbstractIncomingMessage] = asyncio.Queue()
+        try:
+            async with connection:
+                channel = await connection.channel()
+                await channel.set_qos(
+                    prefetch_count=consumer_config.prefetch_count
+                )
+                queue = await channel.declare_queue(queue_name)
+                workers = [
+                    asyncio.create_task(self._worker(messages))
+                    for _ in range(consumer_config.workers)
+                ]
+                consumer_tag = await queue.consume(messages.put)
+
+                await stopping.wait()
+                logger.info(
+                    'Stopping consumer for queue <%s>, draining %s messages',
+                    queue_name,
+                    messages.qsize(),
+                )
+                await queue.cancel(consumer_tag)
+                try:
+                    await asyncio.wait_for(
+                        messages.join(), consumer_config.drain_timeout_sec
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(
+                        'Drain timeout exceeded, requeueing unfinished '
+                        'messages'
+                    )
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                while not messages.empty():
+                    await messages.get_nowait().nack(requeue=True)
+        finally:
+            await SharedHTTPClient.close()
+        logger.info('Consumer for queue <%s> stopped', queue_name)
+
+    @staticmethod
+    def _get_message_id(message: AbstractIncomingMessage) -> str:
+        """Id set by the publisher, or hash of the body of messages
+        published without it."""
+        return message.message_id or hashlib.sha256(message.body).hexdigest()
 
-        async with connection:
-            channel = await connection.channel()
-            await channel.set_qos(prefetch_count=1)
-            queue = await channel.declare_queue(queue_name)
-            await queue.consume(self._on_message)
+    async def _count_delivery(self, message: AbstractIncomingMessage) -> int:
+        """Returns how many times the message has been delivered, 1 if
+        Redis is unavailable."""
+        key = consumer_config.redis_deliveries_key_template.format(
+            self._get_message_id(message)
+        )
+        try:
+            async with _get_redis_handler().client.pipeline(
+                transaction=True
+            ) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, 60 * 60 * 24)
+                deliveries, _ = await pipe.execute()
+        except Exception as e:
+            logger.warning('Could not count message deliveries: %s', e)
+            return 1
+        return deliveries
 
-            await asyncio.Future()
-        logger.info('Lmao consumer ended working')
+    async def _worker(self, messages: asyncio.Queue[AbstractIncomingMessage]):
+        while True:
+            message = await messages.get()
+            try:
+                deliveries = await self._count_delivery(message)
+                if deliveries > consumer_config.max_deliveries:
+                    logger.error(
+                        'Message %s is delivered %s times, rejecting it',
+                        message.message_id,
+                        deliveries,
+                    )
+                    await message.reject(requeue=False)
+                    continue
+                await self._on_message(message)
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                messages.task_done()
 
     async def _on_message(self, message: AbstractIncomingMessage):
         pass
@@ -72,7 +184,7 @@ class AbstractAsyncConsumer(ABC):
 
 class MailConsumer(AbstractAsyncConsumer):
     async def _on_message(self, message: AbstractIncomingMessage):
-        async with message.process():
+        async with message.process(requeue=True):
             body = message.body.decode()
             message_scheme = SendEmailScheme.model_validate_json(body)
             logger.info(
@@ -96,168 +208,280 @@ class MailConsumer(AbstractAsyncConsumer):
 
 
 class TranslationConsumer(AbstractAsyncConsumer):
+    """Runs translation tasks in three phases, so that no database
+    connection is held while the model is translating:
+
+    1. A short transaction loads the task and marks it started;
+    2. The texts are translated, chunks are saved to the checkpoint and the
+       cache in their own short sessions;
+    3. A short transaction saves the article, charges the balance and
+       notifies the user.
+
+    Token estimation is recalibrated from completed tasks in the
+    background, see `run_periodic_calibration`.
+    """
+
     translator = Gpt4freeTranslator()
 
+    async def run(self, queue_name: str):
+        calibration = None
+        if token_estimation_config.calibration_interval_sec:
+            calibration = asyncio.create_task(run_periodic_calibration())
+        try:
+            await super().run(queue_name)
+        finally:
+            if calibration is not None:
+                calibration.cancel()
+
     @staticmethod
-    async def __check_message_consistency(
-        message: TranslationMessage, db_session: AsyncSession
-    ) -> TranslationData:
-        task = await TaskRepo.get_by_id(
+    async def __start_task(
+        message: TranslationMessage,
+        message_id: str,
+        db_session: AsyncSession,
+    ) -> TranslationData | None:
+        """Loads the task and marks it started by the message.
+
+        Returns None if the task must not be run: it is already completed
+        (e.g. the message is delivered again after the task was saved but
+        before the message was acknowledged), failed, or is run by another
+        message.
+        """
+        if not await TaskRepo.start(
+            task_id=message.task_id,
+            message_id=message_id,
+            db_session=db_session,
+        ):
+            return None
+        context = await TaskRepo.get_context(
             task_id=message.task_id, db_session=db_session
         )
-        if not task:
+        if context is None:
             raise IntegrityException(
                 f'Задача с идентификатором {message.task_id} не найдена'
             )
-        article = await ArticleRepo.get_by_id(
-            article_id=task.article_id, db_session=db_session
-        )
-        if not article:
+        if context.article_id is None:
             raise IntegrityException(
-                f'Исходная статья не найдена по'
-                f' идентификатору: {task.article_id}'
+                f'Исходная статья для задачи {message.task_id} не найдена'
             )
-        source_lang = await LanguageRepo.get_by_id(
-            language_id=article.language_id, db_session=db_session
-        )
-        target_lang = await LanguageRepo.get_by_id(
-            language_id=task.target_language_id, db_session=db_session
-        )
-        if not target_lang:
+        if context.target_language is None:
             raise IntegrityException(
-                f'Конечный язык не найден по идентификатору:'
-                f' {task.target_language_id}'
+                f'Конечный язык для задачи {message.task_id} не найден'
             )
-        model = await ModelRepo.get_by_id(
-            model_id=task.model_id,
+        if context.model is None or context.prompt is None:
+            raise IntegrityException(
+                f'Модель или промпт для задачи {message.task_id} не найдены'
+            )
+
+        fallback_models = await ModelRepo.get_fallbacks(
+            model=context.model, db_session=db_session
+        )
+        # Detached objects are not expired on commit and stay usable after
+        # the session is closed
+        db_session.expunge_all()
+
+        return TranslationData(
+            task_id=message.task_id,
+            article_id=context.article_id,
+            user_id=context.user_id,
+            title=context.title,
+            text=context.text,
+            source_language=context.source_language,
+            target_language=context.target_language,
+            prompt=context.prompt,
+            model=context.model,
+            fallback_models=fallback_models,
+        )
+
+    async def __translate(
+        self, task_data: TranslationData
+    ) -> tuple[tuple[str, int], tuple[str, int], DeduplicationStats]:
+        """Translates title and text of the article.
+
+        Returns:
+            tuple: Translated title and text with amounts of tokens used for
+                them, and deduplication stats of the job
+        """
+        checkpoint = TranslationCheckpoint(task_id=task_data.task_id)
+        await checkpoint.load()
+        deduplication_stats = DeduplicationStats()
+        title_result, text_result = await self.translator.translate_many(
+            texts=[task_data.title, task_data.text],
+            target_language=task_data.target_language,
+            source_language=task_data.source_language,
+            model=task_data.model,
+            prompt_object=task_data.prompt,
+            job_id=task_data.task_id,
+            on_progress=ProgressReporter(
+                user_id=task_data.user_id,
+                task_id=task_data.task_id,
+            ).report,
+            checkpoint=checkpoint,
+            fallback_models=task_data.fallback_models,
+            deduplication_stats=deduplication_stats,
+            cache_concurrency_class=ConcurrencyClass.background,
+        )
+        return title_result, text_result, deduplication_stats
+
+    @staticmethod
+    async def __complete_task(
+        task_data: TranslationData,
+        translated_title: str,
+        translated_text: str,
+        tokens: int,
+        deduplication_stats: DeduplicationStats,
+        source_tokens: int,
+        db_session: AsyncSession,
+    ) -> None:
+        translated_article = await ArticleRepo.create(
+            article_data=CreateArticleScheme(
+                title=translated_title,
+                text=translated_text,
+                user_id=task_data.user_id,
+                language_id=task_data.target_language.id,
+                original_article_id=task_data.article_id,
+            ),
             db_session=db_session,
         )
-        prompt_object = await PromptRepo.get_by_id(
-            prompt_id=task.prompt_id,
+        await UserRepo.update_balance(
+            user_id=task_data.user_id,
+            delta=tokens * -1,
+            reason=BalanceChangeCause.translation,
+            db_session=db_session,
+        )
+        await TaskRepo.update(
+            task_id=task_data.task_id,
+            values={
+                'status': TranslationTaskStatus.completed,
+                'translated_article_id': translated_article.id,
+                'cost': tokens,
+            },
+            # Token estimates are calibrated on these, without encoding
+            # the articles again
+            data={
+                'deduplication': asdict(deduplication_stats),
+                'source_tokens': source_tokens,
+            },
+            db_session=db_session,
+        )
+        await CheckpointRepo.delete_for_task(
+            task_id=task_data.task_id, db_session=db_session
+        )
+        await send_notification(
+            notification_scheme=NotificationCreateScheme(
+                title=notification_config.Subjects.translation_ended,
+                text=notification_config.translation_success_message.format(
+                    article_name=task_data.title,
+                    target_lang=task_data.target_language.name,
+                ),
+                user_id=task_data.user_id,
+                type=NotificationType.info,
+            ),
             db_session=db_session,
         )
 
-        task.status = TranslationTaskStatus.started
-        await db_session.flush()
-
-        return TranslationData(
-            task=task,
-            source_article=article,
-            source_language=source_lang,
-            target_language=target_lang,
-            prompt=prompt_object,
-            model=model,
+    @staticmethod
+    async def __fail_task(
+        task_data: TranslationData,
+        error_message: str,
+        db_session: AsyncSession,
+    ) -> None:
+        # Translated chunks stay in the checkpoint, so the task can be
+        # retried without paying for them again
+        await TaskRepo.update(
+            task_id=task_data.task_id,
+            values={'status': TranslationTaskStatus.failed},
+            data={'error': error_message},
+            db_session=db_session,
+        )
+        await send_notification(
+            notification_scheme=NotificationCreateScheme(
+                title=(notification_config.Subjects.translation_error),
+                text=error_message,
+                type=NotificationType.error,
+                user_id=task_data.user_id,
+            ),
+            db_session=db_session,
         )
 
     async def _on_message(self, message: AbstractIncomingMessage):
+        with count_statements() as statements:
+            await self._handle_translation(message)
+        logger.info(
+            'Translation message handled with %s DB statements', statements[0]
+        )
+
+    async def _handle_translation(self, message: AbstractIncomingMessage):
         task_data = None
         error_message = None
-        async with message.process():
-            async with get_session() as db_session:
-                try:
-                    body = message.body.decode()
-                    logger.info(
-                        f'Received message {body} of type {type(body)}'
-                    )
-                    message_scheme = TranslationMessage.model_validate(
-                        json.loads(body)
-                    )
+        async with message.process(requeue=True):
+            try:
+                body = message.body.decode()
+                logger.info(f'Received message {body} of type {type(body)}')
+                message_scheme = TranslationMessage.model_validate(
+                    json.loads(body)
+                )
 
-                    task_data = await self.__check_message_consistency(
-                        message_scheme, db_session
-                    )
-                    (
-                        translated_title,
-                        title_tokens,
-                    ) = await self.translator.translate(
-                        text=task_data.source_article.title,
-                        target_language=task_data.target_language,
-                        source_language=task_data.source_language,
-                        model=task_data.model,
-                        prompt_object=task_data.prompt,
-                    )
-                    logger.info(f'Translated title: {translated_title}')
-
-                    (
-                        translated_text,
-                        text_tokens,
-                    ) = await self.translator.translate(
-                        text=task_data.source_article.text,
-                        target_language=task_data.target_language,
-                        source_language=task_data.source_language,
-                        model=task_data.model,
-                        prompt_object=task_data.prompt,
-                    )
-                    logger.info(f'Translated text: {translated_text}')
-
-                    translated_article = await ArticleRepo.create(
-                        article_data=CreateArticleScheme(
-                            title=translated_title,
-                            text=translated_text,
-                            user_id=task_data.source_article.user_id,
-                            language_id=task_data.target_language.id,
-                            original_article_id=task_data.source_article.id,
-                        ),
+                async with get_session(
+                    ConcurrencyClass.background
+                ) as db_session:
+                    task_data = await self.__start_task(
+                        message=message_scheme,
+                        message_id=self._get_message_id(message),
                         db_session=db_session,
                     )
-                    db_session.add(translated_article)
-                    await db_session.flush()
-                    await db_session.refresh(translated_article)
-                    await db_session.refresh(task_data.source_article)
-
-                    task_data.task.status = TranslationTaskStatus.completed
-                    task_data.task.translated_article_id = (
-                        translated_article.id
-                    )
-                    await UserRepo.update_balance(
-                        user_id=task_data.source_article.user_id,
-                        delta=(title_tokens + text_tokens) * -1,
-                        reason=BalanceChangeCause.translation,
-                        db_session=db_session,
+                if task_data is None:
+                    logger.info(
+                        'Task %s is finished or run by another message, '
+                        'skipping it',
+                        message_scheme.task_id,
                     )
-                    task_data.task.cost = title_tokens + text_tokens
-                    await db_session.flush()
-
-                    await db_session.refresh(task_data.task)
-                    await db_session.refresh(task_data.target_language)
-                    await db_session.refresh(task_data.source_article)
-                    await send_notification(
-                        notification_scheme=NotificationCreateScheme(
-                            title=notification_config.Subjects.translation_ended,
-                            text=notification_config.translation_success_message.format(
-                                article_name=task_data.source_article.title,
-                                target_lang=task_data.target_language.name,
-                            ),
-                            user_id=task_data.source_article.user_id,
-                            type=NotificationType.info,
-                        ),
+                    return
+
+                (
+                    (translated_title, title_tokens),
+                    (translated_text, text_tokens),
+                    deduplication_stats,
+                ) = await self.__translate(task_data)
+                logger.info(f'Translated title: {translated_title}')
+                logger.info(f'Translated text: {translated_text}')
+                source_tokens = await count_tokens_async(
+                    task_data.title, task_data.model.name
+                ) + await count_tokens_async(
+                    task_data.text, task_data.model.name
+                )
+
+                async with get_session(
+                    ConcurrencyClass.background
+                ) as db_session:
+                    await self.__complete_task(
+                        task_data=task_data,
+                        translated_title=translated_title,
+                        translated_text=translated_text,
+                        tokens=title_tokens + text_tokens,
+                        deduplication_stats=deduplication_stats,
+                        source_tokens=source_tokens,
                         db_session=db_session,
                     )
-                except IntegrityException as e:
-                    error_message = str(e)
-                    logger.error(e)
-                except TranslatorAPITimeoutError:
-                    error_message = (
-                        'Сервис перевода не отвечает. Попробуйте позже'
-                    )
-                except Exception as e:
-                    logger.exception(e)
-                    error_message = 'Ошибка сервера'
+            except IntegrityException as e:
+                error_message = str(e)
+                logger.error(e)
+            except TranslatorAPITimeoutError:
+                error_message = 'Сервис перевода не отвечает. Попробуйте позже'
+            except Exception as e:
+                logger.exception(e)
+                error_message = 'Ошибка сервера'
 
-                logger.info('Error message is: %s', error_message)
-                if error_message is None:
-                    return
-                logger.info('task data is %s', task_data)
-                if task_data is None:
-                    logger.error("Can't send notification: user unknown")
-                    return
-                await send_notification(
-                    notification_scheme=NotificationCreateScheme(
-                        title=(notification_config.Subjects.translation_error),
-                        text=error_message,
-                        type=NotificationType.error,
-                        user_id=task_data.source_article.user_id,
-                    ),
+            logger.info('Error message is: %s', error_message)
+            if error_message is None:
+                return
+            if task_data is None:
+                logger.error("Can't send notification: user unknown")
+                return
+            logger.info('Task %s failed', task_data.task_id)
+            async with get_session(ConcurrencyClass.background) as db_session:
+                await self.__fail_task(
+                    task_data=task_data,
+                    error_message=error_message,
                     db_session=db_session,
                 )
-                logger.info('Gracefully returning')
+            logger.info('Gracefully returning')
@@ -1,23 +1,100 @@
+import asyncio
 import json
-from pika import BlockingConnection, ConnectionParameters, credentials
 import logging
+import uuid
+
+from aio_pika import Message, connect_robust
+from aio_pika.abc import AbstractChannel, AbstractRobustConnection
+from aio_pika.pool import Pool
+
 from src.settings import rabbitmq_config
 
 logger = logging.getLogger('app')
 
 
-def publish_message(routing_key: str, message: dict):
-    connection = BlockingConnection(
-        ConnectionParameters(
-            rabbitmq_config.host,
-            credentials=credentials.PlainCredentials(
-                rabbitmq_config.login,
-                rabbitmq_config.password,
+class RabbitMQPublisher:
+    """Long-lived publisher shared by the whole process.
+
+    Keeps one robust (auto-reconnecting) connection and a pool of channels
+    with publisher confirms enabled, so publishing does not pay an AMQP
+    handshake per message and returns only after the broker has accepted
+    the message.
+    """
+
+    def __init__(self):
+        self._connection: AbstractRobustConnection | None = None
+        self._channel_pool: Pool[AbstractChannel] | None = None
+        self._declared_queues: set[str] = set()
+        self._lock = asyncio.Lock()
+
+    async def _get_channel(self) -> AbstractChannel:
+        return await self._connection.channel(publisher_confirms=True)
+
+    async def _get_channel_pool(self) -> Pool[AbstractChannel]:
+        async with self._lock:
+            if self._channel_pool is None:
+                self._connection = await connect_robust(
+                    host=rabbitmq_config.host,
+                    login=rabbitmq_config.login,
+                    password=rabbitmq_config.password,
+                )
+                self._channel_pool = Pool(
+                    self._get_channel,
+                    max_size=rabbitmq_config.publisher_channel_pool_size,
+                )
+        return self._channel_pool
+
+    async def _publish(
+        self, channel: AbstractChannel, routing_key: str, message: dict
+    ) -> None:
+        await channel.default_exchange.publish(
+            # Deliveries of the message are counted by its id, see
+            # `AbstractAsyncConsumer`
+            Message(
+                body=json.dumps(message).encode(), message_id=str(uuid.uuid4())
             ),
+            routing_key=routing_key,
+        )
+
+    async def publish_many(self, routing_key: str, messages: list[dict]):
+        """Publishes messages to the queue and waits for broker confirms.
+
+        Messages are sent over one channel without waiting for each
+        confirmation in turn.
+        """
+        if not messages:
+            return
+        channel_pool = await self._get_channel_pool()
+        async with channel_pool.acquire() as channel:
+            if routing_key not in self._declared_queues:
+                await channel.declare_queue(routing_key)
+                self._declared_queues.add(routing_key)
+            await asyncio.gather(
+                *(
+                    self._publish(channel, routing_key, message)
+                    for message in messages
+                )
+            )
+        logger.info(
+            '%s messages were sent to queue %s', len(messages), routing_key
         )
-    )
-    channel = connection.channel()
-    channel.queue_declare(routing_key)
-    channel.basic_publish('', routing_key, json.dumps(message))
-    logger.info('Message %s was sent to queue %s', message, routing_key)
-    connection.close()
+
+    async def publish(self, routing_key: str, message: dict):
+        await self.publish_many(routing_key, [message])
+
+    async def close(self):
+        async with self._lock:
+            if self._channel_pool is not None:
+                await self._channel_pool.close()
+            if self._connection is not None:
+                await self._connection.close()
+            self._channel_pool = None
+            self._connection = None
+            self._declared_queues.clear()
+
+
+publisher = RabbitMQPublisher()
+
+
+async def publish_message(routing_key: str, message: dict):
+    await publisher.publish(routing_key, message)
@@ -0,0 +1,67 @@
+import logging
+import time
+import uuid
+
+from src.database import ConcurrencyClass, get_session
+from src.database.repos.translation_checkpoint import CheckpointRepo
+from src.settings import text_translation_config
+
+logger = logging.getLogger('app')
+
+
+class TranslationCheckpoint:
+    """Progress of a translation task saved chunk by chunk.
+
+    Translated chunks are buffered and written to the database at most once
+    per `checkpoint_interval_sec` and on `flush`. When the task is run
+    again, chunks found in the checkpoint are not sent to the model.
+    Failing to save a checkpoint never fails the translation.
+    """
+
+    def __init__(self, task_id: uuid.UUID):
+        self.task_id = task_id
+        self.saved: dict[str, tuple[str, int]] = {}
+        self.pending: dict[str, tuple[str, int]] = {}
+        self.last_flushed_at = time.monotonic()
+
+    async def load(self) -> None:
+        async with get_session(ConcurrencyClass.background) as db_session:
+            self.saved = await CheckpointRepo.get_for_task(
+                task_id=self.task_id, db_session=db_session
+            )
+        if self.saved:
+            logger.info(
+                'Task %s resumes with %s translated chunks',
+                self.task_id,
+                len(self.saved),
+            )
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[str, int]]:
+        return {key: self.saved[key] for key in keys if key in self.saved}
+
+    async def add(self, key: str, translation: str, tokens: int) -> None:
+        self.pending[key] = (translation, tokens)
+        if (
+            time.monotonic() - self.last_flushed_at
+            >= text_translation_config.checkpoint_interval_sec
+        ):
+            await self.flush()
+
+    async def flush(self) -> None:
+        self.last_flushed_at = time.monotonic()
+        if not self.pending:
+            return
+        entries, self.pending = self.pending, {}
+        try:
+            async with get_session(ConcurrencyClass.background) as db_session:
+                await CheckpointRepo.save_many(
+                    task_id=self.task_id,
+                    entries=entries,
+                    db_session=db_session,
+                )
+            self.saved.update(entries)
+        except Exception as e:
+            logger.warning(
+                'Could not save checkpoint of task %s: %s', self.task_id, e
+            )
+            self.pending = entries | self.pending
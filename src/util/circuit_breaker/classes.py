@@ -0,0 +1,169 @@
+import enum
+import logging
+import time
+
+from src.settings import circuit_breaker_config
+from src.util.storage.classes import RedisHandler
+
+logger = logging.getLogger('app')
+
+
+class CircuitState(enum.StrEnum):
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half_open'
+
+
+class CircuitBreaker:
+    """Health of model/provider pairs shared by all processes via Redis.
+
+    A circuit opens after `failure_threshold` failures within
+    `failure_window_sec` and requests are not sent to the pair for
+    `open_sec`. After that a single probe request is let through: success
+    closes the circuit, failure opens it again. If Redis is unavailable,
+    every pair is considered healthy.
+    """
+
+    def __init__(self):
+        self._redis_handler: RedisHandler | None = None
+
+    @property
+    def redis(self):
+        if self._redis_handler is None:
+            self._redis_handler = RedisHandler()
+        return self._redis_handler.client
+
+    @staticmethod
+    def _state_key(model_key: str) -> str:
+        return circuit_breaker_config.redis_state_key_template.format(
+            model_key
+        )
+
+    async def is_available(self, model_key: str) -> bool:
+        try:
+            state, opened_at = await self.redis.hmget(
+                self._state_key(model_key), 'state', 'opened_at'
+            )
+            if state is None or state.decode() == CircuitState.closed:
+                return True
+            if (
+                time.time() - float(opened_at)
+                < circuit_breaker_config.open_sec
+            ):
+                return False
+            # Only one process gets to send the probe request
+            is_probe = await self.redis.set(
+                circuit_breaker_config.redis_probe_key_template.format(
+                    model_key
+                ),
+                1,
+                nx=True,
+                ex=circuit_breaker_config.open_sec,
+            )
+            if is_probe:
+                await self.redis.hset(
+                    self._state_key(model_key),
+                    'state',
+                    CircuitState.half_open,
+                )
+            return bool(is_probe)
+        except Exception as e:
+            logger.warning('Circuit breaker is unavailable: %s', e)
+            return True
+
+    async def record_success(self, model_key: str) -> None:
+        try:
+            state = await self.redis.hget(self._state_key(model_key), 'state')
+            if state is None or state.decode() == CircuitState.closed:
+                return
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(
+                    self._state_key(model_key), 'state', CircuitState.closed
+                )
+                pipe.delete(
+                    circuit_breaker_config.redis_failures_key_template.format(
+                        model_key
+                    ),
+                    circuit_breaker_config.redis_probe_key_template.format(
+                        model_key
+                    ),
+                )
+                await pipe.execute()
+            logger.info('Circuit of %s is closed', model_key)
+        except Exception as e:
+            logger.warning('Circuit breaker is unavailable: %s', e)
+
+    async def record_failure(self, model_key: str, error: str) -> None:
+        failures_key = (
+            circuit_breaker_config.redis_failures_key_template.format(
+                model_key
+            )
+        )
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(failures_key)
+                pipe.expire(
+                    failures_key,
+                    circuit_breaker_config.failure_window_sec,
+                    nx=True,
+                )
+                pipe.hget(self._state_key(model_key), 'state')
+                failures, _, state = await pipe.execute()
+            is_probe_failed = (
+                state is not None and state.decode() == CircuitState.half_open
+            )
+            if (
+                failures < circuit_breaker_config.failure_threshold
+                and not is_probe_failed
+            ):
+                return
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(
+                    self._state_key(model_key),
+                    mapping={
+                        'state': CircuitState.open,
+                        'opened_at': time.time(),
+                        'last_error': error,
+                    },
+                )
+                pipe.hincrby(self._state_key(model_key), 'trips', 1)
+                pipe.delete(
+                    failures_key,
+                    circuit_breaker_config.redis_probe_key_template.format(
+                        model_key
+                    ),
+                )
+                await pipe.execute()
+            logger.warning('Circuit of %s is opened: %s', model_key, error)
+        except Exception as e:
+            logger.warning('Circuit breaker is unavailable: %s', e)
+
+    async def get_stats(self) -> dict:
+        """Returns state, trips count and last error of every pair whose
+        circuit has ever been opened."""
+        prefix = circuit_breaker_config.redis_state_key_template.format('')
+        stats = {}
+        async for key in self.redis.scan_iter(match=f'{prefix}*'):
+            model_key = key.decode().removeprefix(prefix)
+            state = {
+                field.decode(): value.decode()
+                for field, value in (await self.redis.hgetall(key)).items()
+            }
+            failures = await self.redis.get(
+                circuit_breaker_config.redis_failures_key_template.format(
+                    model_key
+                )
+            )
+            stats[model_key] = {
+                'state': state.get('state', CircuitState.closed),
+                'trips': int(state.get('trips', 0)),
+                'recent_failures': int(failures or 0),
+                'opened_at': float(state['opened_at'])
+                if 'opened_at' in state
+                else None,
+                'last_error': state.get('last_error'),
+            }
+        return stats
+
+
+circuit_breaker = CircuitBreaker()
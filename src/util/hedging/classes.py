@@ -0,0 +1,82 @@
+import logging
+import math
+import time
+from collections import defaultdict, deque
+
+from src.settings import hedging_config
+from src.util.storage.classes import RedisHandler
+
+logger = logging.getLogger('app')
+
+
+class LatencyTracker:
+    """Recent request latencies of every model/provider pair.
+
+    Keeps the last `window_size` successful calls per pair in memory of
+    the process, so percentiles follow the current state of providers.
+    """
+
+    def __init__(self):
+        self._latencies: defaultdict[str, deque[float]] = defaultdict(
+            lambda: deque(maxlen=hedging_config.window_size)
+        )
+        self.hedges_sent: defaultdict[str, int] = defaultdict(int)
+        self.hedges_won: defaultdict[str, int] = defaultdict(int)
+
+    def record(self, model_key: str, latency_sec: float) -> None:
+        self._latencies[model_key].append(latency_sec)
+
+    def get_percentile(
+        self, model_key: str, percentile: float
+    ) -> float | None:
+        """Returns None until `min_samples` calls are recorded."""
+        latencies = self._latencies.get(model_key)
+        if not latencies or len(latencies) < hedging_config.min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+    def get_stats(self) -> dict:
+        return {
+            model_key: {
+                'samples': len(latencies),
+                'p50_sec': self.get_percentile(model_key, 0.5),
+                'p90_sec': self.get_percentile(model_key, 0.9),
+                'p99_sec': self.get_percentile(model_key, 0.99),
+                'hedges_sent': self.hedges_sent[model_key],
+                'hedges_won': self.hedges_won[model_key],
+            }
+            for model_key, latencies in self._latencies.items()
+        }
+
+
+class HedgeBudget:
+    """Limits estimated tokens spent on duplicate requests per minute,
+    shared by all processes via Redis."""
+
+    def __init__(self):
+        self._redis_handler: RedisHandler | None = None
+
+    @property
+    def redis(self):
+        if self._redis_handler is None:
+            self._redis_handler = RedisHandler()
+        return self._redis_handler.client
+
+    async def reserve(self, tokens: int) -> bool:
+        key = hedging_config.redis_budget_key_template.format(
+            math.floor(time.time() / 60)
+        )
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incrby(key, tokens)
+                pipe.expire(key, 120)
+                spent, _ = await pipe.execute()
+        except Exception as e:
+            logger.warning('Hedging budget is unavailable: %s', e)
+            return False
+        return spent <= hedging_config.token_budget_per_minute
+
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
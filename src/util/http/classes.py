@@ -0,0 +1,154 @@
+import logging
+
+import httpx
+
+from src.settings import http_client_config
+
+logger = logging.getLogger('app')
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that calls `release` once it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for part in self._stream:
+            yield part
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    """Counts requests in flight, from sending until the response is
+    closed, without relying on internals of the connection pool."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+        self.in_flight = 0
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    async def handle_async_request(
+        self, request: httpx.Request
+    ) -> httpx.Response:
+        self.in_flight += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+        response.stream = _ReleasingStream(response.stream, self._release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class SharedHTTPClient:
+    """Process-wide pooled HTTP client.
+
+    The client is created lazily on first use and closed on application or
+    consumer shutdown, so every outgoing request to the LLM backend reuses
+    keep-alive connections instead of paying a new TCP/TLS handshake.
+    Enabling HTTP/2 requires the `h2` package to be installed.
+    """
+
+    _client: httpx.AsyncClient | None = None
+    _transport: CountingTransport | None = None
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None or cls._client.is_closed:
+            logger.info(
+                'Opening shared HTTP client (max connections: %s, '
+                'keepalive: %s, http2: %s)',
+                http_client_config.max_connections,
+                http_client_config.max_keepalive_connections,
+                http_client_config.http2,
+            )
+            cls._transport = CountingTransport(
+                httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=http_client_config.max_connections,
+                        max_keepalive_connections=(
+                            http_client_config.max_keepalive_connections
+                        ),
+                        keepalive_expiry=(
+                            http_client_config.keepalive_expiry_sec
+                        ),
+                    ),
+                    http2=http_client_config.http2,
+                )
+            )
+            cls._client = httpx.AsyncClient(
+                timeout=http_client_config.timeout_sec,
+                transport=cls._transport,
+            )
+        return cls._client
+
+    @classmethod
+    async def close(cls) -> None:
+        if cls._client is not None and not cls._client.is_closed:
+            logger.info('Closing shared HTTP client')
+            await cls._client.aclose()
+        cls._client = None
+
+    @classmethod
+    def _count_connections(cls) -> tuple[int, int] | None:
+        """Returns connections of the httpcore pool and idle ones among
+        them, or None if internals of httpx have changed."""
+        pool = getattr(cls._transport._transport, '_pool', None)
+        try:
+            connections = list(pool.connections)
+            return len(connections), sum(c.is_idle() for c in connections)
+        except (AttributeError, TypeError):
+            return None
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """Returns connection pool utilisation of the shared client.
+
+        Requests in flight are counted by the client itself. Connections
+        are read from the pool when httpx exposes it, else they are None.
+        """
+        stats = {
+            'is_open': cls._client is not None and not cls._client.is_closed,
+            'max_connections': http_client_config.max_connections,
+            'max_keepalive_connections': (
+                http_client_config.max_keepalive_connections
+            ),
+            'http2': http_client_config.http2,
+            'in_flight_requests': 0,
+            'pending_requests': 0,
+            'connections': None,
+            'idle_connections': None,
+            'utilisation': 0.0,
+        }
+        if not stats['is_open']:
+            return stats
+        in_flight = cls._transport.in_flight
+        stats['in_flight_requests'] = in_flight
+        if not http_client_config.http2:
+            # Requests over the limit wait for a free connection
+            stats['pending_requests'] = max(
+                0, in_flight - http_client_config.max_connections
+            )
+        stats['utilisation'] = round(
+            min(in_flight, http_client_config.max_connections)
+            / http_client_config.max_connections,
+            3,
+        )
+        counts = cls._count_connections()
+        if counts is not None:
+            stats['connections'], stats['idle_connections'] = counts
+        return stats
@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import logging
+import time
+import uuid
+from collections import defaultdict
+
+from src.routers.notifications.schemes import TranslationProgressScheme
+from src.settings import notification_config
+from src.util.storage.classes import RedisHandler
+
+logger = logging.getLogger('app')
+
+
+@functools.cache
+def _get_redis_handler() -> RedisHandler:
+    return RedisHandler()
+
+
+class ProgressReporter:
+    """Publishes throttled translation progress to user's channel.
+
+    Events go through the same Redis channel as notifications but are not
+    saved to the database. At most one event per
+    `progress_min_interval_sec` is sent; the final one is always sent.
+    Reporters of all tasks share one Redis connection pool.
+    """
+
+    def __init__(self, user_id: uuid.UUID, task_id: uuid.UUID):
+        self.user_id = user_id
+        self.task_id = task_id
+        self.redis_client = _get_redis_handler().client
+        self.started_at = time.monotonic()
+        self.last_sent_at: float | None = None
+
+    async def report(self, chunks_done: int, chunks_total: int) -> None:
+        now = time.monotonic()
+        if (
+            chunks_done < chunks_total
+            and self.last_sent_at is not None
+            and now - self.last_sent_at
+            < notification_config.progress_min_interval_sec
+        ):
+            return
+        self.last_sent_at = now
+
+        eta_sec = None
+        if 0 < chunks_done < chunks_total:
+            elapsed = now - self.started_at
+            eta_sec = round(
+                elapsed / chunks_done * (chunks_total - chunks_done)
+            )
+        progress = TranslationProgressScheme(
+            task_id=self.task_id,
+            chunks_done=chunks_done,
+            chunks_total=chunks_total,
+            eta_sec=eta_sec,
+        )
+        try:
+            await self.redis_client.publish(
+                notification_config.topic_name.format(self.user_id),
+                message=progress.model_dump_json(),
+            )
+        except Exception as e:
+            logger.warning('Could not publish translation progress: %s', e)
+
+
+class NotificationHub:
+    """Fans out user notifications from Redis to connected sockets.
+
+    Every API worker keeps a single pattern subscription to the
+    notification channels and pushes received messages into in-memory
+    queues of the sockets of the addressed user. A socket queue holds at
+    most `socket_queue_size` messages; when a socket falls behind, the
+    oldest messages are dropped.
+    """
+
+    def __init__(self):
+        self._queues: defaultdict[str, set[asyncio.Queue[str]]] = (
+            defaultdict(set)
+        )
+        self._listener: asyncio.Task | None = None
+        self._channel_prefix, self._channel_suffix = (
+            notification_config.topic_name.split('{}')
+        )
+
+    def subscribe(self, user_id: uuid.UUID) -> asyncio.Queue[str]:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        queue = asyncio.Queue(maxsize=notification_config.socket_queue_size)
+        self._queues[str(user_id)].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: uuid.UUID, queue: asyncio.Queue[str]):
+        user_queues = self._queues.get(str(user_id))
+        if user_queues is None:
+            return
+        user_queues.discard(queue)
+        if not user_queues:
+            del self._queues[str(user_id)]
+
+    async def _listen(self):
+        # One pool for all reconnects, so a flapping Redis does not leave a
+        # pool behind every attempt
+        redis_handler = RedisHandler()
+        try:
+            while True:
+                pubsub = redis_handler.get_pubsub()
+                try:
+                    await pubsub.psubscribe(
+                        notification_config.topic_name.format('*')
+                    )
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        self._fan_out(
+                            message['channel'].decode('utf-8'),
+                            message['data'].decode('utf-8'),
+                        )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception(e)
+                    await asyncio.sleep(1)
+                finally:
+                    await pubsub.aclose()
+        finally:
+            await redis_handler.client.aclose()
+
+    def _fan_out(self, channel: str, data: str):
+        user_id = channel[
+            len(self._channel_prefix) : len(channel)
+            - len(self._channel_suffix)
+        ]
+        for queue in self._queues.get(user_id, ()):
+            if queue.full():
+                queue.get_nowait()
+                logger.warning('Socket of user %s is lagging behind', user_id)
+            queue.put_nowait(data)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+
+notification_hub = NotificationHub()
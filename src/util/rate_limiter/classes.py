@@ -0,0 +1,141 @@
+import asyncio
+import logging
+
+from src.settings import rate_limiter_config
+from src.util.storage.classes import RedisHandler
+
+logger = logging.getLogger('app')
+
+# Two token buckets (requests and LLM tokens per minute) in one hash,
+# refilled continuously by Redis server time.
+# KEYS[1] - bucket hash
+# ARGV - requests capacity, tokens capacity, requests to take, tokens to
+# take, whether to take them even if buckets are short (1/0)
+# Returns 0 when taken, or milliseconds to wait before the next attempt
+TOKEN_BUCKET_SCRIPT = '''
+local requests_capacity = tonumber(ARGV[1])
+local tokens_capacity = tonumber(ARGV[2])
+local requests_needed = tonumber(ARGV[3])
+local tokens_needed = math.min(tonumber(ARGV[4]), tokens_capacity)
+local force = ARGV[5] == '1'
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'updated_at')
+local requests = tonumber(state[1]) or requests_capacity
+local tokens = tonumber(state[2]) or tokens_capacity
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+requests = math.min(
+    requests_capacity, requests + elapsed * requests_capacity / 60000
+)
+tokens = math.min(tokens_capacity, tokens + elapsed * tokens_capacity / 60000)
+
+local wait = 0
+if not force then
+    if requests < requests_needed then
+        wait = math.max(
+            wait, (requests_needed - requests) * 60000 / requests_capacity
+        )
+    end
+    if tokens < tokens_needed then
+        wait = math.max(
+            wait, (tokens_needed - tokens) * 60000 / tokens_capacity
+        )
+    end
+end
+if wait == 0 then
+    requests = requests - requests_needed
+    tokens = math.min(tokens_capacity, tokens - tokens_needed)
+end
+redis.call(
+    'HSET', KEYS[1],
+    'requests', tostring(requests),
+    'tokens', tostring(tokens),
+    'updated_at', now
+)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return math.ceil(wait)
+'''
+
+
+class ProviderRateLimiter:
+    """Cluster-wide requests/min and tokens/min limits per LLM provider.
+
+    Buckets live in Redis and are updated atomically by a Lua script, so
+    all API workers and consumers together stay within provider limits.
+    If Redis is unavailable, requests are not limited.
+    """
+
+    def __init__(self):
+        self._redis_handler: RedisHandler | None = None
+        self._script = None
+
+    @property
+    def script(self):
+        if self._script is None:
+            self._redis_handler = RedisHandler()
+            self._script = self._redis_handler.client.register_script(
+                TOKEN_BUCKET_SCRIPT
+            )
+        return self._script
+
+    @staticmethod
+    def get_limits(provider: str) -> tuple[int, int]:
+        return (
+            rate_limiter_config.provider_requests_per_minute.get(
+                provider, rate_limiter_config.default_requests_per_minute
+            ),
+            rate_limiter_config.provider_tokens_per_minute.get(
+                provider, rate_limiter_config.default_tokens_per_minute
+            ),
+        )
+
+    async def _take(
+        self, provider: str, requests: int, tokens: int, force: bool
+    ) -> float:
+        """Returns seconds to wait, 0 if taken."""
+        wait_ms = await self.script(
+            keys=[rate_limiter_config.redis_key_template.format(provider)],
+            args=[*self.get_limits(provider), requests, tokens, int(force)],
+        )
+        return wait_ms / 1000
+
+    async def acquire(self, provider: str, tokens: int) -> bool:
+        """Waits for one request and `tokens` LLM tokens of the provider.
+
+        Returns False if they are not available within `max_wait_sec`.
+        """
+        if not rate_limiter_config.is_enabled:
+            return True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + rate_limiter_config.max_wait_sec
+        while True:
+            try:
+                wait_sec = await self._take(provider, 1, tokens, force=False)
+            except Exception as e:
+                logger.warning('Rate limiter is unavailable: %s', e)
+                return True
+            if not wait_sec:
+                return True
+            if loop.time() + wait_sec > deadline:
+                logger.warning('Rate limit of %s is exhausted', provider)
+                return False
+            await asyncio.sleep(wait_sec)
+
+    async def record_usage(
+        self, provider: str, estimated_tokens: int, used_tokens: int
+    ) -> None:
+        """Corrects tokens bucket by the difference between reserved and
+        actually used tokens."""
+        if not rate_limiter_config.is_enabled:
+            return
+        try:
+            await self._take(
+                provider, 0, used_tokens - estimated_tokens, force=True
+            )
+        except Exception as e:
+            logger.warning('Rate limiter is unavailable: %s', e)
+
+
+rate_limiter = ProviderRateLimiter()
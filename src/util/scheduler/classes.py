@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+from src.settings import chunk_scheduler_config
+
+logger = logging.getLogger('app')
+
+
+@dataclass
+class ScheduledChunk:
+    job_id: Hashable
+    model_key: str
+    func: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    # Context of the submitting task, e.g. its statements counter, which
+    # the chunk runs in wherever it is started from
+    context: contextvars.Context = field(
+        default_factory=contextvars.copy_context
+    )
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+
+
+@dataclass
+class ChunkTimingStats:
+    chunks: int = 0
+    failed: int = 0
+    total_wait_sec: float = 0.0
+    max_wait_sec: float = 0.0
+    total_run_sec: float = 0.0
+    max_run_sec: float = 0.0
+
+    def add(self, wait_sec: float, run_sec: float, failed: bool) -> None:
+        self.chunks += 1
+        self.failed += int(failed)
+        self.total_wait_sec += wait_sec
+        self.max_wait_sec = max(self.max_wait_sec, wait_sec)
+        self.total_run_sec += run_sec
+        self.max_run_sec = max(self.max_run_sec, run_sec)
+
+    def as_dict(self) -> dict:
+        return {
+            'chunks': self.chunks,
+            'failed': self.failed,
+            'avg_wait_sec': round(self.total_wait_sec / self.chunks, 3)
+            if self.chunks
+            else 0.0,
+            'max_wait_sec': round(self.max_wait_sec, 3),
+            'avg_run_sec': round(self.total_run_sec / self.chunks, 3)
+            if self.chunks
+            else 0.0,
+            'max_run_sec': round(self.max_run_sec, 3),
+        }
+
+
+class ChunkScheduler:
+    """Bounded-concurrency scheduler for LLM chunk requests.
+
+    Every job (one translation task) gets its own FIFO queue and jobs are
+    served round-robin, so a huge article cannot starve small ones. A chunk
+    is started only while both the global limit and the limit of its
+    model/provider pair have free slots.
+    """
+
+    def __init__(self, global_limit: int, model_limit: int):
+        self.global_limit = global_limit
+        self.model_limit = model_limit
+        self._queues: OrderedDict[Hashable, deque[ScheduledChunk]] = (
+            OrderedDict()
+        )
+        self._running = 0
+        self._running_per_model: defaultdict[str, int] = defaultdict(int)
+        self._stats: defaultdict[str, ChunkTimingStats] = defaultdict(
+            ChunkTimingStats
+        )
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def get_model_key(model_name: str, provider: str) -> str:
+        return f'{model_name}:{provider}'
+
+    async def submit(
+        self,
+        job_id: Hashable,
+        model_key: str,
+        func: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Queues `func` and waits for its result.
+
+        Args:
+            job_id: Identifier of the job the chunk belongs to. Chunks of
+                one job are started in submission order.
+            model_key: Concurrency bucket, see `get_model_key`.
+            func: Coroutine factory performing the request.
+        """
+        item = ScheduledChunk(
+            job_id=job_id,
+            model_key=model_key,
+            func=func,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._queues.setdefault(job_id, deque()).append(item)
+        self._dispatch()
+        return await item.future
+
+    def _dispatch(self) -> None:
+        while self._running < self.global_limit and self._queues:
+            for job_id, queue in self._queues.items():
+                while queue and queue[0].future.done():
+                    queue.popleft()
+                if not queue:
+                    del self._queues[job_id]
+                    break
+                item = queue[0]
+                model_running = self._running_per_model[item.model_key]
+                if model_running >= self.model_limit:
+                    continue
+                queue.popleft()
+                if queue:
+                    self._queues.move_to_end(job_id)
+                else:
+                    del self._queues[job_id]
+                self._start(item)
+                break
+            else:
+                return
+
+    def _start(self, item: ScheduledChunk) -> None:
+        self._running += 1
+        self._running_per_model[item.model_key] += 1
+        item.started_at = time.monotonic()
+        task = asyncio.create_task(self._run(item), context=item.context)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        item.future.add_done_callback(
+            lambda f: task.cancel() if f.cancelled() else None
+        )
+
+    async def _run(self, item: ScheduledChunk) -> None:
+        failed = False
+        try:
+            result = await item.func()
+            if not item.future.done():
+                item.future.set_result(result)
+        except Exception as e:
+            failed = True
+            if not item.future.done():
+                item.future.set_exception(e)
+        finally:
+            finished_at = time.monotonic()
+            wait_sec = item.started_at - item.enqueued_at
+            run_sec = finished_at - item.started_at
+            self._stats[item.model_key].add(wait_sec, run_sec, failed)
+            logger.debug(
+                'Chunk of job %s on %s: queued %.3fs, ran %.3fs',
+                item.job_id,
+                item.model_key,
+                wait_sec,
+                run_sec,
+            )
+            self._running -= 1
+            self._running_per_model[item.model_key] -= 1
+            self._dispatch()
+
+    def get_stats(self) -> dict:
+        return {
+            'global_limit': self.global_limit,
+            'model_limit': self.model_limit,
+            'running': self._running,
+            'queued': sum(len(q) for q in self._queues.values()),
+            'queued_jobs': len(self._queues),
+            'models': {
+                key: {
+                    'running': self._running_per_model[key],
+                    **stats.as_dict(),
+                }
+                for key, stats in self._stats.items()
+            },
+        }
+
+
+chunk_scheduler = ChunkScheduler(
+    global_limit=chunk_scheduler_config.global_concurrency,
+    model_limit=chunk_scheduler_config.model_concurrency,
+)
@@ -0,0 +1,189 @@
+import json
+import logging
+import math
+import time
+from dataclasses import astuple, dataclass
+
+from src.settings import token_estimation_config
+from src.util.storage.classes import RedisHandler
+
+logger = logging.getLogger('app')
+
+RatioKey = tuple[int, int | None, int | None]
+# Cost of a task without deduplication, tokens of its source title and
+# text, and chunks they were split into
+CostSample = tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class TokenRatio:
+    # Cost per source token: the source itself and its translation
+    per_token: float
+    # Cost of every chunk request besides its text: prompt and markup
+    per_chunk: float
+    # Source tokens in a chunk, to predict how many chunks a text takes
+    chunk_tokens: float
+
+    def predict(self, source_tokens: int) -> int:
+        chunks = math.ceil(source_tokens / self.chunk_tokens)
+        return math.ceil(
+            source_tokens * self.per_token + chunks * self.per_chunk
+        )
+
+
+def _quantile(values: list[float], quantile: float) -> float:
+    values = sorted(values)
+    index = math.ceil(quantile * len(values))
+    return values[max(index - 1, 0)]
+
+
+class TokenRatioTable:
+    """Cost per source token and per chunk learned from completed
+    translation tasks.
+
+    Keys are (model id, source language id, target language id), a key with
+    both languages set to None holds the ratio of the whole model. The table
+    is kept in a Redis hash written by `calibrate_token_ratios` and is
+    loaded into memory at most once per `calibration_refresh_sec`.
+    """
+
+    def __init__(self):
+        self._redis_handler: RedisHandler | None = None
+        self.ratios: dict[RatioKey, TokenRatio] = {}
+        self.loaded_at: float | None = None
+
+    @property
+    def redis(self):
+        if self._redis_handler is None:
+            self._redis_handler = RedisHandler()
+        return self._redis_handler.client
+
+    @staticmethod
+    def dump_key(key: RatioKey) -> str:
+        return ':'.join('' if part is None else str(part) for part in key)
+
+    @staticmethod
+    def load_key(raw_key: str) -> RatioKey:
+        model_id, source_language_id, target_language_id = (
+            int(part) if part else None for part in raw_key.split(':')
+        )
+        return model_id, source_language_id, target_language_id
+
+    @staticmethod
+    def fit_one(samples: list[CostSample]) -> TokenRatio:
+        """Fits cost as `per_token * source tokens + per_chunk * chunks`.
+
+        `per_chunk` is the least squares fit, so short texts, where the
+        prompt of a chunk outweighs its text, do not inflate `per_token`.
+        `per_token` is then `calibration_quantile` of what is left of every
+        task's cost per its source token, and `chunk_tokens` the opposite
+        quantile of source tokens per chunk, so that both err on the side of
+        a higher estimate. Texts of a single chunk only tell that a chunk
+        holds at least as many tokens.
+        """
+        quantile = token_estimation_config.calibration_quantile
+        tokens_squared = sum(tokens**2 for _, tokens, _ in samples)
+        chunks_squared = sum(chunks**2 for _, _, chunks in samples)
+        tokens_chunks = sum(tokens * chunks for _, tokens, chunks in samples)
+        cost_tokens = sum(cost * tokens for cost, tokens, _ in samples)
+        cost_chunks = sum(cost * chunks for cost, _, chunks in samples)
+        determinant = tokens_squared * chunks_squared - tokens_chunks**2
+        per_chunk = 0.0
+        if determinant > 0:
+            per_chunk = max(
+                (tokens_squared * cost_chunks - tokens_chunks * cost_tokens)
+                / determinant,
+                0.0,
+            )
+        per_token = _quantile(
+            [
+                (cost - per_chunk * chunks) / tokens
+                for cost, tokens, chunks in samples
+            ],
+            quantile,
+        )
+        split_samples = [
+            tokens / chunks for _, tokens, chunks in samples if chunks > 1
+        ]
+        chunk_tokens = (
+            _quantile(split_samples, 1 - quantile)
+            if split_samples
+            else max(tokens for _, tokens, _ in samples)
+        )
+        return TokenRatio(
+            per_token=round(per_token, 4),
+            per_chunk=round(per_chunk, 1),
+            chunk_tokens=round(chunk_tokens, 1),
+        )
+
+    def fit(
+        self, samples: dict[RatioKey, list[CostSample]]
+    ) -> dict[RatioKey, TokenRatio]:
+        """Fits every key with at least `calibration_min_samples` samples,
+        see `fit_one`. Per-model ratios are fitted from all samples of the
+        model."""
+        by_model: dict[RatioKey, list[CostSample]] = {}
+        for (model_id, _, _), key_samples in samples.items():
+            by_model.setdefault((model_id, None, None), []).extend(
+                key_samples
+            )
+
+        return {
+            key: self.fit_one(key_samples)
+            for key, key_samples in {**samples, **by_model}.items()
+            if len(key_samples)
+            >= token_estimation_config.calibration_min_samples
+        }
+
+    async def save(self, ratios: dict[RatioKey, TokenRatio]) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(token_estimation_config.redis_ratios_key)
+            if ratios:
+                pipe.hset(
+                    token_estimation_config.redis_ratios_key,
+                    mapping={
+                        self.dump_key(key): json.dumps(astuple(ratio))
+                        for key, ratio in ratios.items()
+                    },
+                )
+            await pipe.execute()
+        self.ratios = ratios
+        self.loaded_at = time.monotonic()
+
+    async def _load(self) -> None:
+        try:
+            raw_ratios = await self.redis.hgetall(
+                token_estimation_config.redis_ratios_key
+            )
+            self.ratios = {
+                self.load_key(key.decode('utf-8')): TokenRatio(
+                    *json.loads(value)
+                )
+                for key, value in raw_ratios.items()
+            }
+        except Exception as e:
+            logger.warning('Could not load token ratios: %s', e)
+        # Also after a failure, so Redis is not queried on every estimate
+        self.loaded_at = time.monotonic()
+
+    async def get(
+        self,
+        model_id: int,
+        source_language_id: int | None,
+        target_language_id: int | None,
+    ) -> TokenRatio | None:
+        """Returns the ratio of the language pair, else of the model, or
+        None if the model has too few completed tasks."""
+        if (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at
+            > token_estimation_config.calibration_refresh_sec
+        ):
+            await self._load()
+        return self.ratios.get(
+            (model_id, source_language_id, target_language_id),
+            self.ratios.get((model_id, None, None)),
+        )
+
+
+token_ratio_table = TokenRatioTable()
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+
+from src.database import ConcurrencyClass, get_session
+from src.database.repos.translation_task import TaskRepo
+from src.settings import token_estimation_config
+from src.util.token_ratios.classes import (
+    CostSample,
+    RatioKey,
+    TokenRatio,
+    token_ratio_table,
+)
+
+logger = logging.getLogger('app')
+
+
+def get_ratio_samples(
+    tasks: list[tuple[int, int | None, int, int, int, int]],
+) -> dict[RatioKey, list[CostSample]]:
+    """Groups costs of `TaskRepo.get_cost_samples` tasks by model and
+    language pair."""
+    samples: dict[RatioKey, list[CostSample]] = {}
+    for (
+        model_id,
+        source_language_id,
+        target_language_id,
+        cost,
+        source_tokens,
+        chunks,
+    ) in tasks:
+        samples.setdefault(
+            (model_id, source_language_id, target_language_id), []
+        ).append((cost, source_tokens, chunks))
+    return samples
+
+
+async def calibrate_token_ratios() -> dict[RatioKey, TokenRatio]:
+    """Fits ratios from the latest completed tasks and saves them."""
+    async with get_session(ConcurrencyClass.background) as db_session:
+        tasks = await TaskRepo.get_cost_samples(
+            limit=token_estimation_config.calibration_max_tasks,
+            db_session=db_session,
+        )
+    ratios = token_ratio_table.fit(get_ratio_samples(tasks))
+    await token_ratio_table.save(ratios)
+    logger.info(
+        'Fitted %s token ratios from %s tasks', len(ratios), len(tasks)
+    )
+    return ratios
+
+
+async def run_periodic_calibration() -> None:
+    """Recalibrates token ratios every `calibration_interval_sec`.
+
+    Meant to run in every translator consumer: a Redis lock lets only one
+    of them calibrate per interval.
+    """
+    while True:
+        await asyncio.sleep(token_estimation_config.calibration_interval_sec)
+        try:
+            is_locked = await token_ratio_table.redis.set(
+                token_estimation_config.redis_calibration_lock_key,
+                1,
+                nx=True,
+                ex=token_estimation_config.calibration_interval_sec,
+            )
+            if is_locked:
+                await calibrate_token_ratios()
+        except Exception as e:
+            logger.exception('Token ratios calibration failed: %s', e)
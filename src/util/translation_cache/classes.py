@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+
+from src.database import ConcurrencyClass, get_session
+from src.database.models import AIModel, Language, StylePrompt
+from src.database.repos.translation_cache import TranslationCacheRepo
+from src.settings import translation_cache_config
+from src.util.scheduler.classes import ChunkScheduler
+from src.util.storage.classes import RedisHandler
+
+logger = logging.getLogger('app')
+
+
+class TranslationCache:
+    """Chunk-level translation memory.
+
+    Translations are stored in Redis under a content-addressed key with a
+    TTL, which is renewed on every hit; the Redis part is additionally
+    capped at `max_entries` least recently used keys. Postgres keeps a
+    longer-living copy that is queried on Redis misses and pruned by the
+    `prune_translation_cache` command.
+
+    Database sessions are opened in the concurrency class given by the
+    caller: requests that already hold an interactive session must not wait
+    for another interactive permit.
+    """
+
+    def __init__(self):
+        self._redis_handler: RedisHandler | None = None
+
+    @property
+    def redis(self):
+        if self._redis_handler is None:
+            self._redis_handler = RedisHandler()
+        return self._redis_handler.client
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+    @classmethod
+    def get_key(
+        cls,
+        chunk: str,
+        model: AIModel,
+        prompt_object: StylePrompt,
+        target_language: Language,
+    ) -> str:
+        raw_key = '\x1f'.join(
+            (
+                cls.normalize(chunk),
+                model.name,
+                model.provider,
+                prompt_object.text,
+                target_language.iso_code,
+            )
+        )
+        return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+    async def get_many(
+        self,
+        keys: list[str],
+        model: AIModel,
+        concurrency_class: ConcurrencyClass = (
+            ConcurrencyClass.translation_cache
+        ),
+    ) -> dict[str, str]:
+        """Returns cached translations for the found keys."""
+        if not keys:
+            return {}
+        found = {}
+        try:
+            values = await self.redis.mget(
+                [
+                    translation_cache_config.redis_key_template.format(key)
+                    for key in keys
+                ]
+            )
+            found = {
+                key: value.decode('utf-8')
+                for key, value in zip(keys, values)
+                if value is not None
+            }
+        except Exception as e:
+            logger.warning('Translation cache is unavailable in Redis: %s', e)
+
+        await self._touch(list(found))
+        missing = [key for key in keys if key not in found]
+        if missing:
+            try:
+                async with get_session(concurrency_class) as db_session:
+                    from_db = await TranslationCacheRepo.get_many(
+                        keys=missing, db_session=db_session
+                    )
+                found.update(from_db)
+                await self._set_in_redis(from_db)
+            except Exception as e:
+                logger.warning(
+                    'Translation cache is unavailable in database: %s', e
+                )
+
+        await self._record_stats(
+            model, hits=len(found), misses=len(keys) - len(found)
+        )
+        return found
+
+    async def set_many(
+        self,
+        entries: dict[str, str],
+        model: AIModel,
+        concurrency_class: ConcurrencyClass = (
+            ConcurrencyClass.translation_cache
+        ),
+    ) -> None:
+        entries = {
+            key: value
+            for key, value in entries.items()
+            if len(value) <= translation_cache_config.max_chunk_length
+        }
+        if not entries:
+            return
+        await self._set_in_redis(entries)
+        try:
+            async with get_session(concurrency_class) as db_session:
+                await TranslationCacheRepo.save_many(
+                    entries=entries,
+                    model_name=model.name,
+                    provider=model.provider,
+                    db_session=db_session,
+                )
+        except Exception as e:
+            logger.warning('Could not save translations to database: %s', e)
+
+    async def _set_in_redis(self, entries: dict[str, str]) -> None:
+        if not entries:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in entries.items():
+                    pipe.set(
+                        translation_cache_config.redis_key_template.format(
+                            key
+                        ),
+                        value,
+                        ex=translation_cache_config.ttl_sec,
+                    )
+                pipe.zadd(
+                    translation_cache_config.redis_index_key,
+                    {key: time.time() for key in entries},
+                )
+                await pipe.execute()
+            await self._evict()
+        except Exception as e:
+            logger.warning('Could not save translations to Redis: %s', e)
+
+    async def _touch(self, keys: list[str]) -> None:
+        if not keys:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zadd(
+                    translation_cache_config.redis_index_key,
+                    {key: time.time() for key in keys},
+                )
+                # Keeps the TTL of a key in line with its score in the index
+                for key in keys:
+                    pipe.expire(
+                        translation_cache_config.redis_key_template.format(
+                            key
+                        ),
+                        translation_cache_config.ttl_sec,
+                    )
+                await pipe.execute()
+        except Exception as e:
+            logger.warning('Could not update translation cache index: %s', e)
+
+    async def _evict(self) -> None:
+        """Drops index entries of expired keys and least recently used keys
+        above `max_entries`."""
+        await self.redis.zremrangebyscore(
+            translation_cache_config.redis_index_key,
+            '-inf',
+            time.time() - translation_cache_config.ttl_sec,
+        )
+        size = await self.redis.zcard(translation_cache_config.redis_index_key)
+        excess = size - translation_cache_config.max_entries
+        if excess <= 0:
+            return
+        evicted = await self.redis.zpopmin(
+            translation_cache_config.redis_index_key, excess
+        )
+        await self.redis.delete(
+            *(
+                translation_cache_config.redis_key_template.format(
+                    key.decode('utf-8')
+                )
+                for key, _ in evicted
+            )
+        )
+        logger.info('Evicted %s entries from translation cache', excess)
+
+    async def _record_stats(
+        self, model: AIModel, hits: int, misses: int
+    ) -> None:
+        model_key = ChunkScheduler.get_model_key(model.name, model.provider)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                if hits:
+                    pipe.hincrby(
+                        translation_cache_config.redis_stats_key,
+                        f'{model_key}:hits',
+                        hits,
+                    )
+                if misses:
+                    pipe.hincrby(
+                        translation_cache_config.redis_stats_key,
+                        f'{model_key}:misses',
+                        misses,
+                    )
+                await pipe.execute()
+        except Exception as e:
+            logger.warning('Could not record translation cache stats: %s', e)
+
+    async def get_stats(self) -> dict:
+        """Returns hit ratio per model and the number of keys in Redis."""
+        raw_stats = await self.redis.hgetall(
+            translation_cache_config.redis_stats_key
+        )
+        models = {}
+        for field, value in raw_stats.items():
+            model_key, counter = field.decode('utf-8').rsplit(':', 1)
+            models.setdefault(model_key, {'hits': 0, 'misses': 0})
+            models[model_key][counter] = int(value)
+        for counters in models.values():
+            total = counters['hits'] + counters['misses']
+            counters['hit_ratio'] = (
+                round(counters['hits'] / total, 3) if total else 0.0
+            )
+        return {
+            'redis_entries': await self.redis.zcard(
+                translation_cache_config.redis_index_key
+            ),
+            'models': models,
+        }
+
+
+translation_cache = TranslationCache()
@@ -1,16 +1,65 @@
 import asyncio
 import re
+import time
+import uuid
 from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
 from logging import Logger
+from typing import AsyncGenerator, Awaitable, Callable, Hashable
 
+from src.database import ConcurrencyClass
 from src.database.models import Language, AIModel, StylePrompt
-from src.settings import text_translation_config
+from src.settings import (
+    hedging_config,
+    text_translation_config,
+    translation_cache_config,
+)
+from src.util.checkpoints.classes import TranslationCheckpoint
+from src.util.circuit_breaker.classes import circuit_breaker
+from src.util.hedging.classes import hedge_budget, latency_tracker
+from src.util.scheduler.classes import ChunkScheduler, chunk_scheduler
+from src.util.translation_cache.classes import (
+    TranslationCache,
+    translation_cache,
+)
 from src.util.translator.exceptions import (
     TranslatorError,
     TranslatorAPITimeoutError,
     TranslatorAPIError,
+    TranslatorRateLimitError,
     TranslatorTextTooLongError,
 )
+from src.util.translator.segmentation import (
+    PLACEHOLDER_INSTRUCTION,
+    TranslationChunk,
+    fill_placeholders,
+    get_lost_placeholders,
+    has_translatable_text,
+    renumber_placeholders,
+    restore_placeholders,
+    split_markdown,
+    split_paragraphs,
+)
+from src.util.translator.helpers import (
+    count_tokens,
+    estimate_request_tokens,
+    get_encoding,
+    split_text_by_tokens,
+)
+
+
+@dataclass
+class DeduplicationStats:
+    """Chunks of a job and how many of them were actually translated, see
+    `AbstractTranslator._process_translation`."""
+
+    chunks: int = 0
+    unique_chunks: int = 0
+    # Unique chunks taken from the translation cache, their tokens are not
+    # known
+    cached_chunks: int = 0
+    saved_tokens: int = 0
 
 
 class AbstractTranslator(ABC):
@@ -23,6 +72,12 @@ class AbstractTranslator(ABC):
         target_language: Language,
         model: AIModel,
         prompt_object: StylePrompt,
+        job_id: Hashable | None = None,
+        fallback_models: list[AIModel] | None = None,
+        hedge: bool = False,
+        cache_concurrency_class: ConcurrencyClass = (
+            ConcurrencyClass.translation_cache
+        ),
     ) -> tuple[str, int]:
         """Asynchronously executes the translation process.
 
@@ -45,15 +100,73 @@ class AbstractTranslator(ABC):
                 too long.
             TranslatorError: General error related to the translation process.
         """
+        (result,) = await self.translate_many(
+            texts=[text],
+            source_language=source_language,
+            target_language=target_language,
+            model=model,
+            prompt_object=prompt_object,
+            job_id=job_id,
+            fallback_models=fallback_models,
+            hedge=hedge,
+            cache_concurrency_class=cache_concurrency_class,
+        )
+        return result
+
+    async def translate_many(
+        self,
+        texts: list[str],
+        source_language: Language | None,
+        target_language: Language,
+        model: AIModel,
+        prompt_object: StylePrompt,
+        job_id: Hashable | None = None,
+        on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+        checkpoint: TranslationCheckpoint | None = None,
+        fallback_models: list[AIModel] | None = None,
+        hedge: bool = False,
+        deduplication_stats: DeduplicationStats | None = None,
+        cache_concurrency_class: ConcurrencyClass = (
+            ConcurrencyClass.translation_cache
+        ),
+    ) -> list[tuple[str, int]]:
+        """Translates several texts (e.g. article title and body) at once.
+
+        Chunks of all texts are scheduled together under one job, so the
+        texts are translated concurrently rather than one after another.
+        `on_progress` is awaited with (chunks done, chunks total) every time
+        a chunk is finished. Translated chunks are saved to `checkpoint`,
+        and chunks already present in it are not translated again. Chunks
+        are sent to `fallback_models` when the provider of `model` fails,
+        see `_process_chunk_with_failover`. With `hedge`, slow requests are
+        duplicated, see `_process_chunk_hedged`. Repeated paragraphs are
+        translated once, `deduplication_stats` is filled with the savings.
+        Database sessions of the translation cache are opened in
+        `cache_concurrency_class`, see `TranslationCache`.
+
+        Returns:
+            list[tuple[str, int]]: Translated text and amount of tokens used
+                for every text, in the order of `texts`
+
+        Raises:
+            The same exceptions as `translate`.
+        """
         try:
-            self.logger.info(f'Начинается перевод текста: {text}')
+            self.logger.info(f'Начинается перевод текста: {texts}')
 
             result = await self._process_translation(
-                text=text,
+                texts=texts,
                 source_language=source_language,
                 target_language=target_language,
                 model=model,
                 prompt_object=prompt_object,
+                job_id=job_id if job_id is not None else uuid.uuid4(),
+                on_progress=on_progress,
+                checkpoint=checkpoint,
+                fallback_models=fallback_models,
+                hedge=hedge,
+                deduplication_stats=deduplication_stats,
+                cache_concurrency_class=cache_concurrency_class,
             )
 
             self.logger.info(f'End of text translation: {result}')
@@ -72,74 +185,481 @@ class AbstractTranslator(ABC):
 
     async def _process_translation(
         self,
-        text: str,
+        texts: list[str],
         source_language: Language | None,
         target_language: Language,
         model: AIModel,
         prompt_object: StylePrompt,
-    ) -> tuple[str, int]:
+        job_id: Hashable,
+        on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+        checkpoint: TranslationCheckpoint | None = None,
+        fallback_models: list[AIModel] | None = None,
+        hedge: bool = False,
+        deduplication_stats: DeduplicationStats | None = None,
+        cache_concurrency_class: ConcurrencyClass = (
+            ConcurrencyClass.translation_cache
+        ),
+    ) -> list[tuple[str, int]]:
         """Processes the translation request
 
-        This method handles the actual translation, including splitting text
+        This method handles the actual translation, including splitting texts
         into chunks if necessary and storing the translation
-        results in the database.
+        results in the database. Chunks of all texts are dispatched through
+        the shared chunk scheduler under `job_id`, so concurrency is bounded
+        per model and jobs are interleaved fairly.
+
+        Paragraphs repeated within the job become chunks of their own, and
+        identical chunks are translated once: the translation is put at
+        every position, while tokens are billed only at the first one.
 
         Returns:
-            tuple[str, int]: The translated text and amount of tokens used
+            list[tuple[str, int]]: The translated texts and amount of tokens
+                used for each of them
         """
         try:
             if (
-                self.count_words(text)
+                sum(self.count_words(text) for text in texts)
                 > text_translation_config.max_words_in_text
             ):
                 raise TranslatorTextTooLongError(
                     'Превышено максимальное число слов в тексте'
                 )
 
-            prompt = prompt_object.text.format(
-                source_lang=(
-                    f'language with ISO code {source_language.iso_code}'
-                    if source_language
-                    else 'given language'
-                ),
-                target_lang=f'language with ISO code '
-                f'{target_language.iso_code}',
+            prompt = self.format_prompt(
+                prompt_object, source_language, target_language
             )
 
-            chunks = [text]
-            if (
-                self.count_words(text)
-                > text_translation_config.max_words_in_chunk
-            ):
-                chunks = self.split_text_into_chunks(
-                    text,
-                    text_translation_config.max_words_in_chunk,
+            # Every text is a sequence of verbatim strings and indexes of
+            # chunks to translate
+            repeated = self.find_repeated_paragraphs(texts)
+            layouts: list[list[str | int]] = []
+            chunk_objects: list[TranslationChunk] = []
+            for text in texts:
+                layout = []
+                for part in self.split_document(
+                    text=text, model=model, prompt=prompt, repeated=repeated
+                ):
+                    if isinstance(part, TranslationChunk):
+                        layout.append(len(chunk_objects))
+                        chunk_objects.append(part)
+                    else:
+                        layout.append(part)
+                layouts.append(layout)
+            chunks = [chunk.text for chunk in chunk_objects]
+
+            chunk_keys = [
+                TranslationCache.get_key(
+                    chunk=chunk,
+                    model=model,
+                    prompt_object=prompt_object,
+                    target_language=target_language,
                 )
+                for chunk in chunks
+            ]
+            # Index of the first chunk with the same key, only these are
+            # translated
+            first_indexes: dict[str, int] = {}
+            for i, key in enumerate(chunk_keys):
+                first_indexes.setdefault(key, i)
+            unique = list(first_indexes.values())
 
-            translations = await asyncio.gather(
-                *(
-                    self._process_chunk(
-                        model=model, prompt=prompt, chunk=chunk
-                    )
-                    for chunk in chunks
+            # Chunks saved by a previous run of the job are billed, as they
+            # have not been paid for yet; cached ones are free
+            translated = {}
+            if checkpoint is not None:
+                resumed = checkpoint.get_many(list(first_indexes))
+                translated = {
+                    i: resumed[chunk_keys[i]]
+                    for i in unique
+                    if chunk_keys[i] in resumed
+                }
+            cached = {}
+            if translation_cache_config.is_enabled:
+                cached = await translation_cache.get_many(
+                    [chunk_keys[i] for i in unique if i not in translated],
+                    model,
+                    cache_concurrency_class,
+                )
+            cached_chunks = 0
+            for i in unique:
+                if i not in translated and chunk_keys[i] in cached:
+                    translated[i] = (cached[chunk_keys[i]], 0)
+                    cached_chunks += 1
+
+            model_key = ChunkScheduler.get_model_key(
+                model.name, model.provider
+            )
+            pending = [i for i in unique if i not in translated]
+            chunks_done = len(unique) - len(pending)
+            if on_progress is not None:
+                await on_progress(chunks_done, len(unique))
+
+            process_chunk = (
+                self._process_chunk_hedged
+                if hedge
+                else self._process_chunk_with_failover
+            )
+
+            async def translate_chunk(i: int) -> tuple[str, int]:
+                nonlocal chunks_done
+                result = await chunk_scheduler.submit(
+                    job_id=job_id,
+                    model_key=model_key,
+                    func=lambda: process_chunk(
+                        models=[model, *(fallback_models or [])],
+                        prompt=prompt,
+                        chunk=chunks[i],
+                    ),
+                )
+                if checkpoint is not None:
+                    await checkpoint.add(chunk_keys[i], *result)
+                chunks_done += 1
+                if on_progress is not None:
+                    await on_progress(chunks_done, len(unique))
+                return result
+
+            started_at = time.monotonic()
+            if checkpoint is not None:
+                # Other chunks are let to finish when one fails, so that
+                # they get into the checkpoint
+                results = await asyncio.gather(
+                    *(translate_chunk(i) for i in pending),
+                    return_exceptions=True,
                 )
+                await checkpoint.flush()
+                for chunk_result in results:
+                    if isinstance(chunk_result, BaseException):
+                        raise chunk_result
+            else:
+                # Nothing would keep the other chunks, so they are
+                # cancelled as soon as one fails
+                tasks = [
+                    asyncio.create_task(translate_chunk(i)) for i in pending
+                ]
+                try:
+                    results = await asyncio.gather(*tasks)
+                except BaseException:
+                    for task in tasks:
+                        task.cancel()
+                    raise
+            self.logger.info(
+                'Job %s: %s chunks translated in %.2fs, %s reused, '
+                '%s duplicates',
+                job_id,
+                len(pending),
+                time.monotonic() - started_at,
+                len(unique) - len(pending),
+                len(chunks) - len(unique),
             )
 
-            result = ' '.join(map(lambda x: x[0], translations))
-            return result, sum(map(lambda x: x[1], translations))
+            translated.update(zip(pending, results))
+            if translation_cache_config.is_enabled:
+                await translation_cache.set_many(
+                    {chunk_keys[i]: translated[i][0] for i in pending},
+                    model,
+                    cache_concurrency_class,
+                )
+
+            saved_tokens = 0
+            for i, key in enumerate(chunk_keys):
+                if i != first_indexes[key]:
+                    chunk_text, chunk_tokens = translated[first_indexes[key]]
+                    translated[i] = (chunk_text, 0)
+                    saved_tokens += chunk_tokens
+            if deduplication_stats is not None:
+                deduplication_stats.chunks = len(chunks)
+                deduplication_stats.unique_chunks = len(unique)
+                deduplication_stats.cached_chunks = cached_chunks
+                deduplication_stats.saved_tokens = saved_tokens
+
+            result = []
+            for layout in layouts:
+                parts = []
+                tokens_used = 0
+                for part in layout:
+                    if isinstance(part, str):
+                        parts.append(part)
+                        continue
+                    chunk_text, chunk_tokens = translated[part]
+                    chunk = chunk_objects[part]
+                    parts.append(
+                        restore_placeholders(
+                            chunk_text.strip(), chunk.placeholders
+                        )
+                        + chunk.separator
+                    )
+                    tokens_used += chunk_tokens
+                result.append((''.join(parts), tokens_used))
+            return result
         except ValueError:
             raise Exception('Недопустимый текст')
         except Exception as e:
             self.logger.error(e)
             raise e
 
+    async def translate_stream(
+        self,
+        text: str,
+        source_language: Language | None,
+        target_language: Language,
+        model: AIModel,
+        prompt_object: StylePrompt,
+        fallback_models: list[AIModel] | None = None,
+        cache_concurrency_class: ConcurrencyClass = (
+            ConcurrencyClass.translation_cache
+        ),
+    ) -> AsyncGenerator[tuple[str, int], None]:
+        """Translates text chunk by chunk, yielding partial results.
+
+        Yields:
+            tuple[str, int]: A piece of translated text and amount of tokens
+                used. Tokens are reported once per chunk, when the chunk
+                is finished; pieces of one chunk are yielded with 0 tokens.
+                Chunks are followed by the whitespace that separated them in
+                the source text, like in `translate`.
+
+        Raises:
+            The same exceptions as `translate`.
+        """
+        try:
+            if (
+                self.count_words(text)
+                > text_translation_config.max_words_in_text
+            ):
+                raise TranslatorTextTooLongError(
+                    'Превышено максимальное число слов в тексте'
+                )
+            prompt = self.format_prompt(
+                prompt_object, source_language, target_language
+            )
+            for part in self.split_document(
+                text=text, model=model, prompt=prompt
+            ):
+                if isinstance(part, str):
+                    yield part, 0
+                    continue
+                cache_key = None
+                if translation_cache_config.is_enabled:
+                    cache_key = TranslationCache.get_key(
+                        chunk=part.text,
+                        model=model,
+                        prompt_object=prompt_object,
+                        target_language=target_language,
+                    )
+                    cached = await translation_cache.get_many(
+                        [cache_key], model, cache_concurrency_class
+                    )
+                    if cache_key in cached:
+                        yield (
+                            restore_placeholders(
+                                cached[cache_key].strip(), part.placeholders
+                            )
+                            + part.separator
+                        ), 0
+                        continue
+
+                pieces = []
+                # Trailing whitespace and text after an unclosed placeholder
+                # are held back until it is known what follows them
+                pending = ''
+                is_started = False
+                async for piece, tokens in self._stream_chunk_with_failover(
+                    models=[model, *(fallback_models or [])],
+                    prompt=prompt,
+                    chunk=part.text,
+                ):
+                    pieces.append(piece)
+                    pending += piece
+                    if not is_started:
+                        pending = pending.lstrip()
+                        is_started = bool(pending)
+                    cut = pending.rfind('⟦')
+                    if cut == -1 or '⟧' in pending[cut:]:
+                        cut = len(pending)
+                    ready = pending[:cut].rstrip()
+                    pending = pending[len(ready) :]
+                    yield fill_placeholders(ready, part.placeholders), tokens
+                translation = ''.join(pieces)
+                lost = get_lost_placeholders(translation, part.placeholders)
+                tail = fill_placeholders(pending.rstrip(), part.placeholders)
+                yield ' '.join([tail, *lost]) + part.separator, 0
+                if cache_key is not None:
+                    await translation_cache.set_many(
+                        {cache_key: translation},
+                        model,
+                        cache_concurrency_class,
+                    )
+        except (
+            TranslatorTextTooLongError,
+            TranslatorAPIError,
+            TranslatorAPITimeoutError,
+        ) as e:
+            self.logger.exception(f'Ошибка API: {e}')
+            raise
+        except Exception as e:
+            self.logger.exception(f'Some error occurred: {e}.')
+            raise TranslatorError(e)
+
+    @staticmethod
+    def format_prompt(
+        prompt_object: StylePrompt,
+        source_language: Language | None,
+        target_language: Language,
+    ) -> str:
+        prompt = prompt_object.text.format(
+            source_lang=(
+                f'language with ISO code {source_language.iso_code}'
+                if source_language
+                else 'given language'
+            ),
+            target_lang=f'language with ISO code '
+            f'{target_language.iso_code}',
+        )
+        return f'{prompt} {PLACEHOLDER_INSTRUCTION}'
+
+    async def _process_chunk_with_failover(
+        self, models: list[AIModel], prompt: str, chunk: str
+    ) -> tuple[str, int]:
+        """Translates chunk with the first model whose provider is healthy.
+
+        Providers are skipped while their circuit is open (see
+        `CircuitBreaker`), and a failed request falls over to the next
+        model instead of failing the chunk.
+        """
+        error = None
+        for model in models:
+            model_key = ChunkScheduler.get_model_key(
+                model.name, model.provider
+            )
+            if not await circuit_breaker.is_available(model_key):
+                continue
+            try:
+                result = await self._process_chunk(
+                    model=model, prompt=prompt, chunk=chunk
+                )
+            except TranslatorRateLimitError as e:
+                # The provider is busy, not broken
+                error = e
+                continue
+            except (TranslatorAPIError, TranslatorAPITimeoutError) as e:
+                self.logger.warning('%s failed: %r', model_key, e)
+                await circuit_breaker.record_failure(model_key, repr(e))
+                error = e
+                continue
+            await circuit_breaker.record_success(model_key)
+            return result
+        raise error or TranslatorAPITimeoutError(
+            'Все провайдеры модели недоступны'
+        )
+
+    async def _process_chunk_hedged(
+        self, models: list[AIModel], prompt: str, chunk: str
+    ) -> tuple[str, int]:
+        """Translates chunk, duplicating the request if it is slow.
+
+        When the request takes longer than `hedging_config.percentile` of
+        recent latencies of the model, the same chunk is also sent to the
+        next provider (or to the same one, if the model has no fallbacks).
+        The first successful answer wins and the other request is
+        cancelled. Duplicates are limited by `HedgeBudget`.
+        """
+        model_key = ChunkScheduler.get_model_key(
+            models[0].name, models[0].provider
+        )
+        primary = asyncio.create_task(
+            self._process_chunk_with_failover(
+                models=models, prompt=prompt, chunk=chunk
+            )
+        )
+        delay = latency_tracker.get_percentile(
+            model_key, hedging_config.percentile
+        )
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not await hedge_budget.reserve(
+            estimate_request_tokens(prompt, chunk, models[0].name)
+        ):
+            return await primary
+
+        self.logger.info('Hedging slow request to %s', model_key)
+        latency_tracker.hedges_sent[model_key] += 1
+        hedge = asyncio.create_task(
+            self._process_chunk_with_failover(
+                models=models[1:] or models[:1], prompt=prompt, chunk=chunk
+            )
+        )
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            latency_tracker.hedges_won[model_key] += 1
+                        return task.result()
+            # Both requests failed
+            return primary.result()
+        finally:
+            primary.cancel()
+            hedge.cancel()
+
+    async def _stream_chunk_with_failover(
+        self, models: list[AIModel], prompt: str, chunk: str
+    ) -> AsyncGenerator[tuple[str, int], None]:
+        """Streaming counterpart of `_process_chunk_with_failover`. Fails
+        over only until the first piece of translation is received."""
+        error = None
+        for model in models:
+            model_key = ChunkScheduler.get_model_key(
+                model.name, model.provider
+            )
+            if not await circuit_breaker.is_available(model_key):
+                continue
+            is_started = False
+            try:
+                async for piece, tokens in self._stream_chunk(
+                    model=model, prompt=prompt, chunk=chunk
+                ):
+                    is_started = True
+                    yield piece, tokens
+            except TranslatorRateLimitError as e:
+                error = e
+                continue
+            except (TranslatorAPIError, TranslatorAPITimeoutError) as e:
+                self.logger.warning('%s failed: %r', model_key, e)
+                await circuit_breaker.record_failure(model_key, repr(e))
+                if is_started:
+                    raise
+                error = e
+                continue
+            await circuit_breaker.record_success(model_key)
+            return
+        raise error or TranslatorAPITimeoutError(
+            'Все провайдеры модели недоступны'
+        )
+
+    async def _stream_chunk(
+        self, model: AIModel, prompt: str, chunk: str
+    ) -> AsyncGenerator[tuple[str, int], None]:
+        """
+        Streams translation of a chunk as (piece of text, tokens used) pairs.
+        Translators without streaming support yield the whole chunk at once
+        """
+        yield await self._process_chunk(
+            model=model, prompt=prompt, chunk=chunk
+        )
+
     @abstractmethod
     async def _process_chunk(
         self, model: AIModel, prompt: str, chunk: str
     ) -> tuple[str, int]:
         """
         This method sends prompt to specified model and returns translated
-        chunk of text and amount of tokens used
+        chunk of text and amount of tokens used. Latency of the request to
+        the provider is recorded in `latency_tracker`
         """
         pass
 
@@ -160,39 +680,148 @@ class AbstractTranslator(ABC):
         words = re.findall(match_whole_words, text)
         return len(words)
 
-    def split_text_into_chunks(self, text: str, max_words: int) -> list[str]:
-        """Splits text into chunks based on a maximum word limit.
+    @staticmethod
+    def get_chunk_token_limit(model: AIModel, prompt: str) -> int:
+        """Calculates the biggest chunk size in tokens for the model.
 
-        This method splits the input text into smaller chunks by sentences,
-        ensuring that each chunk does not exceed the specified maximum word
-        count. The splitting is done based on sentence-ending punctuation.
+        The chunk together with the prompt and its expected translation must
+        fit into the context of the model, and the translation must fit into
+        the output limit of the model.
+        """
+        context_size = (
+            model.context_size or text_translation_config.default_context_size
+        )
+        max_output_tokens = (
+            model.max_output_tokens
+            or text_translation_config.default_max_output_tokens
+        )
+        prompt_tokens = (
+            count_tokens(prompt, model.name)
+            + text_translation_config.message_overhead_tokens
+        )
+        ratio = text_translation_config.output_tokens_ratio
+        limit = int(
+            min(
+                (context_size - prompt_tokens) / (1 + ratio),
+                max_output_tokens / ratio,
+                text_translation_config.max_tokens_in_chunk,
+            )
+        )
+        if limit <= 0:
+            raise TranslatorTextTooLongError(
+                'Промпт не помещается в контекст модели'
+            )
+        return limit
 
-        Args:
-            text (str): The text to be split into chunks.
-            max_words (int): The maximum number of words allowed in each chunk.
+    @staticmethod
+    def get_paragraph_key(
+        paragraph: str, placeholders: list[str]
+    ) -> str | None:
+        """Returns normalised paragraph text, the same for paragraphs that
+        differ only in whitespace or values of placeholders, or None if the
+        paragraph is not worth deduplication."""
+        text, _ = renumber_placeholders(paragraph.strip(), placeholders)
+        if (
+            len(text) < text_translation_config.deduplication_min_length
+            or not has_translatable_text(text)
+        ):
+            return None
+        return TranslationCache.normalize(text)
 
-        Returns:
-            list[str]: A list of text chunks, each within the word limit.
-        """
-        split_by_sentence_end = r'(?<=[.!?]) +'
-        sentences = re.split(split_by_sentence_end, text)
-        chunks = []
-        current_chunk = []
+    def find_repeated_paragraphs(self, texts: list[str]) -> set[str]:
+        """Returns keys of paragraphs found more than once in the texts,
+        see `get_paragraph_key`."""
+        counts = Counter(
+            key
+            for text in texts
+            for segment in split_markdown(text)
+            if segment.is_translatable
+            for paragraph in split_paragraphs(segment.text)
+            if (key := self.get_paragraph_key(paragraph, segment.placeholders))
+        )
+        return {key for key, count in counts.items() if count > 1}
 
-        current_word_count = 0
+    def split_document(
+        self,
+        text: str,
+        model: AIModel,
+        prompt: str,
+        repeated: set[str] | None = None,
+    ) -> list[str | TranslationChunk]:
+        """Splits Markdown text into verbatim parts and chunks to translate.
 
-        for sentence in sentences:
-            sentence_word_count = self.count_words(sentence)
+        Code, HTML, URLs and link targets are kept verbatim (see
+        `split_markdown`), as well as chunks without any letters, so they
+        are neither sent to the model nor billed. Joining verbatim parts
+        with translated chunks and their separators restores the structure
+        of the document.
 
-            if current_word_count + sentence_word_count > max_words:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [sentence]
-                current_word_count = sentence_word_count
-            else:
-                current_chunk.append(sentence)
-                current_word_count += sentence_word_count
+        Paragraphs whose keys are in `repeated` are put into chunks of their
+        own, so that every copy of them gets the same chunk.
+        """
+        parts = []
+        for segment in split_markdown(text):
+            if not segment.is_translatable:
+                parts.append(segment.text)
+                continue
+            # Runs of paragraphs chunked separately, repeated paragraphs
+            # make runs of their own
+            runs: list[str] = []
+            is_previous_repeated = True
+            for paragraph in (
+                split_paragraphs(segment.text) if repeated else [segment.text]
+            ):
+                is_repeated = bool(repeated) and (
+                    self.get_paragraph_key(paragraph, segment.placeholders)
+                    in repeated
+                )
+                if is_repeated or is_previous_repeated:
+                    runs.append(paragraph)
+                else:
+                    runs[-1] += paragraph
+                is_previous_repeated = is_repeated
+            chunks = [
+                chunk
+                for run in runs
+                for chunk in self.split_text_into_chunks(
+                    text=run, model=model, prompt=prompt
+                )
+            ]
+            for prefix, chunk, separator in chunks:
+                if prefix:
+                    parts.append(prefix)
+                if has_translatable_text(chunk):
+                    chunk, placeholders = renumber_placeholders(
+                        chunk, segment.placeholders
+                    )
+                    parts.append(
+                        TranslationChunk(
+                            text=chunk,
+                            separator=separator,
+                            placeholders=placeholders,
+                        )
+                    )
+                else:
+                    parts.append(
+                        fill_placeholders(chunk, segment.placeholders)
+                        + separator
+                    )
+        return parts
 
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+    def split_text_into_chunks(
+        self, text: str, model: AIModel, prompt: str
+    ) -> list[tuple[str, str, str]]:
+        """Splits text into chunks that fit the limits of the model.
 
-        return chunks
+        Chunk size is measured in tokens of the model's encoding, see
+        `get_chunk_token_limit` and `split_text_by_tokens`.
+
+        Returns:
+            list[tuple[str, str, str]]: Chunks with whitespace preceding and
+                following each of them in the text.
+        """
+        return split_text_by_tokens(
+            text=text,
+            max_tokens=self.get_chunk_token_limit(model=model, prompt=prompt),
+            encoding=get_encoding(model.name),
+        )
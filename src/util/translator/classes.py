@@ -1,5 +1,7 @@
 import json
 import logging
+import time
+from typing import AsyncGenerator
 from urllib.parse import urljoin
 
 import httpx
@@ -8,22 +10,42 @@ from src.database.models import (
     AIModel,
 )
 from src.settings import (
+    circuit_breaker_config,
     openrouter_config,
     g4f_config,
 )
+from src.util.hedging.classes import latency_tracker
+from src.util.http.classes import SharedHTTPClient
+from src.util.rate_limiter.classes import rate_limiter
+from src.util.scheduler.classes import ChunkScheduler
 from src.util.translator.abstract import AbstractTranslator
 import tenacity
 
-from src.util.translator.exceptions import TranslatorAPITimeoutError
+from src.util.translator.exceptions import (
+    TranslatorAPIError,
+    TranslatorAPITimeoutError,
+    TranslatorRateLimitError,
+)
+from src.util.translator.helpers import count_tokens, estimate_request_tokens
 
 
 class Gpt4freeTranslator(AbstractTranslator):
-    logging.getLogger('app')
+    logger = logging.getLogger('app')
 
     async def get_response(self, request_payload: dict) -> httpx.Response:
+        model_key = ChunkScheduler.get_model_key(
+            request_payload['model'], request_payload['provider']
+        )
+
         @tenacity.retry(
-            stop=tenacity.stop_after_attempt(3),
-            wait=tenacity.wait_exponential(multiplier=1, min=2, max=10),
+            # Kept short: on persistent errors the request fails over to
+            # another provider instead of waiting here
+            stop=tenacity.stop_after_attempt(
+                circuit_breaker_config.provider_attempts
+            ),
+            wait=tenacity.wait_exponential(
+                multiplier=0.5, max=circuit_breaker_config.retry_max_wait_sec
+            ),
             retry=tenacity.retry_if_exception_type(
                 (
                     httpx.HTTPStatusError,
@@ -47,40 +69,54 @@ class Gpt4freeTranslator(AbstractTranslator):
                 url: The URL to request.
                 **kwargs:  Any other keyword arguments to pass to client.request()
             """
+            started_at = time.monotonic()
             response = await client.request(method, url, **kwargs)
             response.raise_for_status()
+            # Only the successful attempt, without waiting for rate limits
+            # and retries, so hedging follows the provider's own latency
+            latency_tracker.record(model_key, time.monotonic() - started_at)
             return response
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            try:
-                response = await resilient_request(
-                    client,
-                    'POST',
-                    urljoin(g4f_config.address, '/v1/chat/completions'),
-                    json=request_payload,
-                )
-                self.logger.debug('Received repsonse: %s', response)
-                return response
-            except tenacity.RetryError as e:
-                self.logger.error(
-                    f'Request failed after multiple retries: {e}'
-                )
-                raise TranslatorAPITimeoutError()
-            except Exception as e:
-                self.logger.exception(f'An unexpected error occurred: {e}')
-                raise e
+        client = SharedHTTPClient.get_client()
+        try:
+            response = await resilient_request(
+                client,
+                'POST',
+                urljoin(g4f_config.address, '/v1/chat/completions'),
+                json=request_payload,
+            )
+            self.logger.debug('Received repsonse: %s', response)
+            return response
+        except tenacity.RetryError as e:
+            self.logger.error(f'Request failed after multiple retries: {e}')
+            raise TranslatorAPITimeoutError()
+        except Exception as e:
+            # Failed over to another provider like any other API error
+            self.logger.exception(f'An unexpected error occurred: {e}')
+            raise TranslatorAPIError(repr(e)) from e
 
-    async def _process_chunk(
-        self, model: AIModel, prompt: str, chunk: str
-    ) -> tuple[str, int]:
-        request_payload = {
+    @staticmethod
+    async def _acquire_rate_limit(
+        model: AIModel, prompt: str, chunk: str
+    ) -> int:
+        """Takes a request and its estimated tokens from the provider's
+        rate limits. Returns the estimation."""
+        estimated_tokens = estimate_request_tokens(prompt, chunk, model.name)
+        if not await rate_limiter.acquire(model.provider, estimated_tokens):
+            raise TranslatorRateLimitError(
+                f'Превышен лимит запросов к провайдеру {model.provider}'
+            )
+        return estimated_tokens
+
+    @staticmethod
+    def _get_request_payload(model: AIModel, prompt: str, chunk: str) -> dict:
+        return {
             'messages': [
                 {'role': 'system', 'content': prompt},
                 {'role': 'user', 'content': chunk},
             ],
             'model': model.name,
             'provider': model.provider,
-            # 'stream': False,
             # 'temperature': 1,
             # 'max_tokens': 8192,
             # 'stop': [],
@@ -88,15 +124,80 @@ class Gpt4freeTranslator(AbstractTranslator):
             # 'web_search': True,
             # 'proxy': None
         }
+
+    async def _process_chunk(
+        self, model: AIModel, prompt: str, chunk: str
+    ) -> tuple[str, int]:
+        request_payload = self._get_request_payload(model, prompt, chunk)
+        estimated_tokens = await self._acquire_rate_limit(model, prompt, chunk)
         self.logger.info(
             f'Translating chunk: {json.dumps(chunk, ensure_ascii=False)}'
         )
         response = await self.get_response(request_payload)
-        payload = response.json()
-        self.logger.info('Got response: %s', payload)
-        if not response.is_success:
-            raise Exception(json.dumps(payload))
-        answer = payload['choices'][0]['message']['content']
-        tokens_used = payload['usage']['total_tokens']
+        try:
+            payload = response.json()
+            self.logger.info('Got response: %s', payload)
+            answer = payload['choices'][0]['message']['content']
+            tokens_used = payload['usage']['total_tokens']
+        except (ValueError, LookupError, TypeError) as e:
+            raise TranslatorAPIError(
+                f'Unexpected response: {response.text[:1000]}'
+            ) from e
         self.logger.info(f'Returned answer: {answer}')
+        await rate_limiter.record_usage(
+            model.provider, estimated_tokens, tokens_used
+        )
         return answer, tokens_used
+
+    async def _stream_chunk(
+        self, model: AIModel, prompt: str, chunk: str
+    ) -> AsyncGenerator[tuple[str, int], None]:
+        request_payload = self._get_request_payload(model, prompt, chunk)
+        request_payload['stream'] = True
+        estimated_tokens = await self._acquire_rate_limit(model, prompt, chunk)
+        self.logger.info(
+            f'Streaming chunk: {json.dumps(chunk, ensure_ascii=False)}'
+        )
+        client = SharedHTTPClient.get_client()
+        pieces = []
+        tokens_used = None
+        try:
+            async with client.stream(
+                'POST',
+                urljoin(g4f_config.address, '/v1/chat/completions'),
+                json=request_payload,
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    data = line.removeprefix('data:').strip()
+                    if data == '[DONE]':
+                        break
+                    event = json.loads(data)
+                    if event.get('usage'):
+                        tokens_used = event['usage']['total_tokens']
+                    for choice in event.get('choices') or []:
+                        piece = (choice.get('delta') or {}).get('content')
+                        if piece:
+                            pieces.append(piece)
+                            yield piece, 0
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            self.logger.error(f'Streaming request failed: {e}')
+            raise TranslatorAPITimeoutError()
+        except httpx.HTTPStatusError as e:
+            raise TranslatorAPIError(str(e))
+        except (httpx.HTTPError, ValueError, LookupError, TypeError) as e:
+            # E.g. broken event or protocol error
+            raise TranslatorAPIError(repr(e)) from e
+
+        if tokens_used is None:
+            # Not every provider reports usage in stream mode
+            tokens_used = count_tokens(
+                prompt + chunk + ''.join(pieces), model.name
+            )
+        self.logger.info(f'Streamed answer: {"".join(pieces)}')
+        await rate_limiter.record_usage(
+            model.provider, estimated_tokens, tokens_used
+        )
+        yield '', tokens_used
@@ -17,3 +17,7 @@ class TranslatorTextTooLongError(TranslatorError):
 
 class TranslatorAPITimeoutError(TranslatorError):
     pass
+
+
+class TranslatorRateLimitError(TranslatorAPIError):
+    pass
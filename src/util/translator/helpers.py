@@ -1,3 +1,12 @@
+import asyncio
+import enum
+import functools
+import hashlib
+import math
+import random
+import re
+from dataclasses import dataclass
+
 import tiktoken
 
 from src.database.models import (
@@ -7,48 +16,322 @@ from src.database.models import (
 )
 import logging
 
+from src.settings import text_translation_config, token_estimation_config
+from src.util.storage.classes import RedisHandler
+from src.util.token_ratios.classes import token_ratio_table
+from src.util.translator.segmentation import PLACEHOLDER_PATTERN
+
 logger = logging.getLogger('app')
 
 
-def estimate_translation_tokens(
-    input_text: str,
-    prompt: StylePrompt,
-    model: AIModel,
-) -> int:
-    """
-    Estimates the number of input and output tokens required for translating text
-    from one language to another using a GPT model via an API like OpenAI or OpenRouter.
+@functools.cache
+def get_encoding(model_name: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        logger.warning(
+            'model %s not found. Using cl100k_base encoding.', model_name
+        )
+        return tiktoken.get_encoding(
+            'cl100k_base'
+        )  # Good default for many models
 
-    This function uses the `tiktoken` library to count tokens based on the specified model.
-    It's crucial to choose the correct model name for accurate token estimation.  The output token
-    estimation includes the translated text *and* a safety margin since the exact output token
-    count will vary based on the translation and the model's response.
 
-    Args:
-        input_text: The text to be translated.
-        source_language: The language of the input text (e.g., "English").
-        target_language: The language to translate to (e.g., "French").
-        model_name: The name of the GPT model to use for token estimation
-                    (e.g., "gpt-3.5-turbo", "gpt-4").  Defaults to "gpt-3.5-turbo".
+def count_tokens(text: str, model_name: str) -> int:
+    return len(get_encoding(model_name).encode_ordinary(text))
 
-    Returns:
-        A tuple containing:
-            - input_tokens: The estimated number of input tokens.
-            - output_tokens: The estimated number of output tokens (translation + margin).
+
+@functools.cache
+def _get_redis_handler() -> RedisHandler:
+    return RedisHandler()
+
+
+async def count_tokens_async(text: str, model_name: str) -> int:
+    """Counts tokens without blocking the event loop on big texts.
+
+    Counts of texts longer than `memo_min_length` are memoised in Redis by
+    hash of the text and encoding, so an estimate followed by creating a
+    task encodes the text once. Texts longer than `offload_min_length` are
+    encoded in a worker thread (tiktoken releases the GIL while encoding).
     """
+    if len(text) < token_estimation_config.memo_min_length:
+        return count_tokens(text, model_name)
 
+    encoding = get_encoding(model_name)
+    text_hash = hashlib.sha256(
+        f'{encoding.name}\x1f{text}'.encode('utf-8')
+    ).hexdigest()
+    key = token_estimation_config.redis_key_template.format(text_hash)
     try:
-        encoding = tiktoken.encoding_for_model(model.name)
-    except KeyError:
-        logger.warning(
-            'model %s not found. Using cl100k_base encoding.', model.name
+        memoised = await _get_redis_handler().get(key)
+        if memoised is not None:
+            return int(memoised)
+    except Exception as e:
+        logger.warning('Could not get memoised token count: %s', e)
+
+    if len(text) >= token_estimation_config.offload_min_length:
+        tokens = await asyncio.to_thread(count_tokens, text, model_name)
+    else:
+        tokens = count_tokens(text, model_name)
+
+    try:
+        await _get_redis_handler().set(
+            key, tokens, ex=token_estimation_config.memo_ttl_sec
         )
-        encoding = tiktoken.get_encoding(
-            'cl100k_base'
-        )  # Good default for many models
+    except Exception as e:
+        logger.warning('Could not memoise token count: %s', e)
+    return tokens
 
-    # 1. Estimate input tokens
-    input_tokens = len(encoding.encode(input_text))
+
+def estimate_request_tokens(prompt: str, chunk: str, model_name: str) -> int:
+    """Estimates tokens of one chunk request, expected answer included."""
+    return int(
+        count_tokens(prompt + chunk, model_name)
+        * (1 + text_translation_config.output_tokens_ratio)
+    )
+
+
+# Boundaries tried in order when a piece of text does not fit into a chunk:
+# paragraphs, lines, sentences, clauses and finally words. Separators stay
+# attached to the end of the preceding piece
+CHUNK_BOUNDARIES = (
+    re.compile(r'\n\s*\n'),
+    re.compile(r'\n'),
+    re.compile(r'(?<=[.!?…。！？])\s+|(?<=[。！？])'),
+    re.compile(r'(?<=[,;:，；：、])\s*'),
+    re.compile(r'\s+'),
+)
+
+
+def _split_by_boundary(text: str, boundary: re.Pattern) -> list[str]:
+    pieces = []
+    start = 0
+    for match in boundary.finditer(text):
+        if match.end() > start and match.end() < len(text):
+            pieces.append(text[start : match.end()])
+            start = match.end()
+    pieces.append(text[start:])
+    return pieces
+
+
+def _cut_by_length(text: str, size: int) -> list[str]:
+    """Cuts text into parts of `size` characters, moving cuts out of
+    placeholders."""
+    placeholders = [
+        match.span() for match in PLACEHOLDER_PATTERN.finditer(text)
+    ]
+    parts = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        for placeholder_start, placeholder_end in placeholders:
+            if placeholder_start < end < placeholder_end:
+                end = (
+                    placeholder_start
+                    if placeholder_start > start
+                    else placeholder_end
+                )
+                break
+        parts.append(text[start:end])
+        start = end
+    return parts
+
+
+def _split_into_pieces(
+    text: str,
+    max_tokens: int,
+    encoding: tiktoken.Encoding,
+    level: int = 0,
+) -> list[tuple[str, int]]:
+    """Splits text into (piece, tokens count) pairs of at most `max_tokens`
+    tokens, using the coarsest boundary that is enough."""
+    tokens = len(encoding.encode_ordinary(text))
+    if (
+        tokens <= max_tokens
+        or len(text) == 1
+        or PLACEHOLDER_PATTERN.fullmatch(text)
+    ):
+        return [(text, tokens)]
+    if level == len(CHUNK_BOUNDARIES):
+        # A single "word" longer than a chunk, e.g. base64 blob
+        return [
+            piece
+            for part in _cut_by_length(
+                text, max(1, len(text) * max_tokens // tokens)
+            )
+            for piece in _split_into_pieces(
+                part, max_tokens, encoding, level
+            )
+        ]
+    return [
+        piece
+        for part in _split_by_boundary(text, CHUNK_BOUNDARIES[level])
+        for piece in _split_into_pieces(part, max_tokens, encoding, level + 1)
+    ]
+
+
+def split_text_by_tokens(
+    text: str, max_tokens: int, encoding: tiktoken.Encoding
+) -> list[tuple[str, str, str]]:
+    """Splits text into chunks of at most `max_tokens` tokens.
+
+    Text is cut at paragraph ends first, then at line, sentence, clause and
+    word boundaries, only where the coarser ones are not enough. Pieces are
+    packed so that chunks have roughly the same size instead of leaving a
+    tiny last chunk.
+
+    Returns:
+        list[tuple[str, str, str]]: Whitespace preceding every chunk (e.g.
+            indentation of a nested list item), the chunk stripped of
+            surrounding whitespace and the whitespace that followed it, so
+            the text can be reassembled as `prefix + chunk + separator`.
+            Text without anything but whitespace is returned as a prefix of
+            an empty chunk
+    """
+    pieces = _split_into_pieces(text, max_tokens, encoding)
+    total_tokens = sum(tokens for _, tokens in pieces)
+    target_tokens = math.ceil(
+        total_tokens / max(1, math.ceil(total_tokens / max_tokens))
+    )
+
+    raw_chunks = []
+    current, current_tokens = [], 0
+    for piece, tokens in pieces:
+        if current and (
+            current_tokens + tokens > max_tokens
+            or current_tokens >= target_tokens
+        ):
+            raw_chunks.append(''.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    raw_chunks.append(''.join(current))
+
+    chunks = []
+    # Whitespace-only chunks, e.g. indentation split off a long line, go
+    # before the next chunk
+    prefix = ''
+    for raw_chunk in raw_chunks:
+        chunk = raw_chunk.strip()
+        if not chunk:
+            prefix += raw_chunk
+            continue
+        leading = raw_chunk[: len(raw_chunk) - len(raw_chunk.lstrip())]
+        separator = raw_chunk[len(raw_chunk.rstrip()) :]
+        chunks.append((prefix + leading, chunk, separator))
+        prefix = ''
+    if prefix and chunks:
+        leading, chunk, separator = chunks[-1]
+        chunks[-1] = (leading, chunk, separator + prefix)
+    elif prefix:
+        chunks.append((prefix, '', ''))
+    return chunks
+
+
+class EstimationMode(enum.StrEnum):
+    exact = 'exact'
+    # Extrapolate from a sample of paragraphs and use the upper confidence
+    # bound. Falls back to exact counting for short texts
+    sample = 'sample'
+
+
+@dataclass(frozen=True)
+class SampledTokenCount:
+    tokens: int
+    upper_bound: int
+    sampled_units: int
+    total_units: int
+
+
+def _get_sampling_units(text: str) -> list[str]:
+    units = [unit for unit in re.split(r'\n\s*\n', text) if unit.strip()]
+    min_units = (
+        token_estimation_config.sample_strata
+        * token_estimation_config.sample_units_per_stratum
+        * 4
+    )
+    if len(units) >= min_units:
+        return units
+    size = token_estimation_config.sample_unit_length
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+def sample_tokens(
+    text: str, model_name: str, seed: int | None = None
+) -> SampledTokenCount:
+    """Estimates token count of text from a stratified sample.
+
+    Text is split into paragraphs (or fixed size pieces), which are
+    divided into `sample_strata` consecutive strata, and
+    `sample_units_per_stratum` random units of every stratum are encoded.
+    Token count is extrapolated with the tokens per character ratio of the
+    sample; the upper bound adds `sample_z_score` standard errors of the
+    ratio estimator.
+    """
+    units = _get_sampling_units(text)
+    strata = token_estimation_config.sample_strata
+    per_stratum = token_estimation_config.sample_units_per_stratum
+    if len(units) <= strata * per_stratum:
+        tokens = count_tokens(text, model_name)
+        return SampledTokenCount(tokens, tokens, len(units), len(units))
+
+    rng = random.Random(seed)
+    stratum_size = math.ceil(len(units) / strata)
+    sample = []
+    for start in range(0, len(units), stratum_size):
+        stratum = units[start : start + stratum_size]
+        sample.extend(rng.sample(stratum, min(per_stratum, len(stratum))))
+
+    encoding = get_encoding(model_name)
+    sample_chars = [len(unit) for unit in sample]
+    unit_tokens = [len(encoding.encode_ordinary(unit)) for unit in sample]
+    ratio = sum(unit_tokens) / max(1, sum(sample_chars))
+    # Whole text, so separators between paragraphs are counted too
+    estimate = ratio * len(text)
+
+    n, total_units = len(sample), len(units)
+    residuals_variance = sum(
+        (tokens - ratio * chars) ** 2
+        for tokens, chars in zip(unit_tokens, sample_chars)
+    ) / (n - 1)
+    standard_error = total_units * math.sqrt(
+        (1 - n / total_units) * residuals_variance / n
+    )
+    return SampledTokenCount(
+        tokens=round(estimate),
+        upper_bound=math.ceil(
+            estimate + token_estimation_config.sample_z_score * standard_error
+        ),
+        sampled_units=n,
+        total_units=total_units,
+    )
+
+
+async def _count_text_tokens(
+    input_text: str, model: AIModel, mode: EstimationMode
+) -> int:
+    if (
+        mode == EstimationMode.sample
+        and len(input_text) >= token_estimation_config.sample_min_length
+    ):
+        return sample_tokens(input_text, model.name).upper_bound
+    return await count_tokens_async(input_text, model.name)
+
+
+async def _predict_cost(
+    text_tokens: int,
+    prompt: StylePrompt,
+    model: AIModel,
+    source_language_id: int | None,
+    target_language_id: int | None,
+) -> int:
+    ratio = await token_ratio_table.get(
+        model_id=model.id,
+        source_language_id=source_language_id,
+        target_language_id=target_language_id,
+    )
+    if ratio is not None:
+        return ratio.predict(text_tokens)
 
     # 2. Estimate output tokens.  This is tricky because the translated text
     #    length can vary.  We'll use a heuristic:  Assume the translated text
@@ -57,14 +340,13 @@ def estimate_translation_tokens(
     #    Also include tokens for system prompt and instructions.
 
     # System prompt for translation.
-    system_prompt_tokens = len(encoding.encode(prompt.text))
+    system_prompt_tokens = count_tokens(prompt.text, model.name)
 
     # Total input tokens for translation
-    input_tokens += system_prompt_tokens
+    input_tokens = text_tokens + system_prompt_tokens
 
-    base_output_tokens = len(
-        encoding.encode(input_text)
-    )  # Rough estimate of translated text length
+    # Rough estimate of translated text length
+    base_output_tokens = text_tokens
 
     # Add a safety margin (e.g., 50% more tokens than the estimated base length)
     safety_margin = int(0.5 * base_output_tokens)
@@ -73,3 +355,69 @@ def estimate_translation_tokens(
     output_tokens = base_output_tokens + safety_margin
 
     return input_tokens + output_tokens
+
+
+async def estimate_translation_tokens(
+    input_text: str,
+    prompt: StylePrompt,
+    model: AIModel,
+    mode: EstimationMode = EstimationMode.exact,
+    source_language_id: int | None = None,
+    target_language_id: int | None = None,
+) -> int:
+    """
+    Estimates the number of input and output tokens required for translating text
+    from one language to another using a GPT model via an API like OpenAI or OpenRouter.
+
+    This function uses the `tiktoken` library to count tokens based on the specified model.
+    It's crucial to choose the correct model name for accurate token estimation.  The output token
+    estimation includes the translated text *and* a safety margin since the exact output token
+    count will vary based on the translation and the model's response.
+
+    The text is encoded once, see `count_tokens_async`. In
+    `EstimationMode.sample` long texts are not encoded completely, the
+    upper bound of `sample_tokens` is used instead: enough for balance
+    checks, while the exact amount is known from the task cost afterwards.
+
+    When the model has enough completed tasks, the cost is predicted with
+    the costs per source token and per chunk fitted by
+    `calibrate_token_ratios` for the language pair (or for the whole
+    model), instead of a fixed margin.
+
+    Args:
+        input_text: The text to be translated.
+        prompt: Style prompt sent with every chunk of the text.
+        model: The model to use for token estimation.
+        mode: Whether to count text tokens exactly or by a sample.
+        source_language_id: Language of the text, if known.
+        target_language_id: Language to translate to, if known.
+
+    Returns:
+        Sum of the estimated number of input tokens and output tokens
+        (translation + margin).
+    """
+    # 1. Estimate input tokens
+    text_tokens = await _count_text_tokens(input_text, model, mode)
+    return await _predict_cost(
+        text_tokens, prompt, model, source_language_id, target_language_id
+    )
+
+
+async def estimate_translation_tokens_many(
+    input_text: str,
+    prompt: StylePrompt,
+    model: AIModel,
+    target_language_ids: list[int],
+    mode: EstimationMode = EstimationMode.exact,
+    source_language_id: int | None = None,
+) -> list[int]:
+    """Same as `estimate_translation_tokens` for every target language.
+    Text tokens are counted (or sampled) once, only the ratio differs
+    between languages."""
+    text_tokens = await _count_text_tokens(input_text, model, mode)
+    return [
+        await _predict_cost(
+            text_tokens, prompt, model, source_language_id, target_language_id
+        )
+        for target_language_id in target_language_ids
+    ]
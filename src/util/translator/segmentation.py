@@ -0,0 +1,200 @@
+import logging
+import re
+from dataclasses import dataclass, field
+
+logger = logging.getLogger('app')
+
+PLACEHOLDER_TEMPLATE = '⟦{}⟧'
+PLACEHOLDER_PATTERN = re.compile(r'⟦(\d+)⟧')
+PLACEHOLDER_INSTRUCTION = (
+    'Text may contain markers like ⟦0⟧. Keep every marker exactly as it '
+    'is, in the place where it belongs in the translation.'
+)
+
+FENCE_OPENING = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+HTML_BLOCK_OPENING = re.compile(r'^ {0,3}<(?:[a-zA-Z][\w-]*[\s/>]|!--|/)')
+REFERENCE_DEFINITION = re.compile(r'^ {0,3}\[[^\]]+\]:\s*\S+')
+INLINE_VERBATIM = re.compile(
+    # Markers already in the text are placeholders too, so that only
+    # placeholders have them after masking
+    r'⟦\d+⟧'
+    r'|(`+)[\s\S]+?\1'  # inline code
+    r'|!\[[^\]]*\]\([^)]*\)'  # image
+    r'|\]\([^)]*\)'  # link target, the link text is translated
+    r'|</?[a-zA-Z][^>\n]*>'  # HTML tag or autolink
+    r'|https?://[^\s<>()]*[^\s<>().,;:!?\'"]'  # bare URL
+    r'|^[ \t]*\|?[ \t]*:?-{3,}:?[ \t]*(?:\|[ \t]*:?-{3,}:?[ \t]*)+\|?[ \t]*$',
+    re.MULTILINE,
+)
+LETTER = re.compile(r'[^\W\d_]')
+# Indentation of the next paragraph is kept with the blank lines, so that
+# it survives stripping of chunks
+PARAGRAPH_BOUNDARY = re.compile(r'\n\s*\n[ \t]*')
+
+
+@dataclass
+class Segment:
+    """A part of Markdown document.
+
+    Verbatim parts are kept as they are. In translatable parts inline code,
+    links targets, URLs and HTML tags are replaced with numbered
+    placeholders, original values are stored in `placeholders`.
+    """
+
+    text: str
+    is_translatable: bool
+    placeholders: list[str] = field(default_factory=list)
+
+
+@dataclass
+class TranslationChunk:
+    text: str
+    separator: str
+    placeholders: list[str]
+
+
+def _is_closing_fence(line: str, fence: str) -> bool:
+    stripped = line.strip()
+    return (
+        len(line) - len(line.lstrip(' ')) <= 3
+        and stripped.startswith(fence)
+        and set(stripped) == {fence[0]}
+    )
+
+
+def _split_into_blocks(text: str) -> list[tuple[str, bool]]:
+    """Splits Markdown into (block, is translatable) pairs by lines.
+
+    Fenced code, HTML blocks and link reference definitions are verbatim.
+    """
+    lines = text.splitlines(keepends=True)
+    blocks = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        is_block_start = i == 0 or not lines[i - 1].strip()
+        if fence_match := FENCE_OPENING.match(line):
+            end = i + 1
+            while end < len(lines) and not _is_closing_fence(
+                lines[end], fence_match.group(1)
+            ):
+                end += 1
+            end = min(end + 1, len(lines))
+        elif is_block_start and HTML_BLOCK_OPENING.match(line):
+            end = i + 1
+            while end < len(lines) and lines[end].strip():
+                end += 1
+        elif REFERENCE_DEFINITION.match(line):
+            end = i + 1
+        else:
+            blocks.append((line, True))
+            i += 1
+            continue
+        blocks.append((''.join(lines[i:end]), False))
+        i = end
+
+    merged = []
+    for block, is_translatable in blocks:
+        if merged and merged[-1][1] == is_translatable:
+            merged[-1] = (merged[-1][0] + block, is_translatable)
+        else:
+            merged.append((block, is_translatable))
+    return merged
+
+
+def split_markdown(text: str) -> list[Segment]:
+    """Splits Markdown document into verbatim and translatable segments.
+
+    Joining texts of the segments gives the original document. Whitespace
+    around translatable segments is put into separate verbatim segments.
+    """
+    segments = []
+    for block, is_translatable in _split_into_blocks(text):
+        if not is_translatable or not block.strip():
+            segments.append(Segment(text=block, is_translatable=False))
+            continue
+        leading = block[: len(block) - len(block.lstrip())]
+        if leading:
+            segments.append(Segment(text=leading, is_translatable=False))
+
+        placeholders = []
+
+        def replace(match: re.Match) -> str:
+            placeholders.append(match.group(0))
+            return PLACEHOLDER_TEMPLATE.format(len(placeholders) - 1)
+
+        segments.append(
+            Segment(
+                text=INLINE_VERBATIM.sub(replace, block.lstrip()),
+                is_translatable=True,
+                placeholders=placeholders,
+            )
+        )
+    return segments
+
+
+def split_paragraphs(text: str) -> list[str]:
+    """Splits text at blank lines. Every paragraph keeps the whitespace
+    following it, so joining them gives the original text."""
+    paragraphs = []
+    start = 0
+    for match in PARAGRAPH_BOUNDARY.finditer(text):
+        if match.end() < len(text):
+            paragraphs.append(text[start : match.end()])
+            start = match.end()
+    paragraphs.append(text[start:])
+    return paragraphs
+
+
+def has_translatable_text(text: str) -> bool:
+    return LETTER.search(PLACEHOLDER_PATTERN.sub('', text)) is not None
+
+
+def renumber_placeholders(
+    text: str, placeholders: list[str]
+) -> tuple[str, list[str]]:
+    """Renumbers placeholders of a part of segment from zero.
+
+    Returns:
+        tuple[str, list[str]]: The text and values of its own placeholders
+    """
+    own_placeholders = []
+
+    def replace(match: re.Match) -> str:
+        own_placeholders.append(placeholders[int(match.group(1))])
+        return PLACEHOLDER_TEMPLATE.format(len(own_placeholders) - 1)
+
+    return PLACEHOLDER_PATTERN.sub(replace, text), own_placeholders
+
+
+def fill_placeholders(text: str, placeholders: list[str]) -> str:
+    return PLACEHOLDER_PATTERN.sub(
+        lambda match: (
+            placeholders[int(match.group(1))]
+            if int(match.group(1)) < len(placeholders)
+            else match.group(0)
+        ),
+        text,
+    )
+
+
+def get_lost_placeholders(text: str, placeholders: list[str]) -> list[str]:
+    found = {int(index) for index in PLACEHOLDER_PATTERN.findall(text)}
+    lost = [
+        value for index, value in enumerate(placeholders) if index not in found
+    ]
+    if lost:
+        logger.warning('%s placeholders were lost in translation', len(lost))
+    return lost
+
+
+def restore_placeholders(text: str, placeholders: list[str]) -> str:
+    """Puts original values back in place of placeholders.
+
+    Values whose placeholders were lost by the model are appended to the
+    end of the text, so no link or code is dropped silently.
+    """
+    if not placeholders:
+        return text
+    lost = get_lost_placeholders(text, placeholders)
+    return ' '.join([fill_placeholders(text, placeholders), *lost])
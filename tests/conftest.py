@@ -0,0 +1,90 @@
+from typing import Iterator
+
+import fakeredis
+import pytest
+import tiktoken
+
+import src.util.brokers.consumer.rabbitmq
+import src.util.notifications.classes
+import src.util.translator.abstract
+import src.util.translator.helpers
+from src.database.models import AIModel
+from src.util.circuit_breaker.classes import circuit_breaker
+from src.util.hedging.classes import hedge_budget
+from src.util.rate_limiter.classes import rate_limiter
+from src.util.storage.classes import RedisHandler
+from src.util.token_ratios.classes import token_ratio_table
+from src.util.translation_cache.classes import translation_cache
+
+from tests.translators import EchoTranslator
+
+
+@pytest.fixture(scope='session')
+def byte_encoding() -> tiktoken.Encoding:
+    """Encoding with a token per byte of every word, it does not need BPE
+    files downloaded by tiktoken."""
+    return tiktoken.Encoding(
+        name='bytes',
+        pat_str=r'\s+|\S+',
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+
+
+@pytest.fixture
+def offline_encoding(
+    monkeypatch: pytest.MonkeyPatch, byte_encoding: tiktoken.Encoding
+) -> tiktoken.Encoding:
+    """Makes the translator use `byte_encoding` for every model."""
+
+    def get_encoding(model_name: str) -> tiktoken.Encoding:
+        return byte_encoding
+
+    monkeypatch.setattr(
+        src.util.translator.helpers, 'get_encoding', get_encoding
+    )
+    monkeypatch.setattr(
+        src.util.translator.abstract, 'get_encoding', get_encoding
+    )
+    return byte_encoding
+
+
+@pytest.fixture
+def model() -> AIModel:
+    return AIModel(id=1, show_name='Test', name='test', provider='test')
+
+
+@pytest.fixture
+def translator() -> EchoTranslator:
+    return EchoTranslator()
+
+
+@pytest.fixture
+def redis_client(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[fakeredis.FakeAsyncRedis]:
+    """In-memory Redis used by every `RedisHandler` created in the test."""
+    client = fakeredis.FakeAsyncRedis()
+
+    def init(handler: RedisHandler):
+        handler.client = client
+
+    monkeypatch.setattr(RedisHandler, '__init__', init)
+    for singleton in (
+        circuit_breaker,
+        hedge_budget,
+        token_ratio_table,
+        translation_cache,
+    ):
+        monkeypatch.setattr(singleton, '_redis_handler', None)
+    monkeypatch.setattr(rate_limiter, '_script', None)
+    redis_handler_getters = (
+        src.util.brokers.consumer.rabbitmq._get_redis_handler,
+        src.util.notifications.classes._get_redis_handler,
+        src.util.translator.helpers._get_redis_handler,
+    )
+    for get_redis_handler in redis_handler_getters:
+        get_redis_handler.cache_clear()
+    yield client
+    for get_redis_handler in redis_handler_getters:
+        get_redis_handler.cache_clear()
@@ -0,0 +1,39 @@
+from sqlalchemy.dialects import postgresql
+
+
+class EmptyResult:
+    def tuples(self) -> 'EmptyResult':
+        return self
+
+    def all(self) -> list:
+        return []
+
+    def one_or_none(self) -> None:
+        return None
+
+    def scalar_one_or_none(self) -> None:
+        return None
+
+
+class RecordingSession:
+    """Stands in for `AsyncSession` of repos, records their statements
+    instead of executing them."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement) -> EmptyResult:
+        self.statements.append(statement)
+        return EmptyResult()
+
+    def compile(self) -> list[str]:
+        """Statements as PostgreSQL would get them, with parameters."""
+        return [
+            str(
+                statement.compile(
+                    dialect=postgresql.dialect(),
+                    compile_kwargs={'literal_binds': True},
+                )
+            )
+            for statement in self.statements
+        ]
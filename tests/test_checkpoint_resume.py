@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from src.database.models import Language, StylePrompt
+from src.settings import text_translation_config, translation_cache_config
+from src.util.checkpoints.classes import TranslationCheckpoint
+from src.util.translator.exceptions import TranslatorAPIError
+
+from tests.translators import EchoTranslator
+
+language = Language(id=1, name='English', iso_code='en')
+prompt = StylePrompt(id=1, title='Plain', text='Translate to {target_lang}')
+text = '\n\n'.join(f'Paragraph number {i}.' for i in range(20))
+
+
+class FailingTranslator(EchoTranslator):
+    """Fails on the first paragraph, other chunks take a while."""
+
+    async def _process_chunk(self, model, prompt, chunk):
+        self.requests.append(chunk)
+        if chunk.startswith('Paragraph number 0.'):
+            raise TranslatorAPIError('provider is down')
+        await asyncio.sleep(0.01)
+        return chunk.upper(), len(chunk)
+
+
+class MemoryCheckpoint(TranslationCheckpoint):
+    """Keeps chunks in memory instead of the database."""
+
+    async def load(self) -> None:
+        pass
+
+    async def flush(self) -> None:
+        self.saved.update(self.pending)
+        self.pending = {}
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch, offline_encoding, redis_client):
+    # Every paragraph becomes a chunk of its own
+    monkeypatch.setattr(text_translation_config, 'max_tokens_in_chunk', 25)
+    monkeypatch.setattr(translation_cache_config, 'is_enabled', False)
+
+
+async def translate(translator, model, checkpoint=None) -> str:
+    (result,) = await translator.translate_many(
+        texts=[text],
+        source_language=None,
+        target_language=language,
+        model=model,
+        prompt_object=prompt,
+        checkpoint=checkpoint,
+    )
+    return result
+
+
+@pytest.mark.asyncio
+async def test_without_checkpoint_fails_fast(model):
+    translator = FailingTranslator()
+
+    with pytest.raises(TranslatorAPIError):
+        await translate(translator, model)
+    await asyncio.sleep(0.05)
+
+    # Only chunks started before the failure were sent
+    assert len(translator.requests) < 20
+
+
+@pytest.mark.asyncio
+async def test_with_checkpoint_other_chunks_are_saved(model):
+    translator = FailingTranslator()
+    checkpoint = MemoryCheckpoint(task_id=None)
+
+    with pytest.raises(TranslatorAPIError):
+        await translate(translator, model, checkpoint)
+
+    assert len(translator.requests) == 20
+    assert len(checkpoint.saved) == 19
+
+
+@pytest.mark.asyncio
+async def test_resumed_task_sends_only_missing_chunks(model):
+    checkpoint = MemoryCheckpoint(task_id=None)
+    with pytest.raises(TranslatorAPIError):
+        await translate(FailingTranslator(), model, checkpoint)
+    translator = EchoTranslator()
+
+    translation, tokens = await translate(translator, model, checkpoint)
+
+    assert translator.requests == ['Paragraph number 0.']
+    assert translation == text.upper()
+    # Chunks from the checkpoint have not been paid for yet
+    assert tokens == len(text.replace('\n\n', ''))
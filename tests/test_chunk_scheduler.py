@@ -0,0 +1,125 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from src.util.scheduler.classes import ChunkScheduler
+
+
+def make_chunk(started: list, name: str, gate: asyncio.Event | None = None):
+    async def func():
+        started.append(name)
+        if gate is not None:
+            await gate.wait()
+        else:
+            await asyncio.sleep(0)
+        return name
+
+    return func
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_interleaved():
+    scheduler = ChunkScheduler(global_limit=1, model_limit=1)
+    started = []
+    gate = asyncio.Event()
+    # Holds the only slot until every chunk is queued
+    blocker = asyncio.create_task(
+        scheduler.submit('blocker', 'm', make_chunk(started, 'x', gate))
+    )
+    await asyncio.sleep(0)
+    big_job = [
+        asyncio.create_task(
+            scheduler.submit('big', 'm', make_chunk(started, f'big{i}'))
+        )
+        for i in range(4)
+    ]
+    small_job = [
+        asyncio.create_task(
+            scheduler.submit('small', 'm', make_chunk(started, f'small{i}'))
+        )
+        for i in range(2)
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(blocker, *big_job, *small_job)
+
+    assert started == [
+        'x',
+        'big0',
+        'small0',
+        'big1',
+        'small1',
+        'big2',
+        'big3',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_limits_are_respected():
+    scheduler = ChunkScheduler(global_limit=3, model_limit=2)
+    running = {'a': 0, 'b': 0}
+    max_running = {'a': 0, 'b': 0}
+    max_total = 0
+
+    def make_counted(model_key: str):
+        async def func():
+            nonlocal max_total
+            running[model_key] += 1
+            max_running[model_key] = max(
+                max_running[model_key], running[model_key]
+            )
+            max_total = max(max_total, sum(running.values()))
+            await asyncio.sleep(0.001)
+            running[model_key] -= 1
+
+        return func
+
+    await asyncio.gather(
+        *(
+            scheduler.submit(job_id, model_key, make_counted(model_key))
+            for job_id in range(5)
+            for model_key in ('a', 'b')
+        )
+    )
+
+    assert max_running == {'a': 2, 'b': 2}
+    assert max_total == 3
+    stats = scheduler.get_stats()
+    assert stats['running'] == 0
+    assert stats['queued'] == 0
+    assert stats['models']['a']['chunks'] == 5
+
+
+@pytest.mark.asyncio
+async def test_failure_is_raised_to_submitter():
+    scheduler = ChunkScheduler(global_limit=1, model_limit=1)
+
+    async def fail():
+        raise ValueError('provider is down')
+
+    with pytest.raises(ValueError):
+        await scheduler.submit('job', 'm', fail)
+    # The slot is released
+    assert await scheduler.submit('job', 'm', make_chunk([], 'ok')) == 'ok'
+    assert scheduler.get_stats()['models']['m']['failed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_chunks_run_in_context_of_their_job():
+    scheduler = ChunkScheduler(global_limit=1, model_limit=1)
+    job_var = contextvars.ContextVar('job_var')
+    seen = []
+
+    async def func():
+        await asyncio.sleep(0)
+        seen.append(job_var.get())
+
+    async def run_job(name: str):
+        job_var.set(name)
+        await scheduler.submit(name, 'm', func)
+
+    # The second chunk is started when the first one finishes
+    await asyncio.gather(run_job('first'), run_job('second'))
+
+    assert seen == ['first', 'second']
@@ -0,0 +1,158 @@
+import types
+
+import fakeredis
+import pytest
+
+import src.util.circuit_breaker.classes
+from src.database.models import AIModel, Language, StylePrompt
+from src.settings import circuit_breaker_config, translation_cache_config
+from src.util.circuit_breaker.classes import CircuitState, circuit_breaker
+from src.util.storage.classes import RedisHandler
+from src.util.translator.exceptions import TranslatorAPIError
+
+from tests.translators import EchoTranslator
+
+model_key = 'test:test'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        src.util.circuit_breaker.classes,
+        'time',
+        types.SimpleNamespace(time=lambda: clock.now),
+    )
+    return clock
+
+
+async def open_circuit(key: str = model_key) -> None:
+    for _ in range(circuit_breaker_config.failure_threshold):
+        await circuit_breaker.record_failure(key, 'error')
+
+
+async def get_state(key: str = model_key) -> str:
+    return (await circuit_breaker.get_stats())[key]['state']
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_threshold(redis_client):
+    for _ in range(circuit_breaker_config.failure_threshold - 1):
+        await circuit_breaker.record_failure(model_key, 'error')
+    assert await circuit_breaker.is_available(model_key)
+
+    await circuit_breaker.record_failure(model_key, 'last error')
+
+    assert not await circuit_breaker.is_available(model_key)
+    stats = (await circuit_breaker.get_stats())[model_key]
+    assert stats['state'] == CircuitState.open
+    assert stats['trips'] == 1
+    assert stats['last_error'] == 'last error'
+
+
+@pytest.mark.asyncio
+async def test_single_probe_is_let_through(redis_client, clock):
+    await open_circuit()
+    clock.now += circuit_breaker_config.open_sec
+
+    assert await circuit_breaker.is_available(model_key)
+    assert await get_state() == CircuitState.half_open
+    assert not await circuit_breaker.is_available(model_key)
+
+
+@pytest.mark.asyncio
+async def test_successful_probe_closes_circuit(redis_client, clock):
+    await open_circuit()
+    clock.now += circuit_breaker_config.open_sec
+    await circuit_breaker.is_available(model_key)
+
+    await circuit_breaker.record_success(model_key)
+
+    assert await get_state() == CircuitState.closed
+    assert await circuit_breaker.is_available(model_key)
+    # Failures before the circuit was opened are forgotten
+    await circuit_breaker.record_failure(model_key, 'error')
+    assert await circuit_breaker.is_available(model_key)
+
+
+@pytest.mark.asyncio
+async def test_failed_probe_opens_circuit_again(redis_client, clock):
+    await open_circuit()
+    clock.now += circuit_breaker_config.open_sec
+    await circuit_breaker.is_available(model_key)
+
+    await circuit_breaker.record_failure(model_key, 'probe error')
+
+    stats = (await circuit_breaker.get_stats())[model_key]
+    assert stats['state'] == CircuitState.open
+    assert stats['trips'] == 2
+    assert stats['opened_at'] == clock.now
+    assert not await circuit_breaker.is_available(model_key)
+
+
+@pytest.mark.asyncio
+async def test_unavailable_redis_means_healthy(monkeypatch):
+    server = fakeredis.FakeServer()
+    server.connected = False
+
+    def init(handler: RedisHandler):
+        handler.client = fakeredis.FakeAsyncRedis(server=server)
+
+    monkeypatch.setattr(RedisHandler, '__init__', init)
+    monkeypatch.setattr(circuit_breaker, '_redis_handler', None)
+
+    await open_circuit()
+    await circuit_breaker.record_success(model_key)
+
+    assert await circuit_breaker.is_available(model_key)
+
+
+class BrokenProviderTranslator(EchoTranslator):
+    """Requests to the provider named `broken` fail."""
+
+    async def _process_chunk(self, model, prompt, chunk):
+        self.requests.append(f'{model.provider}: {chunk}')
+        if model.provider == 'broken':
+            raise TranslatorAPIError('provider is down')
+        return chunk.upper(), len(chunk)
+
+
+async def translate(translator, texts: list[str]) -> list[str]:
+    broken = AIModel(id=1, show_name='A', name='test', provider='broken')
+    healthy = AIModel(id=2, show_name='B', name='test', provider='healthy')
+    results = await translator.translate_many(
+        texts=texts,
+        source_language=None,
+        target_language=Language(id=1, name='English', iso_code='en'),
+        model=broken,
+        prompt_object=StylePrompt(id=1, title='Plain', text='{target_lang}'),
+        fallback_models=[healthy],
+    )
+    return [text for text, _ in results]
+
+
+@pytest.mark.asyncio
+async def test_chunks_fail_over_to_healthy_provider(
+    monkeypatch, offline_encoding, redis_client
+):
+    monkeypatch.setattr(translation_cache_config, 'is_enabled', False)
+    translator = BrokenProviderTranslator()
+    texts = [
+        f'Text number {i}.'
+        for i in range(circuit_breaker_config.failure_threshold)
+    ]
+
+    assert await translate(translator, texts) == [t.upper() for t in texts]
+    assert sorted(translator.requests) == sorted(
+        f'{provider}: {text}'
+        for text in texts
+        for provider in ('broken', 'healthy')
+    )
+    assert await get_state('test:broken') == CircuitState.open
+
+    translator.requests.clear()
+    assert await translate(translator, ['Another text.']) == [
+        'ANOTHER TEXT.'
+    ]
+    # The broken provider is skipped while its circuit is open
+    assert translator.requests == ['healthy: Another text.']
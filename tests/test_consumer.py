@@ -0,0 +1,108 @@
+import asyncio
+import contextlib
+import json
+import uuid
+
+import pytest
+
+import src.util.brokers.consumer.rabbitmq
+from src.settings import consumer_config
+from src.util.brokers.consumer.rabbitmq import (
+    AbstractAsyncConsumer,
+    TranslationConsumer,
+)
+
+from tests.sessions import RecordingSession
+
+
+class FakeMessage:
+    def __init__(self, body: bytes, message_id: str | None = None):
+        self.body = body
+        self.message_id = message_id
+        self.rejected = False
+
+        self.acked = False
+
+    async def reject(self, requeue: bool = False) -> None:
+        assert not requeue
+        self.rejected = True
+
+    @contextlib.asynccontextmanager
+    async def process(self, requeue: bool = False):
+        yield
+        self.acked = True
+
+
+class RecordingConsumer(AbstractAsyncConsumer):
+    def __init__(self):
+        self.handled = []
+
+    async def _on_message(self, message):
+        self.handled.append(message)
+
+
+async def deliver(consumer, *messages) -> None:
+    queue = asyncio.Queue()
+    for message in messages:
+        queue.put_nowait(message)
+    worker = asyncio.create_task(consumer._worker(queue))
+    await queue.join()
+    worker.cancel()
+
+
+@pytest.mark.asyncio
+async def test_redelivered_message_is_handled(monkeypatch, redis_client):
+    monkeypatch.setattr(consumer_config, 'max_deliveries', 2)
+    consumer = RecordingConsumer()
+    message_id = str(uuid.uuid4())
+    # E.g. returned to the queue by a shutdown
+    first = FakeMessage(b'{}', message_id)
+    second = FakeMessage(b'{}', message_id)
+
+    await deliver(consumer, first, second)
+
+    assert consumer.handled == [first, second]
+
+
+@pytest.mark.asyncio
+async def test_message_over_max_deliveries_is_rejected(
+    monkeypatch, redis_client
+):
+    monkeypatch.setattr(consumer_config, 'max_deliveries', 2)
+    consumer = RecordingConsumer()
+    messages = [FakeMessage(b'{"task_id": 1}') for _ in range(3)]
+    other = FakeMessage(b'{"task_id": 1}', str(uuid.uuid4()))
+
+    await deliver(consumer, *messages, other)
+
+    assert consumer.handled == [*messages[:2], other]
+    assert messages[2].rejected
+
+
+@pytest.mark.asyncio
+async def test_task_that_cannot_be_started_is_skipped(monkeypatch):
+    db_session = RecordingSession()
+
+    @contextlib.asynccontextmanager
+    async def get_session(concurrency_class):
+        yield db_session
+
+    async def translate_many(**kwargs):
+        raise AssertionError('Finished task is translated again')
+
+    monkeypatch.setattr(
+        src.util.brokers.consumer.rabbitmq, 'get_session', get_session
+    )
+    consumer = TranslationConsumer()
+    monkeypatch.setattr(consumer.translator, 'translate_many', translate_many)
+    message = FakeMessage(
+        json.dumps({'task_id': str(uuid.uuid4())}).encode(), 'message'
+    )
+
+    # E.g. the task is completed, but the message was not acknowledged
+    await consumer._handle_translation(message)
+
+    assert message.acked
+    # Nothing but the attempt to start the task
+    (statement,) = db_session.statements
+    assert str(statement).startswith('UPDATE translation_tasks')
@@ -0,0 +1,88 @@
+import pytest
+
+from src.database.models import Language, StylePrompt
+from src.settings import translation_cache_config
+from src.util.translator.abstract import DeduplicationStats
+
+language = Language(id=1, name='English', iso_code='en')
+prompt = StylePrompt(id=1, title='Plain', text='Translate to {target_lang}')
+disclaimer = 'This paragraph is repeated in every part of the article.'
+title = disclaimer
+text = '\n\n'.join(
+    [
+        'The first paragraph is unique.',
+        disclaimer,
+        'Short one.',
+        f'  {disclaimer.replace(" ", "  ")}',
+        'Run `first` to see the repeated example output.',
+        'Run `second` to see the repeated example output.',
+        'Short one.',
+    ]
+)
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch, offline_encoding, redis_client):
+    monkeypatch.setattr(translation_cache_config, 'is_enabled', False)
+
+
+async def translate(translator, model, stats=None) -> list[tuple[str, int]]:
+    return await translator.translate_many(
+        texts=[title, text],
+        source_language=None,
+        target_language=language,
+        model=model,
+        prompt_object=prompt,
+        deduplication_stats=stats,
+    )
+
+
+def test_repeated_paragraphs_are_found(translator):
+    repeated = translator.find_repeated_paragraphs([title, text])
+
+    # Placeholder values and whitespace do not matter, short paragraphs are
+    # not worth it
+    assert len(repeated) == 2
+    assert not any('short' in key for key in repeated)
+
+
+@pytest.mark.asyncio
+async def test_repeated_chunks_are_translated_once(translator, model):
+    stats = DeduplicationStats()
+
+    (
+        (translated_title, title_tokens),
+        (translated_text, text_tokens),
+    ) = await translate(translator, model, stats)
+
+    assert len(translator.requests) == len(set(translator.requests))
+    assert translator.requests.count(disclaimer) == 1
+    assert translated_title == disclaimer.upper()
+    assert translated_text == (
+        '\n\n'.join(
+            [
+                'THE FIRST PARAGRAPH IS UNIQUE.',
+                disclaimer.upper(),
+                'SHORT ONE.',
+                f'  {disclaimer.upper()}',
+                'RUN `first` TO SEE THE REPEATED EXAMPLE OUTPUT.',
+                'RUN `second` TO SEE THE REPEATED EXAMPLE OUTPUT.',
+                'SHORT ONE.',
+            ]
+        )
+    )
+    # Short paragraphs between repeated ones are chunks of their own, and
+    # identical chunks are translated once too
+    assert stats.chunks == 8
+    assert stats.unique_chunks == len(translator.requests) == 4
+    assert stats.cached_chunks == 0
+    # Tokens are billed at the first copy only
+    assert title_tokens == len(disclaimer)
+    assert text_tokens + title_tokens == sum(
+        len(request) for request in translator.requests
+    )
+    assert stats.saved_tokens == (
+        2 * len(disclaimer)
+        + len('Run ⟦0⟧ to see the repeated example output.')
+        + len('Short one.')
+    )
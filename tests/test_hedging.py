@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import src.util.translator.classes
+from src.database.models import AIModel
+from src.settings import circuit_breaker_config
+from src.util.hedging.classes import LatencyTracker
+from src.util.http.classes import SharedHTTPClient
+from src.util.rate_limiter.classes import rate_limiter
+from src.util.translator.classes import Gpt4freeTranslator
+
+response_delay_sec = 0.05
+rate_limit_wait_sec = 0.3
+
+
+@pytest.fixture
+def latency_tracker(monkeypatch) -> LatencyTracker:
+    tracker = LatencyTracker()
+    monkeypatch.setattr(
+        src.util.translator.classes, 'latency_tracker', tracker
+    )
+    return tracker
+
+
+@pytest.fixture
+def provider(monkeypatch) -> list[httpx.Request]:
+    """Fails the first request, answers the next one after a delay."""
+    requests = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(500)
+        await asyncio.sleep(response_delay_sec)
+        return httpx.Response(
+            200,
+            json={
+                'choices': [{'message': {'content': 'Перевод'}}],
+                'usage': {'total_tokens': 10},
+            },
+        )
+
+    async def acquire(provider: str, tokens: int) -> bool:
+        await asyncio.sleep(rate_limit_wait_sec)
+        return True
+
+    async def record_usage(provider: str, estimated: int, used: int):
+        pass
+
+    monkeypatch.setattr(
+        SharedHTTPClient,
+        '_client',
+        httpx.AsyncClient(transport=httpx.MockTransport(handle)),
+    )
+    monkeypatch.setattr(rate_limiter, 'acquire', acquire)
+    monkeypatch.setattr(rate_limiter, 'record_usage', record_usage)
+    monkeypatch.setattr(circuit_breaker_config, 'retry_max_wait_sec', 0.1)
+    return requests
+
+
+@pytest.mark.asyncio
+async def test_latency_excludes_rate_limit_and_retries(
+    provider, latency_tracker, offline_encoding, redis_client, model
+):
+    result = await Gpt4freeTranslator()._process_chunk_with_failover(
+        models=[model], prompt='Translate', chunk='Text'
+    )
+
+    assert result == ('Перевод', 10)
+    assert len(provider) == 2
+    (latency,) = latency_tracker._latencies['test:test']
+    assert response_delay_sec <= latency < rate_limit_wait_sec
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'broken_response',
+    [
+        httpx.RemoteProtocolError('Server disconnected'),
+        httpx.Response(200, text='<html>Bad gateway</html>'),
+        httpx.Response(200, json={'error': 'No choices'}),
+    ],
+)
+async def test_unexpected_errors_fail_over(
+    monkeypatch,
+    provider,
+    latency_tracker,
+    offline_encoding,
+    redis_client,
+    broken_response,
+):
+    broken = AIModel(id=1, show_name='A', name='test', provider='broken')
+    healthy = AIModel(id=2, show_name='B', name='test', provider='test')
+    handle = SharedHTTPClient._client._transport.handler
+
+    async def handle_broken(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content)['provider'] != 'broken':
+            return await handle(request)
+        if isinstance(broken_response, Exception):
+            raise broken_response
+        return broken_response
+
+    monkeypatch.setattr(
+        SharedHTTPClient,
+        '_client',
+        httpx.AsyncClient(transport=httpx.MockTransport(handle_broken)),
+    )
+
+    result = await Gpt4freeTranslator()._process_chunk_with_failover(
+        models=[broken, healthy], prompt='Translate', chunk='Text'
+    )
+
+    assert result == ('Перевод', 10)
+    # Counted towards the broken provider's circuit
+    assert await redis_client.get(
+        circuit_breaker_config.redis_failures_key_template.format(
+            'test:broken'
+        )
+    ) == b'1'
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from src.settings import http_client_config
+from src.util.http.classes import CountingTransport, SharedHTTPClient
+
+
+class Body(httpx.AsyncByteStream):
+    """Unread body, like responses of a real transport."""
+
+    async def __aiter__(self):
+        yield b'ok'
+
+
+@pytest_asyncio.fixture
+async def shared_client(monkeypatch):
+    """Shared client whose requests are answered by `handle`."""
+    gate = asyncio.Event()
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await gate.wait()
+        return httpx.Response(200, stream=Body())
+
+    transport = CountingTransport(httpx.MockTransport(handle))
+    monkeypatch.setattr(SharedHTTPClient, '_transport', transport)
+    monkeypatch.setattr(
+        SharedHTTPClient,
+        '_client',
+        httpx.AsyncClient(transport=transport),
+    )
+    monkeypatch.setattr(http_client_config, 'max_connections', 2)
+    monkeypatch.setattr(http_client_config, 'http2', False)
+    yield gate
+    await SharedHTTPClient._client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_requests_in_flight_are_counted(shared_client):
+    client = SharedHTTPClient.get_client()
+    requests = [
+        asyncio.create_task(client.get('http://test/')) for _ in range(3)
+    ]
+    await asyncio.sleep(0.01)
+
+    stats = SharedHTTPClient.get_stats()
+    assert stats['in_flight_requests'] == 3
+    assert stats['pending_requests'] == 1
+    assert stats['utilisation'] == 1.0
+    # The mock transport has no pool
+    assert stats['connections'] is None
+
+    shared_client.set()
+    await asyncio.gather(*requests)
+    assert SharedHTTPClient.get_stats()['in_flight_requests'] == 0
+
+
+@pytest.mark.asyncio
+async def test_streamed_response_is_counted_until_closed(shared_client):
+    shared_client.set()
+    client = SharedHTTPClient.get_client()
+
+    async with client.stream('GET', 'http://test/'):
+        # The body is not read yet
+        assert SharedHTTPClient.get_stats()['in_flight_requests'] == 1
+
+    assert SharedHTTPClient.get_stats()['in_flight_requests'] == 0
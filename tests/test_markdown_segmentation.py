@@ -0,0 +1,163 @@
+import pytest
+
+from src.database.models import Language, StylePrompt
+from src.settings import text_translation_config, translation_cache_config
+from src.util.translator.helpers import split_text_by_tokens
+from src.util.translator.segmentation import (
+    PLACEHOLDER_TEMPLATE,
+    TranslationChunk,
+    fill_placeholders,
+    renumber_placeholders,
+    restore_placeholders,
+    split_markdown,
+    split_paragraphs,
+)
+
+document = '''# Title with `code`
+
+Paragraph with a [link](https://example.com/page) and https://bare.url/x.
+Second line of the paragraph.
+
+```python
+def translate():
+    return 'not translated'
+```
+
+- item one
+    - nested item with <b>tag</b>
+- item two
+
+| Column | Other |
+| ------ | ----- |
+| cell   | ![image](img.png) |
+
+<div>
+raw html block
+</div>
+
+[reference]: https://example.com/reference
+'''
+
+
+def join_segments(segments) -> str:
+    return ''.join(
+        fill_placeholders(segment.text, segment.placeholders)
+        if segment.is_translatable
+        else segment.text
+        for segment in segments
+    )
+
+
+def test_segments_restore_document():
+    assert join_segments(split_markdown(document)) == document
+
+
+def test_code_html_and_links_are_verbatim():
+    segments = split_markdown(document)
+    translatable = ' '.join(s.text for s in segments if s.is_translatable)
+    placeholders = [p for s in segments for p in s.placeholders]
+
+    assert 'not translated' not in translatable
+    assert 'raw html block' not in translatable
+    assert 'https://example.com/reference' not in translatable
+    assert '[link' in translatable
+    assert placeholders[:3] == [
+        '`code`',
+        '](https://example.com/page)',
+        'https://bare.url/x',
+    ]
+    assert '<b>' in placeholders
+    assert '![image](img.png)' in placeholders
+
+
+def test_unclosed_fence_runs_to_the_end():
+    text = 'Text\n\n```\ncode without end'
+
+    segments = split_markdown(text)
+
+    assert segments[-1].text == '```\ncode without end'
+    assert not segments[-1].is_translatable
+    assert join_segments(segments) == text
+
+
+def test_paragraphs_restore_text():
+    text = 'One\n\n  Two\n\n\nThree\n'
+
+    paragraphs = split_paragraphs(text)
+
+    assert ''.join(paragraphs) == text
+    assert len(paragraphs) == 3
+
+
+def test_placeholders_are_renumbered_from_zero():
+    placeholders = ['`a`', '`b`', '`c`']
+    text = f'x {PLACEHOLDER_TEMPLATE.format(2)} y'
+
+    renumbered, own = renumber_placeholders(text, placeholders)
+
+    assert renumbered == f'x {PLACEHOLDER_TEMPLATE.format(0)} y'
+    assert own == ['`c`']
+
+
+def test_lost_placeholders_are_appended():
+    placeholders = ['`a`', '`b`']
+    translation = f'X {PLACEHOLDER_TEMPLATE.format(1)}'
+
+    assert restore_placeholders(translation, placeholders) == 'X `b` `a`'
+
+
+@pytest.mark.parametrize('max_tokens', [1, 4, 8])
+def test_placeholders_are_not_cut(max_tokens, byte_encoding):
+    text = 'word⟦12⟧word⟦3⟧'
+
+    chunks = split_text_by_tokens(text, max_tokens, byte_encoding)
+
+    assert {'⟦12⟧', '⟦3⟧'} <= {chunk for _, chunk, _ in chunks}
+
+
+@pytest.mark.parametrize('max_tokens_in_chunk', [8, 30, 10000])
+def test_document_is_reassembled(
+    max_tokens_in_chunk, monkeypatch, offline_encoding, translator, model
+):
+    monkeypatch.setattr(
+        text_translation_config, 'max_tokens_in_chunk', max_tokens_in_chunk
+    )
+
+    parts = translator.split_document(
+        text=document, model=model, prompt='Translate'
+    )
+    reassembled = ''.join(
+        restore_placeholders(part.text, part.placeholders) + part.separator
+        if isinstance(part, TranslationChunk)
+        else part
+        for part in parts
+    )
+    chunks = ' '.join(
+        part.text for part in parts if isinstance(part, TranslationChunk)
+    )
+
+    assert reassembled == document
+    assert 'not translated' not in chunks
+    assert 'https://' not in chunks
+
+
+@pytest.mark.asyncio
+async def test_literal_markers_are_kept(
+    monkeypatch, offline_encoding, redis_client, translator, model
+):
+    monkeypatch.setattr(translation_cache_config, 'is_enabled', False)
+    repeated = 'Marker ⟦5⟧ is written in this repeated paragraph.'
+    text = f'Text with ⟦0⟧ and `code`.\n\n{repeated}\n\n{repeated}'
+
+    ((translation, _),) = await translator.translate_many(
+        texts=[text],
+        source_language=None,
+        target_language=Language(id=1, name='English', iso_code='en'),
+        model=model,
+        prompt_object=StylePrompt(id=1, title='Plain', text='{target_lang}'),
+    )
+
+    assert translation == (
+        f'TEXT WITH ⟦0⟧ AND `code`.\n\n{repeated.upper()}\n\n'
+        f'{repeated.upper()}'
+    )
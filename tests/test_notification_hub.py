@@ -0,0 +1,53 @@
+import asyncio
+import uuid
+
+import fakeredis
+import pytest
+
+from src.settings import notification_config
+from src.util.notifications.classes import NotificationHub
+from src.util.storage.classes import RedisHandler
+
+
+@pytest.mark.asyncio
+async def test_messages_are_fanned_out_to_user_sockets(redis_client):
+    hub = NotificationHub()
+    user_id, other_user_id = uuid.uuid4(), uuid.uuid4()
+    queue = hub.subscribe(user_id)
+    other_queue = hub.subscribe(other_user_id)
+    await asyncio.sleep(0.05)
+
+    await redis_client.publish(
+        notification_config.topic_name.format(user_id), 'hello'
+    )
+
+    assert await asyncio.wait_for(queue.get(), 1) == 'hello'
+    assert other_queue.empty()
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnects_reuse_one_pool(monkeypatch):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    handlers = []
+
+    def init(handler: RedisHandler):
+        handler.client = fakeredis.FakeAsyncRedis(server=server)
+        handlers.append(handler)
+
+    sleep = asyncio.sleep
+
+    async def no_wait(delay: float):
+        await sleep(0)
+
+    monkeypatch.setattr(RedisHandler, '__init__', init)
+    monkeypatch.setattr(asyncio, 'sleep', no_wait)
+    hub = NotificationHub()
+    hub.subscribe(uuid.uuid4())
+
+    for _ in range(20):
+        await sleep(0)
+    await hub.close()
+
+    assert len(handlers) == 1
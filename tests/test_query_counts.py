@@ -0,0 +1,161 @@
+import uuid
+
+import httpx
+import jwt
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select
+
+from src.database import count_statements, get_session
+from src.database.models import (
+    Article,
+    Report,
+    ReportReason,
+    User,
+)
+from src.settings import JWTConfig, Role
+
+user_agent = 'query counts'
+jwt_config = JWTConfig()
+
+# Most statements every endpoint may send for a user with ten articles,
+# each having a translation. Loading an article used to load its author
+# and then all articles of the author, so the counts grew with their number
+statement_limits = {
+    'articles list': 1,
+    'translations list': 1,
+    'article': 2,
+    'report': 8,
+    'reports list': 4,
+}
+
+
+def get_headers(user_id: uuid.UUID, role: Role) -> dict:
+    access_token = jwt.encode(
+        {
+            jwt_config.user_info_property: {
+                'id': str(user_id),
+                'user_agent': user_agent,
+                'role': role.value,
+            },
+            'exp': 2**32 - 1,
+        },
+        jwt_config.secret_key,
+        jwt_config.algorithm,
+    )
+    return {
+        'Cookie': f'access_token={access_token}',
+        'User-Agent': user_agent,
+    }
+
+
+async def create_data() -> tuple[uuid.UUID, uuid.UUID, uuid.UUID, int]:
+    """Creates a user with articles and translations, and a report on one of
+    the translations. Returns ids of the user, a source article, its
+    translation and the report reason."""
+    async with get_session() as session:
+        user = User(
+            name='Query counts',
+            email=f'{uuid.uuid4()}@query.counts',
+            password_hash='',
+        )
+        session.add(user)
+        await session.flush()
+        articles = [
+            Article(title=f'article {i}', text='text', user_id=user.id)
+            for i in range(10)
+        ]
+        session.add_all(articles)
+        await session.flush()
+        translations = [
+            Article(
+                title=f'translation {i}',
+                text='текст',
+                user_id=user.id,
+                original_article_id=article.id,
+            )
+            for i, article in enumerate(articles)
+        ]
+        session.add_all(translations)
+        max_position = await session.scalar(
+            select(func.max(ReportReason.order_position))
+        )
+        reason = ReportReason(
+            text=f'query counts {uuid.uuid4()}',
+            order_position=(max_position or 0) + 1,
+        )
+        session.add(reason)
+        await session.flush()
+        session.add(
+            Report(
+                text='report',
+                article_id=translations[0].id,
+                reason_id=reason.id,
+            )
+        )
+        return user.id, articles[0].id, translations[0].id, reason.id
+
+
+async def delete_data(user_id: uuid.UUID, reason_id: int):
+    async with get_session() as session:
+        await session.execute(delete(Article).filter_by(user_id=user_id))
+        await session.execute(delete(ReportReason).filter_by(id=reason_id))
+        await session.execute(delete(User).filter_by(id=user_id))
+
+
+@pytest_asyncio.fixture
+async def database():
+    """Skips the test when PostgreSQL is not reachable."""
+    try:
+        async with get_session() as session:
+            await session.execute(select(1))
+    except Exception as e:
+        pytest.skip(f'Database is unavailable: {e!r}')
+
+
+async def count_request_statements(
+    client: httpx.AsyncClient, url: str, headers: dict
+) -> int:
+    with count_statements() as statements:
+        response = await client.get(url, headers=headers)
+    response.raise_for_status()
+    return statements[0]
+
+
+@pytest.mark.asyncio
+async def test_query_counts(database):
+    # The application is imported only when it can be run
+    from src.main import app
+
+    user_id, article_id, translation_id, reason_id = await create_data()
+    user_headers = get_headers(user_id, Role.user)
+    moderator_headers = get_headers(user_id, Role.moderator)
+    requests = {
+        'articles list': ('/articles/', user_headers),
+        'translations list': (
+            f'/articles/?original_article_id={article_id}',
+            user_headers,
+        ),
+        'article': (f'/articles/{article_id}/', user_headers),
+        'report': (f'/articles/{translation_id}/report/', user_headers),
+        'reports list': (
+            f'/reports/?user_id={user_id}',
+            moderator_headers,
+        ),
+    }
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url='http://test'
+        ) as client:
+            counts = {
+                name: await count_request_statements(client, url, headers)
+                for name, (url, headers) in requests.items()
+            }
+    finally:
+        await delete_data(user_id, reason_id)
+
+    for name, count in counts.items():
+        assert count <= statement_limits[name], (
+            f'{name} sent {count} statements, '
+            f'expected at most {statement_limits[name]}'
+        )
@@ -0,0 +1,99 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.settings import rate_limiter_config
+from src.util.rate_limiter.classes import rate_limiter
+from src.util.storage.classes import RedisHandler
+
+
+@pytest.fixture
+def limits(monkeypatch, redis_client):
+    monkeypatch.setattr(rate_limiter_config, 'is_enabled', True)
+    monkeypatch.setattr(rate_limiter_config, 'default_requests_per_minute', 2)
+    monkeypatch.setattr(
+        rate_limiter_config, 'default_tokens_per_minute', 6000
+    )
+    monkeypatch.setattr(rate_limiter_config, 'max_wait_sec', 0.5)
+
+
+@pytest.mark.asyncio
+async def test_requests_over_limit_are_denied(limits):
+    assert await rate_limiter.acquire('provider', 10)
+    assert await rate_limiter.acquire('provider', 10)
+
+    # The next request is available in 30 seconds
+    assert not await rate_limiter.acquire('provider', 10)
+    assert await rate_limiter.acquire('other provider', 10)
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_tokens(limits):
+    loop = asyncio.get_running_loop()
+    assert await rate_limiter.acquire('provider', 6000)
+
+    started_at = loop.time()
+    # 100 tokens are refilled in a second
+    assert await rate_limiter.acquire('provider', 20)
+
+    assert loop.time() - started_at >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_unused_tokens_are_returned(limits):
+    assert await rate_limiter.acquire('provider', 6000)
+
+    await rate_limiter.record_usage('provider', 6000, 1000)
+
+    assert await rate_limiter.acquire('provider', 4900)
+
+
+@pytest.mark.asyncio
+async def test_overused_tokens_are_taken(limits):
+    assert await rate_limiter.acquire('provider', 1000)
+
+    await rate_limiter.record_usage('provider', 1000, 6000)
+
+    assert not await rate_limiter.acquire('provider', 100)
+
+
+def test_provider_limits_override_defaults(monkeypatch):
+    monkeypatch.setattr(
+        rate_limiter_config, 'provider_requests_per_minute', {'Slow': 5}
+    )
+    monkeypatch.setattr(
+        rate_limiter_config, 'provider_tokens_per_minute', {'Slow': 500}
+    )
+
+    assert rate_limiter.get_limits('Slow') == (5, 500)
+    assert rate_limiter.get_limits('Other') == (
+        rate_limiter_config.default_requests_per_minute,
+        rate_limiter_config.default_tokens_per_minute,
+    )
+
+
+@pytest.mark.asyncio
+async def test_disabled_limiter_does_not_use_redis(monkeypatch):
+    monkeypatch.setattr(rate_limiter_config, 'is_enabled', False)
+    monkeypatch.setattr(rate_limiter, '_script', None)
+
+    assert await rate_limiter.acquire('provider', 10**9)
+    await rate_limiter.record_usage('provider', 0, 10**9)
+
+    assert rate_limiter._script is None
+
+
+@pytest.mark.asyncio
+async def test_unavailable_redis_does_not_limit(monkeypatch):
+    server = fakeredis.FakeServer()
+    server.connected = False
+
+    def init(handler: RedisHandler):
+        handler.client = fakeredis.FakeAsyncRedis(server=server)
+
+    monkeypatch.setattr(RedisHandler, '__init__', init)
+    monkeypatch.setattr(rate_limiter, '_script', None)
+    monkeypatch.setattr(rate_limiter_config, 'is_enabled', True)
+
+    assert await rate_limiter.acquire('provider', 10**9)
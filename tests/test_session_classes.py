@@ -0,0 +1,31 @@
+import importlib
+
+import pytest
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
+
+from src.depends import get_admin_session, get_session
+
+session_dependencies = {get_session, get_admin_session}
+
+
+def get_session_dependencies(dependant: Dependant) -> set:
+    found = {dependant.call} & session_dependencies
+    for dependency in dependant.dependencies:
+        found |= get_session_dependencies(dependency)
+    return found
+
+
+# Routers whose helpers load objects the routes then change
+@pytest.mark.parametrize('module', ['prompts', 'users'])
+def test_route_uses_one_session_class(module):
+    """An object loaded by a dependency must be saved in the same session,
+    and a request should hold a single permit of its concurrency class."""
+    router = importlib.import_module(f'src.routers.{module}.views').router
+
+    for route in router.routes:
+        if isinstance(route, APIRoute):
+            assert len(get_session_dependencies(route.dependant)) <= 1, (
+                route.path,
+                route.methods,
+            )
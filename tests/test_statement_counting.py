@@ -0,0 +1,56 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.database import _count_statement, async_engine, count_statements
+
+
+@pytest_asyncio.fixture
+async def engine() -> AsyncIterator[AsyncEngine]:
+    """SQLite engine counted like the application one."""
+    engine = create_async_engine('sqlite+aiosqlite://')
+    event.listen(engine.sync_engine, 'before_cursor_execute', _count_statement)
+    yield engine
+    await engine.dispose()
+
+
+async def execute(engine: AsyncEngine, statements: int) -> None:
+    async with engine.connect() as connection:
+        for _ in range(statements):
+            await connection.execute(text('SELECT 1'))
+
+
+def test_application_engine_is_counted():
+    assert event.contains(
+        async_engine.sync_engine, 'before_cursor_execute', _count_statement
+    )
+
+
+@pytest.mark.asyncio
+async def test_statements_are_counted(engine):
+    await execute(engine, 1)
+
+    with count_statements() as statements:
+        await execute(engine, 3)
+        # Tasks started inside, e.g. chunks of a translation, are counted
+        # too
+        await asyncio.gather(execute(engine, 2), execute(engine, 1))
+
+    await execute(engine, 1)
+    assert statements == [6]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_are_counted_apart(engine):
+    async def handle(statements: int) -> int:
+        with count_statements() as counter:
+            await execute(engine, statements)
+            await asyncio.sleep(0)
+            await execute(engine, statements)
+        return counter[0]
+
+    assert await asyncio.gather(handle(1), handle(2), handle(3)) == [2, 4, 6]
@@ -0,0 +1,75 @@
+import pytest
+
+from src.util.translator.helpers import split_text_by_tokens
+
+texts = [
+    'One sentence. Another sentence! A question?',
+    '- list item\n    continued line\n    - nested item\n\nNext paragraph',
+    '\n\n  Indented start\n\n\n    code-like line\n  \n',
+    'Первое предложение, с запятой; и ещё одно. Второе предложение.',
+    '第一句。第二句！第三句？' * 5,
+    'a' * 100,
+    '   \n  ',
+]
+
+
+def reassemble(chunks: list[tuple[str, str, str]]) -> str:
+    return ''.join(
+        prefix + chunk + separator for prefix, chunk, separator in chunks
+    )
+
+
+@pytest.mark.parametrize('max_tokens', [4, 8, 16, 1000])
+@pytest.mark.parametrize('text', texts)
+def test_text_is_reassembled_exactly(text, max_tokens, byte_encoding):
+    chunks = split_text_by_tokens(text, max_tokens, byte_encoding)
+
+    assert reassemble(chunks) == text
+
+
+@pytest.mark.parametrize('max_tokens', [4, 8, 16])
+@pytest.mark.parametrize('text', texts)
+def test_chunks_fit_and_are_stripped(text, max_tokens, byte_encoding):
+    chunks = split_text_by_tokens(text, max_tokens, byte_encoding)
+
+    for prefix, chunk, separator in chunks:
+        assert len(byte_encoding.encode_ordinary(chunk)) <= max_tokens
+        assert chunk == chunk.strip()
+        assert not prefix.strip()
+        assert not separator.strip()
+    assert [chunk for _, chunk, _ in chunks if not chunk] == (
+        [] if text.strip() else ['']
+    )
+
+
+def test_indentation_is_kept_at_chunk_start(byte_encoding):
+    text = '- item\n    continued'
+
+    chunks = split_text_by_tokens(text, 8, byte_encoding)
+
+    assert chunks[1] == ('    ', 'continue', '')
+
+
+def test_text_is_cut_at_coarsest_boundary(byte_encoding):
+    text = 'First sentence. Second one.\n\nNext paragraph.'
+
+    chunks = split_text_by_tokens(text, 30, byte_encoding)
+
+    assert [chunk for _, chunk, _ in chunks] == [
+        'First sentence. Second one.',
+        'Next paragraph.',
+    ]
+
+
+def test_chunks_are_balanced(byte_encoding):
+    text = ' '.join(['word'] * 30)
+
+    chunks = split_text_by_tokens(text, 200, byte_encoding)
+    sizes = [
+        len(byte_encoding.encode_ordinary(chunk))
+        for _, chunk, _ in split_text_by_tokens(text, 60, byte_encoding)
+    ]
+
+    assert len(chunks) == 1
+    assert len(sizes) == 3
+    assert max(sizes) - min(sizes) <= 10
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from src.database.models import StylePrompt
+from src.settings import token_estimation_config
+from src.util.translator.helpers import (
+    EstimationMode,
+    count_tokens,
+    estimate_translation_tokens,
+    sample_tokens,
+)
+
+prompt = StylePrompt(id=1, title='Plain', text='Translate')
+
+
+def make_text(paragraphs: int) -> str:
+    """Paragraphs of mixed Latin and Cyrillic words, so the tokens per
+    character ratio of the byte encoding differs between them."""
+    rng = random.Random(0)
+    words = ['word', 'слово', 'translation', 'перевод', 'a', 'и']
+    return '\n\n'.join(
+        ' '.join(rng.choices(words, k=rng.randint(5, 60)))
+        for _ in range(paragraphs)
+    )
+
+
+def test_short_text_is_counted_exactly(offline_encoding):
+    text = make_text(50)
+
+    sampled = sample_tokens(text, 'test')
+
+    assert sampled.tokens == sampled.upper_bound
+    assert sampled.tokens == count_tokens(text, 'test')
+
+
+def test_long_text_is_estimated_by_sample(offline_encoding):
+    text = make_text(2000)
+    exact = count_tokens(text, 'test')
+
+    sampled = sample_tokens(text, 'test', seed=1)
+
+    assert sampled.sampled_units == (
+        token_estimation_config.sample_strata
+        * token_estimation_config.sample_units_per_stratum
+    )
+    assert sampled.total_units == 2000
+    assert abs(sampled.tokens - exact) / exact < 0.05
+    assert sampled.upper_bound >= exact
+    assert sampled.upper_bound < exact * 1.1
+
+
+def test_upper_bound_covers_exact_count(offline_encoding):
+    text = make_text(2000)
+    exact = count_tokens(text, 'test')
+
+    covered = sum(
+        sample_tokens(text, 'test', seed=seed).upper_bound >= exact
+        for seed in range(100)
+    )
+
+    assert covered >= 95
+
+
+def test_text_without_paragraphs_is_cut_into_units(offline_encoding):
+    text = make_text(2000).replace('\n\n', ' ')
+
+    sampled = sample_tokens(text, 'test', seed=1)
+
+    assert sampled.total_units == -(
+        -len(text) // token_estimation_config.sample_unit_length
+    )
+    assert sampled.upper_bound >= count_tokens(text, 'test')
+
+
+def test_sample_is_deterministic_with_seed(offline_encoding):
+    text = make_text(2000)
+
+    assert sample_tokens(text, 'test', seed=1) == sample_tokens(
+        text, 'test', seed=1
+    )
+
+
+@pytest.mark.asyncio
+async def test_sample_mode_is_used_for_long_texts(
+    monkeypatch, offline_encoding, redis_client, model
+):
+    text = make_text(2000)
+    monkeypatch.setattr(
+        token_estimation_config, 'sample_min_length', len(text)
+    )
+
+    exact = await estimate_translation_tokens(text, prompt, model)
+    sampled = await estimate_translation_tokens(
+        text, prompt, model, mode=EstimationMode.sample
+    )
+    monkeypatch.setattr(
+        token_estimation_config, 'sample_min_length', len(text) + 1
+    )
+    short = await estimate_translation_tokens(
+        text, prompt, model, mode=EstimationMode.sample
+    )
+
+    assert sampled != exact
+    assert abs(sampled - exact) / exact < 0.1
+    assert short == exact
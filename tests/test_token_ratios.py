@@ -0,0 +1,153 @@
+import pytest
+
+import src.util.translator.helpers
+from src.database.models import StylePrompt
+from src.database.repos.translation_task import TaskRepo
+from src.settings import token_estimation_config
+from src.util.token_ratios.classes import TokenRatio, token_ratio_table
+from src.util.token_ratios.helpers import get_ratio_samples
+from src.util.translator.helpers import (
+    EstimationMode,
+    estimate_translation_tokens,
+    estimate_translation_tokens_many,
+)
+
+from tests.sessions import RecordingSession
+
+prompt = StylePrompt(id=1, title='Plain', text='Translate')
+
+
+@pytest.fixture(autouse=True)
+def calibration(monkeypatch, redis_client):
+    monkeypatch.setattr(
+        token_estimation_config, 'calibration_min_samples', 3
+    )
+    monkeypatch.setattr(token_estimation_config, 'calibration_quantile', 0.5)
+    monkeypatch.setattr(token_ratio_table, 'ratios', {})
+    monkeypatch.setattr(token_ratio_table, 'loaded_at', None)
+
+
+def cost(source_tokens: int, chunks: int) -> tuple[int, int, int]:
+    """Sample of a model taking 3 tokens per source token and 100 more
+    per chunk."""
+    return 3 * source_tokens + 100 * chunks, source_tokens, chunks
+
+
+def test_fit_separates_chunk_overhead():
+    samples = [cost(50, 1), cost(100, 1), cost(1000, 2), cost(6000, 4)]
+
+    ratios = token_ratio_table.fit(
+        {(1, 1, 2): samples[:3], (1, 1, 3): samples[3:], (2, None, 2): []}
+    )
+
+    assert ratios == {
+        (1, 1, 2): TokenRatio(
+            per_token=3.0, per_chunk=100.0, chunk_tokens=500.0
+        ),
+        (1, None, None): TokenRatio(
+            per_token=3.0, per_chunk=100.0, chunk_tokens=500.0
+        ),
+    }
+
+
+def test_short_texts_do_not_inflate_long_ones(monkeypatch):
+    monkeypatch.setattr(token_estimation_config, 'calibration_quantile', 1)
+    samples = [cost(20, 1), cost(50, 1), cost(2000, 1), cost(4000, 2)]
+
+    ratio = token_ratio_table.fit_one(samples)
+
+    # Cost per source token of the shortest text is 8, 3.05 of the longest
+    assert ratio.per_token == pytest.approx(3.0)
+    assert ratio.predict(8000) == pytest.approx(cost(8000, 4)[0], rel=0.01)
+
+
+@pytest.mark.asyncio
+async def test_language_pair_ratio_falls_back_to_model():
+    pair_ratio = TokenRatio(per_token=2.0, per_chunk=50.0, chunk_tokens=900)
+    model_ratio = TokenRatio(per_token=3.0, per_chunk=0.0, chunk_tokens=1)
+    await token_ratio_table.save(
+        {(1, 1, 2): pair_ratio, (1, None, None): model_ratio}
+    )
+    token_ratio_table.loaded_at = None
+
+    assert await token_ratio_table.get(1, 1, 2) == pair_ratio
+    assert await token_ratio_table.get(1, 1, 3) == model_ratio
+    assert await token_ratio_table.get(2, 1, 2) is None
+    assert token_ratio_table.ratios == {
+        (1, 1, 2): pair_ratio,
+        (1, None, None): model_ratio,
+    }
+    assert pair_ratio.predict(1000) == 2000 + 2 * 50
+
+
+def test_samples_are_grouped_by_language_pair():
+    samples = get_ratio_samples(
+        [
+            (1, 1, 2, 30, 10, 1),
+            (1, 1, 2, 14, 7, 1),
+            (1, None, 3, 10, 5, 1),
+        ]
+    )
+
+    assert samples == {
+        (1, 1, 2): [(30, 10, 1), (14, 7, 1)],
+        (1, None, 3): [(10, 5, 1)],
+    }
+
+
+@pytest.mark.asyncio
+async def test_cost_samples_are_stored_counts():
+    db_session = RecordingSession()
+
+    await TaskRepo.get_cost_samples(limit=10, db_session=db_session)
+
+    (sql,) = db_session.compile()
+    assert (
+        "cost + CAST((translation_tasks.data['deduplication'] "
+        "->> 'saved_tokens') AS INTEGER)"
+    ) in sql
+    assert (
+        "CAST((translation_tasks.data['deduplication'] "
+        "->> 'cached_chunks') AS INTEGER) = 0"
+    ) in sql
+    # Articles are not encoded again
+    assert (
+        "CAST((translation_tasks.data ->> 'source_tokens') AS INTEGER)"
+    ) in sql
+    assert 'articles.text' not in sql
+
+
+@pytest.mark.asyncio
+async def test_text_is_sampled_once_for_all_languages(
+    monkeypatch, offline_encoding, model
+):
+    text = '\n\n'.join(f'Paragraph number {i}.' for i in range(1000))
+    monkeypatch.setattr(
+        token_estimation_config, 'sample_min_length', len(text)
+    )
+    sample_calls = []
+    sample_tokens = src.util.translator.helpers.sample_tokens
+
+    def count_sample_calls(text: str, model_name: str):
+        sample_calls.append(model_name)
+        return sample_tokens(text, model_name)
+
+    monkeypatch.setattr(
+        src.util.translator.helpers, 'sample_tokens', count_sample_calls
+    )
+    await token_ratio_table.save(
+        {
+            (1, 1, 2): TokenRatio(2.0, 0.0, 2000),
+            (1, 1, 3): TokenRatio(3.0, 0.0, 2000),
+        }
+    )
+
+    estimates = await estimate_translation_tokens_many(
+        text, prompt, model, [2, 3, 4], EstimationMode.sample, 1
+    )
+
+    assert len(sample_calls) == 1
+    assert estimates[1] == pytest.approx(estimates[0] * 1.5, abs=1)
+    assert estimates[2] == await estimate_translation_tokens(
+        text, prompt, model, EstimationMode.sample, 1, 4
+    )
@@ -0,0 +1,45 @@
+import uuid
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.database.models import TranslationTaskStatus
+from src.database.repos.translation_task import TaskRepo
+
+from tests.sessions import RecordingSession
+
+
+@pytest.mark.asyncio
+async def test_context_is_selected_from_task():
+    db_session = RecordingSession()
+
+    await TaskRepo.get_context(task_id=uuid.uuid4(), db_session=db_session)
+
+    (sql,) = db_session.compile()
+    assert 'FROM translation_tasks LEFT OUTER JOIN articles' in sql
+    assert sql.count('LEFT OUTER JOIN') == 5
+
+
+@pytest.mark.asyncio
+async def test_task_is_started_once_per_message():
+    db_session = RecordingSession()
+
+    is_started = await TaskRepo.start(
+        task_id=uuid.uuid4(), message_id='message', db_session=db_session
+    )
+
+    # JSONB parameters cannot be rendered into the statement
+    (statement,) = db_session.statements
+    compiled = statement.compile(dialect=postgresql.dialect())
+    assert not is_started
+    assert (
+        'translation_tasks.status = %(status_1)s OR '
+        'translation_tasks.status = %(status_2)s AND '
+        '(translation_tasks.data ->> %(data_1)s::TEXT) = %(param_3)s'
+    ) in str(compiled)
+    assert 'RETURNING translation_tasks.id' in str(compiled)
+    assert compiled.params['status_1'] == TranslationTaskStatus.created
+    assert compiled.params['status_2'] == TranslationTaskStatus.started
+    assert compiled.params['data_1'] == 'message_id'
+    assert compiled.params['param_3'] == 'message'
+    assert compiled.params['param_2'] == {'message_id': 'message'}
@@ -0,0 +1,19 @@
+import logging
+
+from src.database.models import AIModel
+from src.util.translator.abstract import AbstractTranslator
+
+
+class EchoTranslator(AbstractTranslator):
+    """Translates chunks to upper case and records every request."""
+
+    logger = logging.getLogger('app')
+
+    def __init__(self):
+        self.requests: list[str] = []
+
+    async def _process_chunk(
+        self, model: AIModel, prompt: str, chunk: str
+    ) -> tuple[str, int]:
+        self.requests.append(chunk)
+        return chunk.upper(), len(chunk)